@@ -0,0 +1,219 @@
+"""
+Arquivo ZIP, gerado em streaming, com todos os documentos de uma
+candidatura, de um candidato ou de uma categoria inteira.
+
+Lê dos três sítios onde os ficheiros podem estar (disco em UPLOAD_ROOT,
+GridFS ou o campo legado ``data``) e escreve as entradas ZIP à medida que
+os blocos chegam: o arquivo nunca é montado em disco nem em memória.
+"""
+import zipfile
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+from db import get_database
+from downloads import content_disposition, iter_file, iter_gridfs, stat_upload
+from routes_crud import parse_object_id
+from storage import legacy_bytes, safe_segment
+
+router = APIRouter(tags=["arquivos"])
+
+FLUSH_BYTES = 256 * 1024
+ZIP64_LIMIT = (1 << 31) - 1
+# poucos documentos por lote: linhas legadas trazem o ficheiro no campo data
+CURSOR_BATCH_SIZE = 20
+
+
+class _ZipSink:
+    """
+    Destino não posicionável para o zipfile: acumula bytes até serem drenados.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.pending = 0
+        self.offset = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self.pending += len(data)
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.offset
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks, self.pending = [], 0
+        return data
+
+
+async def iter_document_bytes(database, document: dict) -> Optional[AsyncIterator[bytes]]:
+    """
+    Devolve um iterador para o conteúdo do documento, ou None se não existir.
+    """
+    file_path = document.get("file_path")
+    if file_path:
+        uploaded = await stat_upload(file_path)
+        if uploaded:
+            return iter_file(uploaded[0])
+    file_id = document.get("file_id")
+    if file_id:
+        try:
+            grid_out = await AsyncIOMotorGridFSBucket(database).open_download_stream(file_id)
+        except NoFile:
+            grid_out = None
+        if grid_out is not None:
+            return iter_gridfs(grid_out)
+    data_field = document.get("data")
+    if data_field is not None:
+        async def _single():
+            yield legacy_bytes(data_field)
+        return _single()
+    return None
+
+
+async def iter_zip(database, entries: AsyncIterator[tuple[str, dict]]) -> AsyncIterator[bytes]:
+    """
+    Escreve o ZIP entrada a entrada; entradas em falta ficam listadas em FALTAM.txt.
+    """
+    sink = _ZipSink()
+    used_names = set()
+    missing = []
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+        async for arcname, document in entries:
+            # nomes repetidos dentro do ZIP recebem sufixo
+            base, dot, ext = arcname.rpartition(".")
+            candidate_name, counter = arcname, 1
+            while candidate_name in used_names:
+                counter += 1
+                candidate_name = f"{base} ({counter}).{ext}" if dot else f"{arcname} ({counter})"
+            used_names.add(candidate_name)
+
+            source = await iter_document_bytes(database, document)
+            if source is None:
+                missing.append(candidate_name)
+                continue
+            uploaded_at = document.get("uploaded_at") or document.get("uploadDate") or datetime.utcnow()
+            info = zipfile.ZipInfo(candidate_name, date_time=uploaded_at.timetuple()[:6])
+            size = document.get("size")
+            force_zip64 = not isinstance(size, int) or size > ZIP64_LIMIT
+            with archive.open(info, "w", force_zip64=force_zip64) as entry:
+                async for chunk in source:
+                    entry.write(chunk)
+                    if sink.pending >= FLUSH_BYTES:
+                        yield sink.drain()
+            yield sink.drain()
+        if missing:
+            archive.writestr("FALTAM.txt", "Ficheiros não encontrados:\n" + "\n".join(missing) + "\n")
+    yield sink.drain()
+
+
+def zip_response(database, entries, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        iter_zip(database, entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": content_disposition(f"{filename}.zip")},
+    )
+
+
+# ───────────────────────────────────────────────
+# Fontes das entradas
+# ───────────────────────────────────────────────
+async def application_entries(database, query: dict) -> AsyncIterator[tuple[str, dict]]:
+    cursor = database.application_documents.find(query, batch_size=CURSOR_BATCH_SIZE).sort("application_id", 1)
+    async for document in cursor:
+        folder = f"{safe_segment(document.get('category'), 'SemCategoria')}/" \
+                 f"{safe_segment(document.get('candidate_name'), 'SemNome')}"
+        name = safe_segment(document.get("name"), str(document["_id"]))
+        yield f"{folder}/{name}", document
+
+
+async def candidate_document_entries(database, candidates: dict) -> AsyncIterator[tuple[str, dict]]:
+    """
+    Documentos da coleção ``documentos`` para {candidateId: nome}.
+    """
+    ids = list(candidates)
+    for start in range(0, len(ids), 100):
+        batch = ids[start:start + 100]
+        cursor = database.documentos.find({"candidateId": {"$in": batch}}, batch_size=CURSOR_BATCH_SIZE)
+        async for document in cursor.sort("candidateId", 1):
+            folder = safe_segment(candidates.get(document["candidateId"]), str(document["candidateId"]))
+            name = safe_segment(document.get("originalName"), str(document["_id"]))
+            yield f"documentos/{folder}/{safe_segment(document.get('type'), 'documento')}-{name}", document
+
+
+# ───────────────────────────────────────────────
+# Rotas
+# ───────────────────────────────────────────────
+@router.get("/applications/{application_id}/archive")
+async def application_archive(application_id: str):
+    """
+    ZIP com os documentos de uma candidatura.
+    """
+    database = get_database()
+    app_oid = parse_object_id(application_id, "Candidatura")
+    application = await database.applications.find_one({"_id": app_oid}, {"first_name": 1, "last_name": 1})
+    if not application:
+        raise HTTPException(status_code=404, detail="Candidatura não encontrada")
+    filename = safe_segment(f"{application.get('first_name', '')}_{application.get('last_name', '')}", application_id)
+    return zip_response(database, application_entries(database, {"application_id": app_oid}), filename)
+
+
+@router.get("/candidates/{candidate_id}/archive")
+async def candidate_archive(candidate_id: str):
+    """
+    ZIP com os documentos (GridFS / legado) de um candidato.
+    """
+    database = get_database()
+    oid = parse_object_id(candidate_id, "Candidato")
+    candidate = await database.candidatos.find_one({"_id": oid}, {"name": 1})
+    if not candidate:
+        raise HTTPException(status_code=404, detail="Candidato não encontrado")
+    name = candidate.get("name")
+    entries = candidate_document_entries(database, {oid: name})
+    return zip_response(database, entries, safe_segment(name, candidate_id))
+
+
+@router.get("/categories/{category_id}/archive")
+async def category_archive(category_id: str):
+    """
+    ZIP com todos os documentos de uma categoria: candidaturas submetidas com
+    o nome da categoria e documentos dos candidatos associados a ela.
+    """
+    database = get_database()
+    oid = parse_object_id(category_id, "Categoria")
+    category = await database.categories.find_one({"_id": oid}, {"name": 1})
+    if not category:
+        raise HTTPException(status_code=404, detail="Categoria não encontrada")
+    candidates = {
+        doc["_id"]: doc.get("name")
+        async for doc in database.candidatos.find({"categoryId": oid}, {"name": 1})
+    }
+
+    async def entries():
+        async for entry in application_entries(database, {"category": category.get("name")}):
+            yield entry
+        async for entry in candidate_document_entries(database, candidates):
+            yield entry
+
+    return zip_response(database, entries(), safe_segment(category.get("name"), category_id))
+
+
+@router.get("/applications/archive")
+async def applications_category_archive(category: str):
+    """
+    ZIP com os documentos das candidaturas de uma categoria (pelo nome usado
+    no formulário, ex.: ``?category=cooperativa``).
+    """
+    database = get_database()
+    return zip_response(database, application_entries(database, {"category": category}),
+                        safe_segment(category, "candidaturas"))
@@ -0,0 +1,379 @@
+"""
+Benchmark / teste de carga reprodutível da API.
+
+Arranca ``server:app`` num uvicorn dentro do próprio processo, contra um
+mongod local (``--mongo-url``, numa base própria que é apagada no fim) ou
+contra o mongomock em memória (por omissão; requer ``pip install
+mongomock-motor``). Semeia candidatos, jurados, avaliações e candidaturas
+com documentos, corre carga concorrente por cenário e grava os resultados
+(débito e percentis de latência) em JSON para comparar entre versões.
+
+Uso:
+    python benchmark.py                                # mongomock, valores por omissão
+    python benchmark.py --mongo-url mongodb://localhost:27017 --concurrency 32 --duration 20
+    python benchmark.py --scenarios list_candidates download --output resultados.json
+
+Compare sempre resultados do mesmo backend: o mongomock corre na mesma
+thread que a API e serve para detetar regressões no código Python, não
+para medir o Mongo.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+from bson import ObjectId
+
+ROOT_DIR = Path(__file__).parent
+BENCH_DB_NAME = "prentma_bench"
+
+SCENARIOS = (
+    "submit",
+    "list_candidates",
+    "list_evaluations",
+    "list_applications",
+    "download",
+    "download_range",
+)
+
+
+# ───────────────────────────────────────────────
+# Ambiente: base de dados e servidor
+# ───────────────────────────────────────────────
+def configure_database(args):
+    """
+    Prepara db.py antes de importar o server (base própria ou mongomock).
+    """
+    os.environ["DB_NAME"] = BENCH_DB_NAME
+    if args.mongo_url:
+        os.environ["MONGO_URL"] = args.mongo_url
+    import db
+
+    if args.mongo_url:
+        db.DB_NAME = BENCH_DB_NAME
+        db.MONGO_URL = args.mongo_url
+        return db.get_database()
+    try:
+        import mongomock_motor
+    except ImportError:
+        sys.exit("mongomock-motor não está instalado: pip install mongomock-motor, ou use --mongo-url")
+    db.client = mongomock_motor.AsyncMongoMockClient()
+    db._database = db.client[BENCH_DB_NAME]
+    return db._database
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_server(port: int):
+    import uvicorn
+
+    from server import app
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+    server = uvicorn.Server(config)
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()  # propaga a exceção, se houver
+            # falha no startup da app: o uvicorn regista o erro e serve() termina sem exceção
+            raise RuntimeError("O servidor não arrancou; veja o erro do startup acima")
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+# ───────────────────────────────────────────────
+# Dados de teste
+# ───────────────────────────────────────────────
+async def seed(database, args, rng: random.Random) -> dict:
+    from blob_store import blob_location, store_bytes
+
+    now = datetime.utcnow()
+    categories = [
+        {"name": f"Categoria {i}", "description": "benchmark", "prize": "1000 Kz",
+         "created_at": now - timedelta(days=i), "updated_at": now}
+        for i in range(args.categories)
+    ]
+    category_ids = (await database.categories.insert_many(categories)).inserted_ids
+
+    candidates = [
+        {"name": f"Candidato {i}", "email": f"candidato{i}@bench.ao", "phone": f"9{i:08d}",
+         "identityDocument": f"{i:09d}LA0{i % 100:02d}", "categoryId": rng.choice(category_ids),
+         "registrationStatus": "approved", "registrationDate": now - timedelta(minutes=i),
+         "created_at": now - timedelta(minutes=i), "updated_at": now}
+        for i in range(args.candidates)
+    ]
+    candidate_ids = []
+    for start in range(0, len(candidates), 1000):
+        candidate_ids += (await database.candidatos.insert_many(candidates[start:start + 1000])).inserted_ids
+
+    jurors = [
+        {"name": f"Jurado {i}", "email": f"jurado{i}@bench.ao", "specialty": "agricultura",
+         "created_at": now - timedelta(hours=i), "updated_at": now}
+        for i in range(args.jurors)
+    ]
+    juror_ids = (await database.jurados.insert_many(jurors)).inserted_ids
+
+    # pares (candidato, jurado) distintos: o índice único de avaliacoes é obrigatório no arranque
+    pairs = rng.sample(range(len(candidate_ids) * len(juror_ids)), args.evaluations)
+    evaluations = [
+        {"candidateId": candidate_ids[pair // len(juror_ids)], "jurorId": juror_ids[pair % len(juror_ids)],
+         "score": round(rng.uniform(0, 20), 1), "comment": "ok", "date": now,
+         "created_at": now - timedelta(seconds=i), "updated_at": now}
+        for i, pair in enumerate(pairs)
+    ]
+    for start in range(0, len(evaluations), 1000):
+        await database.avaliacoes.insert_many(evaluations[start:start + 1000])
+
+    # poucos conteúdos distintos partilhados por muitas candidaturas (como BI/certificados reais)
+    blobs = []
+    for size in (20_000, 150_000, 1_000_000):
+        blobs.append(await store_bytes(database, rng.randbytes(size)))
+    documents = []
+    applications = []
+    for i in range(args.applications):
+        app_id = ObjectId()
+        summaries = []
+        for doc_type, blob in zip(("bi", "cv", "certificado"), blobs):
+            row = {
+                "_id": ObjectId(), "application_id": app_id, "type": doc_type,
+                "name": f"{doc_type}.pdf", "category": "cooperativa", "candidate_name": f"Bench {i}",
+                "content_type": "application/pdf", "size": blob["size"], "uploaded_at": now,
+                **blob_location(blob),
+            }
+            documents.append(row)
+            summaries.append({"id": str(row["_id"]), "type": doc_type, "name": row["name"], "size": blob["size"]})
+        applications.append({
+            "_id": app_id, "first_name": "Bench", "last_name": str(i), "email": f"app{i}@bench.ao",
+            "phone": "900000000", "category": "cooperativa", "municipality": "Luanda",
+            "accepted_terms": True, "documents": summaries, "created_at": now - timedelta(seconds=i),
+        })
+    await database.applications.insert_many(applications)
+    await database.application_documents.insert_many(documents)
+    # as candidaturas semeadas referenciam os blobs sem passar por store_*
+    for blob in blobs:
+        extra = sum(1 for row in documents if row["sha256"] == blob["_id"]) - 1
+        await database.blobs.update_one({"_id": blob["_id"]}, {"$inc": {"refcount": extra}})
+
+    return {"downloads": [(str(row["application_id"]), str(row["_id"]), row["size"]) for row in documents]}
+
+
+async def cleanup(database, args) -> None:
+    """
+    Remove os ficheiros criados (blobs) e, com mongod, a base de teste.
+    """
+    from blob_store import release
+
+    async for row in database.application_documents.find({"sha256": {"$exists": True}}, {"sha256": 1}):
+        await release(database, row["sha256"])
+    if args.mongo_url:
+        await database.client.drop_database(BENCH_DB_NAME)
+
+
+# ───────────────────────────────────────────────
+# Cenários
+# ───────────────────────────────────────────────
+def submission_payload(rng: random.Random) -> dict:
+    attachment = base64.b64encode(rng.randbytes(30_000)).decode()
+    return {
+        "first_name": "Carga", "last_name": str(rng.randrange(10**9)), "email": "carga@bench.ao",
+        "phone": "900000000", "city": "Luanda", "address": "Rua 1", "category": "cooperativa",
+        "years_experience": "5", "municipality": "Luanda", "accepted_terms": True,
+        "documents": [{"type": "bi", "name": "bi.pdf", "content_type": "application/pdf", "data": attachment}],
+    }
+
+
+def scenario_request(name: str, seeded: dict, rng: random.Random, state: dict):
+    """
+    Devolve (método, caminho, kwargs) do próximo pedido do cenário.
+    """
+    if name == "submit":
+        return "POST", "/api/applications", {"json": submission_payload(rng)}
+    if name in {"list_candidates", "list_evaluations"}:
+        path = "/api/candidates" if name == "list_candidates" else "/api/evaluations"
+        params = {"limit": 50}
+        # percorre as páginas com o cursor, recomeçando no fim
+        if state.get(name):
+            params["cursor"] = state[name]
+        return "GET", path, {"params": params}
+    if name == "list_applications":
+        return "GET", "/api/applications", {"params": {"limit": 50}}
+    app_id, doc_id, size = rng.choice(seeded["downloads"])
+    headers = {}
+    if name == "download_range":
+        start = rng.randrange(max(size - 65536, 1))
+        headers["Range"] = f"bytes={start}-{start + 65535}"
+    return "GET", f"/api/applications/{app_id}/documents/{doc_id}", {"headers": headers}
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, seeded: dict, args, rng: random.Random) -> dict:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    transferred = 0
+    state: dict = {}
+    deadline = time.perf_counter() + args.duration
+    budget = {"left": args.requests}
+
+    async def worker():
+        nonlocal transferred
+        while time.perf_counter() < deadline and (args.requests is None or budget["left"] > 0):
+            if args.requests is not None:
+                budget["left"] -= 1
+            method, path, kwargs = scenario_request(name, seeded, rng, state)
+            started = time.perf_counter()
+            try:
+                resp = await client.request(method, path, **kwargs)
+                body = resp.content
+                key = str(resp.status_code)
+            except httpx.HTTPError as exc:
+                body, key = b"", type(exc).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[key] = statuses.get(key, 0) + 1
+            transferred += len(body)
+            if name in {"list_candidates", "list_evaluations"} and key == "200":
+                state[name] = json.loads(body).get("next_cursor")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    return summarize(name, latencies, statuses, transferred, elapsed)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(name: str, latencies: List[float], statuses: Dict[str, int], transferred: int, elapsed: float) -> dict:
+    values = sorted(latencies)
+    errors = sum(count for status, count in statuses.items() if not status.startswith(("2", "3")))
+    ms = lambda seconds: round(seconds * 1000, 2)  # noqa: E731
+    return {
+        "scenario": name,
+        "requests": len(values),
+        "errors": errors,
+        "statuses": statuses,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+        "transfer_mb_s": round(transferred / 1e6 / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": ms(sum(values) / len(values)) if values else 0.0,
+            "p50": ms(percentile(values, 0.50)),
+            "p90": ms(percentile(values, 0.90)),
+            "p95": ms(percentile(values, 0.95)),
+            "p99": ms(percentile(values, 0.99)),
+            "max": ms(values[-1]) if values else 0.0,
+        },
+    }
+
+
+# ───────────────────────────────────────────────
+# Execução
+# ───────────────────────────────────────────────
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecida"
+
+
+def print_table(results: List[dict]) -> None:
+    print(f"{'cenário':<20}{'pedidos':>9}{'erros':>7}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for item in results:
+        latency = item["latency_ms"]
+        print(f"{item['scenario']:<20}{item['requests']:>9}{item['errors']:>7}{item['throughput_rps']:>9}"
+              f"{latency['p50']:>9}{latency['p95']:>9}{latency['p99']:>9}{latency['max']:>9}")
+
+
+async def main_async(args) -> dict:
+    rng = random.Random(args.seed)
+    database = configure_database(args)
+    server = task = None
+    results = []
+    try:
+        seeded_at = time.perf_counter()
+        seeded = await seed(database, args, rng)
+        seed_seconds = time.perf_counter() - seeded_at
+
+        port = free_port()
+        server, task = await start_server(port)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            for name in args.scenarios:
+                if args.warmup:
+                    await run_scenario(client, name, seeded, argparse.Namespace(
+                        **{**vars(args), "duration": args.warmup, "requests": None}), rng)
+                results.append(await run_scenario(client, name, seeded, args, rng))
+                print(f"  {name}: {results[-1]['throughput_rps']} req/s, p99 {results[-1]['latency_ms']['p99']} ms")
+    finally:
+        # também se o arranque falhar; antes de parar o servidor, porque o
+        # shutdown da app fecha o cliente Mongo
+        await cleanup(database, args)
+        if server is not None:
+            server.should_exit = True
+            await task
+
+    return {
+        "started_at": datetime.utcnow().isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": "mongod" if args.mongo_url else "mongomock",
+        "parameters": {key: value for key, value in vars(args).items() if key not in {"output", "mongo_url"}},
+        "seed_seconds": round(seed_seconds, 2),
+        "results": results,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da API PRENTMA.")
+    parser.add_argument("--mongo-url", help="mongod a usar (base prentma_bench); omisso = mongomock")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos por cenário")
+    parser.add_argument("--requests", type=int, help="limite de pedidos por cenário (em vez de só duração)")
+    parser.add_argument("--warmup", type=float, default=1.0, help="segundos de aquecimento por cenário")
+    parser.add_argument("--categories", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=5000)
+    parser.add_argument("--jurors", type=int, default=50)
+    parser.add_argument("--evaluations", type=int, default=20000)
+    parser.add_argument("--applications", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42, help="semente dos dados e da escolha de pedidos")
+    parser.add_argument("--output", type=Path,
+                        default=ROOT_DIR / "benchmarks" / f"benchmark-{datetime.utcnow():%Y%m%d-%H%M%S}.json")
+    args = parser.parse_args(argv)
+    if args.evaluations > args.candidates * args.jurors:
+        parser.error("--evaluations não pode exceder --candidates × --jurors (uma avaliação por par)")
+    return args
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    report = asyncio.run(main_async(args))
+    print_table(report["results"])
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Resultados gravados em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
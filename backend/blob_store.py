@@ -0,0 +1,230 @@
+"""
+Armazenamento de ficheiros endereçado por conteúdo (SHA-256).
+
+Bytes idênticos são guardados uma só vez. A coleção ``blobs`` tem um
+registo por conteúdo (``_id`` = hash SHA-256 em hexadecimal) com a
+localização — ``file_path`` em disco ou ``file_id`` no GridFS — e um
+contador de referências. As linhas de ``application_documents`` e
+``documentos`` guardam ``sha256`` e copiam a localização do blob.
+
+Cada gravação soma uma referência; ``release`` tira uma e apaga o
+conteúdo quando a última referência desaparece.
+
+Cada registo de blob tem o seu próprio ficheiro (``<sha256>.<sufixo>``, como
+o ``file_id`` no GridFS): se um ``release`` apaga o registo e, antes de
+remover o ficheiro, outro pedido grava o mesmo conteúdo, este fica noutro
+caminho e o ``unlink`` atrasado não lhe toca.
+"""
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Iterable, List, Optional
+
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from storage import UPLOAD_ROOT, run_io
+
+logger = logging.getLogger("prentma.backend")
+
+# dentro de UPLOAD_ROOT para que os downloads em disco continuem a servi-los
+BLOB_DIR = UPLOAD_ROOT / ".blobs"
+
+
+def new_blob_path(digest: str) -> Path:
+    return BLOB_DIR / digest[:2] / f"{digest}.{os.urandom(6).hex()}"
+
+
+def blob_location(blob: dict) -> dict:
+    """
+    Campos a copiar para a linha de metadados que referencia o blob.
+    """
+    location = {"sha256": blob["_id"]}
+    if blob.get("file_path"):
+        location["file_path"] = blob["file_path"]
+    if blob.get("file_id"):
+        location["file_id"] = blob["file_id"]
+    return location
+
+
+# ───────────────────────────────────────────────
+# Operações de disco (no pool de I/O)
+# ───────────────────────────────────────────────
+def _decode_and_hash(encoded: str) -> tuple[bytes, str]:
+    file_bytes = base64.b64decode(encoded)
+    return file_bytes, hashlib.sha256(file_bytes).hexdigest()
+
+
+def _write_blob(digest: str, file_bytes: bytes) -> Path:
+    path = new_blob_path(digest)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # caminho novo: ninguém o referencia até _register
+    with open(path, "wb") as f:
+        f.write(file_bytes)
+    return path
+
+
+def _move_blob(digest: str, temp_path: Path) -> Path:
+    path = new_blob_path(digest)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(temp_path, path)
+    return path
+
+
+# ───────────────────────────────────────────────
+# Contagem de referências
+# ───────────────────────────────────────────────
+async def _reference(database, digest: str) -> Optional[dict]:
+    """
+    Soma uma referência a um blob existente; None se o conteúdo é novo.
+    """
+    return await database.blobs.find_one_and_update(
+        {"_id": digest},
+        {"$inc": {"refcount": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def _register(database, digest: str, size: int, location: dict) -> dict:
+    """
+    Regista um blob acabado de gravar. Se outro pedido registou o mesmo
+    conteúdo entretanto, fica o registo dele (com mais uma referência).
+    """
+    now = datetime.utcnow()
+    update = {
+        "$inc": {"refcount": 1},
+        "$set": {"updated_at": now},
+        "$setOnInsert": {**location, "size": size, "created_at": now},
+    }
+    try:
+        return await database.blobs.find_one_and_update(
+            {"_id": digest}, update, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # upserts concorrentes no mesmo _id: o segundo repete como update
+        return await database.blobs.find_one_and_update(
+            {"_id": digest}, update, upsert=True, return_document=ReturnDocument.AFTER
+        )
+
+
+async def _register_file(database, digest: str, size: int, path: Path) -> dict:
+    """
+    Regista o ficheiro gravado em ``path``. Se ficou o registo de outro
+    pedido, apaga o nosso ficheiro — a menos que o ``file_path`` registado
+    já não exista, caso em que o registo passa a apontar para o nosso. Um
+    blob só no GridFS (sem ``file_path``) mantém o ``file_id``.
+    """
+    blob = await _register(database, digest, size, {"file_path": str(path)})
+    recorded = blob.get("file_path")
+    if recorded == str(path):
+        return blob
+    if not recorded or await run_io(Path(recorded).exists):
+        await run_io(path.unlink, True)
+        return blob
+    repointed = await database.blobs.find_one_and_update(
+        {"_id": digest, "file_path": recorded},
+        {"$set": {"file_path": str(path), "updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if repointed is None:
+        # outro pedido reparou-o primeiro: fica o ficheiro dele
+        await run_io(path.unlink, True)
+        return await database.blobs.find_one({"_id": digest})
+    logger.warning("Blob %s: ficheiro %s em falta, substituído por %s", digest, recorded, path)
+    return repointed
+
+
+async def store_bytes(database, file_bytes: bytes, digest: Optional[str] = None, *,
+                      gridfs: bool = False, filename: str = "", content_type: Optional[str] = None) -> dict:
+    """
+    Guarda ``file_bytes`` (em disco ou, com ``gridfs=True``, no GridFS)
+    se o conteúdo ainda não existir. Devolve o registo do blob.
+    """
+    digest = digest or hashlib.sha256(file_bytes).hexdigest()
+    blob = await _reference(database, digest)
+    if blob:
+        return blob
+
+    if gridfs:
+        bucket = AsyncIOMotorGridFSBucket(database)
+        file_id = await bucket.upload_from_stream(
+            filename or digest, file_bytes, metadata={"sha256": digest, "contentType": content_type}
+        )
+        blob = await _register(database, digest, len(file_bytes), {"file_id": file_id})
+        if blob.get("file_id") != file_id:
+            await bucket.delete(file_id)
+        return blob
+
+    path = await run_io(_write_blob, digest, file_bytes)
+    return await _register_file(database, digest, len(file_bytes), path)
+
+
+async def store_base64(database, encoded: str) -> dict:
+    """
+    Descodifica (no pool de I/O) e guarda um anexo base64 em disco.
+    """
+    file_bytes, digest = await run_io(_decode_and_hash, encoded)
+    return await store_bytes(database, file_bytes, digest)
+
+
+async def store_path(database, temp_path: Path, digest: str, size: int) -> dict:
+    """
+    Guarda um ficheiro já em disco (ex.: recebido por multipart): passa-o
+    para BLOB_DIR por rename, ou apaga-o se o conteúdo já existir.
+    """
+    blob = await _reference(database, digest)
+    if blob:
+        await run_io(os.remove, temp_path)
+        return blob
+    path = await run_io(_move_blob, digest, temp_path)
+    return await _register_file(database, digest, size, path)
+
+
+async def release(database, digest: Optional[str]) -> None:
+    """
+    Tira uma referência; apaga o conteúdo quando chega a zero.
+    """
+    if not digest:
+        return
+    blob = await database.blobs.find_one_and_update(
+        {"_id": digest}, {"$inc": {"refcount": -1}}, return_document=ReturnDocument.AFTER
+    )
+    if not blob or blob["refcount"] > 0:
+        return
+    # só apaga se ninguém voltou a referenciar entre o $inc e aqui
+    result = await database.blobs.delete_one({"_id": digest, "refcount": {"$lte": 0}})
+    if not result.deleted_count:
+        return
+    if blob.get("file_path"):
+        await run_io(Path(blob["file_path"]).unlink, True)
+    if blob.get("file_id"):
+        try:
+            await AsyncIOMotorGridFSBucket(database).delete(blob["file_id"])
+        except NoFile:
+            logger.warning("Blob %s: ficheiro GridFS %s já não existia", digest, blob["file_id"])
+
+
+async def release_all(database, blobs: Iterable[dict]) -> None:
+    """
+    Tira uma referência a cada blob (ex.: ao desfazer uma gravação falhada).
+    """
+    await asyncio.gather(*(release(database, blob["_id"]) for blob in blobs))
+
+
+async def store_all(database, stores: Iterable[Awaitable[dict]]) -> List[dict]:
+    """
+    Corre várias gravações em paralelo. Se alguma falhar, tira as referências
+    das que ficaram registadas e propaga o primeiro erro.
+    """
+    results = await asyncio.gather(*stores, return_exceptions=True)
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        await release_all(database, [result for result in results if not isinstance(result, BaseException)])
+        raise errors[0]
+    return results
@@ -0,0 +1,123 @@
+"""
+Cache em memória (por processo) para coleções que quase só são lidas,
+como ``categories`` e ``events``.
+
+Cada entrada expira após ``CACHE_TTL_SECONDS`` e o cache guarda no máximo
+``CACHE_MAX_ENTRIES`` (LRU): a chave inclui limit/cursor/fields vindos do
+cliente, por isso sem limite qualquer cliente o faria crescer. Os handlers de escrita
+chamam ``invalidate``, que limpa o cache local e incrementa a versão do
+namespace em ``cache_versions``; os outros workers do uvicorn comparam essa
+versão no máximo a cada ``CACHE_SYNC_SECONDS`` e descartam as suas entradas
+quando ela mudou.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from pymongo import ReturnDocument
+
+from db import get_database
+
+logger = logging.getLogger("prentma.cache")
+
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "300"))
+CACHE_SYNC_SECONDS = float(os.getenv("CACHE_SYNC_SECONDS", "2"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "512"))
+
+
+class ReadMostlyCache:
+    def __init__(self, ttl: float = CACHE_TTL_SECONDS, sync_interval: float = CACHE_SYNC_SECONDS,
+                 max_entries: int = CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self.max_entries = max_entries
+        # ordem de uso: a primeira entrada é a menos usada recentemente
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, Hashable], asyncio.Future] = {}
+        # namespace -> (versão conhecida, momento da última verificação)
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        # muda a cada descarte: leituras iniciadas antes não ficam guardadas
+        self._generations: Dict[str, int] = {}
+
+    def _drop_namespace(self, namespace: str) -> None:
+        self._generations[namespace] = self._generations.get(namespace, 0) + 1
+        for entry_key in [entry_key for entry_key in self._entries if entry_key[0] == namespace]:
+            del self._entries[entry_key]
+
+    def _store(self, entry_key: Tuple[str, Hashable], value: Any) -> None:
+        now = time.monotonic()
+        if len(self._entries) >= self.max_entries:
+            for expired in [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]:
+                del self._entries[expired]
+        self._entries[entry_key] = (now + self.ttl, value)
+        self._entries.move_to_end(entry_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _sync(self, namespace: str) -> None:
+        """
+        Confere a versão partilhada do namespace (no máximo uma vez por intervalo).
+        """
+        now = time.monotonic()
+        known, checked_at = self._versions.get(namespace, (None, 0.0))
+        if known is not None and now - checked_at < self.sync_interval:
+            return
+        try:
+            doc = await get_database().cache_versions.find_one({"_id": namespace})
+        except Exception as exc:
+            # sem Mongo não há coerência garantida: não servir do cache
+            logger.warning("Não foi possível verificar a versão do cache %s: %s", namespace, exc)
+            self._drop_namespace(namespace)
+            return
+        remote = doc["version"] if doc else 0
+        if remote != known:
+            self._drop_namespace(namespace)
+        self._versions[namespace] = (remote, now)
+
+    async def get_or_load(self, namespace: str, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        if not CACHE_ENABLED:
+            return await loader()
+        await self._sync(namespace)
+        entry_key = (namespace, key)
+        entry = self._entries.get(entry_key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(entry_key)
+            return entry[1]
+
+        # pedidos simultâneos para a mesma chave partilham uma única leitura
+        pending = self._inflight.get(entry_key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[entry_key] = future
+        generation = self._generations.get(namespace, 0)
+        try:
+            value = await loader()
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # evita aviso de exceção não consumida
+            raise
+        else:
+            future.set_result(value)
+            if self._generations.get(namespace, 0) == generation:
+                self._store(entry_key, value)
+            return value
+        finally:
+            self._inflight.pop(entry_key, None)
+
+    async def invalidate(self, namespace: str) -> None:
+        """
+        Descarta o namespace aqui e sinaliza os outros workers.
+        """
+        self._drop_namespace(namespace)
+        doc = await get_database().cache_versions.find_one_and_update(
+            {"_id": namespace}, {"$inc": {"version": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        self._versions[namespace] = (doc["version"], time.monotonic())
+
+
+cache = ReadMostlyCache()
@@ -3,20 +3,83 @@ import os
 from pathlib import Path
 import logging
 
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+
+from mongo_monitoring import event_listeners
+
 ROOT_DIR = Path(__file__).parent
 MONGO_URL = os.getenv("MONGO_URL") or "mongodb://localhost:27017/prentma"
 DB_NAME = os.getenv("DB_NAME") or "prentma"
 
+# ───────────────────────────────────────────────
+# Pool e ligação (vazio = valor do URL ou por omissão do pymongo)
+# ───────────────────────────────────────────────
+# dimensione maxPoolSize por worker uvicorn: o total no servidor é workers x maxPoolSize
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": ("MONGO_MAX_POOL_SIZE", int),
+    "minPoolSize": ("MONGO_MIN_POOL_SIZE", int),
+    "maxIdleTimeMS": ("MONGO_MAX_IDLE_TIME_MS", int),
+    "maxConnecting": ("MONGO_MAX_CONNECTING", int),
+    "waitQueueTimeoutMS": ("MONGO_WAIT_QUEUE_TIMEOUT_MS", int),
+    "serverSelectionTimeoutMS": ("MONGO_SERVER_SELECTION_TIMEOUT_MS", int),
+    "connectTimeoutMS": ("MONGO_CONNECT_TIMEOUT_MS", int),
+    "socketTimeoutMS": ("MONGO_SOCKET_TIMEOUT_MS", int),
+    # ex.: "zstd,snappy,zlib" (zstd/snappy precisam de zstandard/python-snappy)
+    "compressors": ("MONGO_COMPRESSORS", str),
+    "zlibCompressionLevel": ("MONGO_ZLIB_LEVEL", int),
+    "readPreference": ("MONGO_READ_PREFERENCE", str),
+}
+
+# leituras das listagens pesadas (tabelas, exportação); secondaryPreferred
+# tira carga do primário num replica set, à custa de alguns ms de atraso
+LIST_READ_PREFERENCE = os.getenv("MONGO_LIST_READ_PREFERENCE", "primary")
+LIST_MAX_STALENESS_SECONDS = int(os.getenv("MONGO_LIST_MAX_STALENESS_SECONDS", "-1"))
+
 client: AsyncIOMotorClient | None = None
 _database: AsyncIOMotorDatabase | None = None
+_list_database: AsyncIOMotorDatabase | None = None
+
+
+def client_options() -> dict:
+    options = {}
+    for option, (env_name, cast) in MONGO_CLIENT_OPTIONS.items():
+        raw = os.getenv(env_name)
+        if raw:
+            options[option] = cast(raw)
+    return options
+
 
 def get_database() -> AsyncIOMotorDatabase:
     global client, _database
     if client is None or _database is None:
         try:
-            client = AsyncIOMotorClient(MONGO_URL, uuidRepresentation="standard")
+            # latência por comando, log de operações lentas e espera no pool (/metrics)
+            client = AsyncIOMotorClient(
+                MONGO_URL,
+                uuidRepresentation="standard",
+                event_listeners=event_listeners(),
+                **client_options(),
+            )
             _database = client[DB_NAME]
         except Exception as exc:
             logging.exception("Failed to create Mongo client")
             raise RuntimeError("Database connection failed") from exc
     return _database
+
+
+def get_list_database() -> AsyncIOMotorDatabase:
+    """
+    Mesma base, com MONGO_LIST_READ_PREFERENCE: para listagens e exportações
+    que toleram dados ligeiramente atrasados. Escritas usam get_database().
+    """
+    global _list_database
+    database = get_database()
+    if LIST_READ_PREFERENCE == "primary":
+        return database
+    if _list_database is None or _list_database.client is not database.client:
+        mode = read_pref_mode_from_name(LIST_READ_PREFERENCE)
+        _list_database = database.client.get_database(
+            database.name,
+            read_preference=make_read_preference(mode, None, LIST_MAX_STALENESS_SECONDS),
+        )
+    return _list_database
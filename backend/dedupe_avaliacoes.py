@@ -0,0 +1,75 @@
+"""
+Remove avaliações repetidas do mesmo jurado ao mesmo candidato e cria o
+índice único (candidateId, jurorId) de que /evaluations/batch depende.
+
+Antes do índice nada impedia pares repetidos (ex.: POST reenviado). De
+cada par fica a avaliação mais recente (updated_at, depois _id), que é a
+que o jurado reenviou por último; as outras são apagadas e os agregados
+de ``pontuacoes`` desses candidatos são recalculados.
+
+Uso:
+    python dedupe_avaliacoes.py [--dry-run] [--batch-size 500]
+"""
+import argparse
+import asyncio
+
+from db import get_database
+from mongo_models import REQUIRED_INDEXES
+from ranking import refresh_candidates
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def duplicate_pairs(db):
+    return db.avaliacoes.aggregate(
+        [
+            {"$sort": {"candidateId": 1, "jurorId": 1, "updated_at": -1, "_id": -1}},
+            {"$group": {
+                "_id": {"candidateId": "$candidateId", "jurorId": "$jurorId"},
+                "ids": {"$push": "$_id"},
+                "count": {"$sum": 1},
+            }},
+            {"$match": {"count": {"$gt": 1}}},
+        ],
+        allowDiskUse=True,
+    )
+
+
+async def dedupe(batch_size: int = DEFAULT_BATCH_SIZE, dry_run: bool = False) -> dict:
+    db = get_database()
+    pairs = removed = 0
+    stale, candidates = [], set()
+
+    async def flush():
+        nonlocal removed, stale, candidates
+        if dry_run:
+            removed += len(stale)
+        elif stale:
+            result = await db.avaliacoes.delete_many({"_id": {"$in": stale}})
+            removed += result.deleted_count
+            await refresh_candidates(db, candidates)
+        stale, candidates = [], set()
+
+    async for pair in duplicate_pairs(db):
+        pairs += 1
+        stale.extend(pair["ids"][1:])  # o primeiro é o mais recente
+        candidates.add(pair["_id"]["candidateId"])
+        if len(stale) >= batch_size:
+            await flush()
+    await flush()
+
+    verb = "a remover" if dry_run else "removidas"
+    print(f"{pairs} pares repetidos, {removed} avaliações {verb}")
+    if not dry_run:
+        for name, models in REQUIRED_INDEXES.items():
+            created = await db[name].create_indexes(models)
+            print(f"Índices em {name}: {', '.join(created)}")
+    return {"pairs": pairs, "removed": removed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove avaliações repetidas e cria o índice único.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="só conta, não apaga nem cria índices")
+    args = parser.parse_args()
+    asyncio.run(dedupe(args.batch_size, args.dry_run))
@@ -1,17 +1,20 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from fastapi.responses import StreamingResponse
-from bson import Binary, ObjectId
+from fastapi import APIRouter, HTTPException, Request, UploadFile, File, Form
+from bson import ObjectId
 from datetime import datetime
-import io
-import base64
 
 from db import get_database  # usa a função já existente no server.py
-from mongo_models import DocumentOut, DocumentCreate, PyObjectId
+from mongo_models import DocumentOut
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+from blob_store import blob_location, release, store_bytes
+from downloads import file_download_response, gridfs_download_response, stat_upload
+from routes_crud import parse_object_id
 
 documentos_router = APIRouter(prefix="/documentos", tags=["documentos"])
 
 # ───────────────────────────────────────────────
-# UPLOAD DE DOCUMENTO
+# UPLOAD DE DOCUMENTO (armazena em GridFS)
 # ───────────────────────────────────────────────
 @documentos_router.post("/", response_model=DocumentOut, status_code=201)
 async def upload_document(
@@ -21,108 +24,110 @@ async def upload_document(
     arquivo: UploadFile = File(...),
 ):
     database = get_database()
-    from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-    from fastapi.responses import StreamingResponse
-    from bson import ObjectId
-    from datetime import datetime
-    import io
-    import base64
-
-    from db import get_database  # usa a função já existente no server.py
-    from mongo_models import DocumentOut, DocumentCreate, PyObjectId
-    from motor.motor_asyncio import AsyncIOMotorGridFSBucket
-
-    documentos_router = APIRouter(prefix="/documentos", tags=["documentos"])
-
-    # ───────────────────────────────────────────────
-    # UPLOAD DE DOCUMENTO (armazena em GridFS)
-    # ───────────────────────────────────────────────
-    @documentos_router.post("/", response_model=DocumentOut, status_code=201)
-    async def upload_document(
-        candidateId: str = Form(...),
-        type: str = Form(...),
-        description: str = Form(None),
-        arquivo: UploadFile = File(...),
-    ):
-        database = get_database()
-        candidate_oid = ObjectId(candidateId)
-
-        # lê bytes do arquivo
-        file_bytes = await arquivo.read()
-        if not file_bytes:
-            raise HTTPException(status_code=400, detail="Arquivo vazio")
-
-        now = datetime.utcnow()
-
-        # armazena arquivo em GridFS para que possa ser baixado pelo MongoDB Compass
-        bucket = AsyncIOMotorGridFSBucket(database)
-        file_id = await bucket.upload_from_stream(arquivo.filename, file_bytes)
-
-        document_doc = {
-            "candidateId": candidate_oid,
-            "type": type,
-            "originalName": arquivo.filename,
-            # expõe rota de download que usa o file_id do GridFS
-            "fileUrl": f"/documentos/{str(file_id)}/download",
-            "uploadDate": now,
-            "status": "received",
-            "description": description,
-            # guardamos referência ao arquivo no GridFS (ObjectId)
-            "file_id": file_id,
-            "content_type": arquivo.content_type,
-            "created_at": now,
-            "updated_at": now,
-        }
-
-        result = await database.documentos.insert_one(document_doc)
-        document_doc["_id"] = result.inserted_id
-        return DocumentOut.model_validate(document_doc)
-
-
-    # ───────────────────────────────────────────────
-    # LISTAR DOCUMENTOS
-    # ───────────────────────────────────────────────
-    @documentos_router.get("/", response_model=list[DocumentOut])
-    async def list_documents(candidateId: str = None):
-        database = get_database()
-        query = {}
-        if candidateId:
-            query["candidateId"] = ObjectId(candidateId)
-
-        cursor = database.documentos.find(query).sort("uploadDate", -1)
-        docs = []
-        async for doc in cursor:
-            docs.append(DocumentOut.model_validate(doc))
-        return docs
-
-
-    # ───────────────────────────────────────────────
-    # DOWNLOAD DOCUMENTO (lê do GridFS)
-    # ───────────────────────────────────────────────
-    @documentos_router.get("/{document_id}/download")
-    async def download_document(document_id: str):
-        database = get_database()
-        document = await database.documentos.find_one({"_id": ObjectId(document_id)})
-        if not document:
-            raise HTTPException(status_code=404, detail="Documento não encontrado")
-
-        file_id = document.get("file_id")
-        if not file_id:
-            raise HTTPException(status_code=404, detail="Documento sem arquivo no GridFS")
+    candidate_oid = ObjectId(candidateId)
+
+    # lê bytes do arquivo
+    file_bytes = await arquivo.read()
+    if not file_bytes:
+        raise HTTPException(status_code=400, detail="Arquivo vazio")
+
+    now = datetime.utcnow()
+
+    # armazena arquivo em GridFS para que possa ser baixado pelo MongoDB Compass;
+    # o mesmo conteúdo já enviado (por este ou outro candidato) é reaproveitado
+    blob = await store_bytes(
+        database, file_bytes, gridfs=True, filename=arquivo.filename, content_type=arquivo.content_type
+    )
+
+    document_id = ObjectId()
+    document_doc = {
+        "_id": document_id,
+        "candidateId": candidate_oid,
+        "type": type,
+        "originalName": arquivo.filename,
+        "fileUrl": f"/documentos/{document_id}/download",
+        "uploadDate": now,
+        "status": "received",
+        "description": description,
+        "content_type": arquivo.content_type,
+        "size": len(file_bytes),
+        "created_at": now,
+        "updated_at": now,
+    }
+    # sha256 + referência ao arquivo (file_id no GridFS ou file_path em disco)
+    document_doc.update(blob_location(blob))
+
+    await database.documentos.insert_one(document_doc)
+    return DocumentOut.model_validate(document_doc)
+
+
+# ───────────────────────────────────────────────
+# LISTAR DOCUMENTOS
+# ───────────────────────────────────────────────
+@documentos_router.get("/", response_model=list[DocumentOut])
+async def list_documents(candidateId: str = None):
+    database = get_database()
+    query = {}
+    if candidateId:
+        query["candidateId"] = ObjectId(candidateId)
+
+    cursor = database.documentos.find(query).sort("uploadDate", -1)
+    docs = []
+    async for doc in cursor:
+        docs.append(DocumentOut.model_validate(doc))
+    return docs
+
 
+# ───────────────────────────────────────────────
+# DOWNLOAD DOCUMENTO (lê do GridFS em streaming, com Range)
+# ───────────────────────────────────────────────
+@documentos_router.get("/{document_id}/download")
+async def download_document(document_id: str, request: Request):
+    database = get_database()
+    document = await database.documentos.find_one({"_id": ObjectId(document_id)})
+    if not document:
+        raise HTTPException(status_code=404, detail="Documento não encontrado")
+
+    filename = document.get("originalName") or document_id
+    # conteúdo partilhado com uma candidatura pode estar em disco
+    file_path = document.get("file_path")
+    uploaded = await stat_upload(file_path) if file_path else None
+    if uploaded:
+        path, stat = uploaded
+        return file_download_response(path, stat, request, filename=filename,
+                                      content_type=document.get("content_type"))
+
+    file_id = document.get("file_id")
+    if not file_id:
+        raise HTTPException(status_code=404, detail="Documento sem arquivo no GridFS")
+
+    return await gridfs_download_response(
+        database,
+        file_id,
+        request,
+        filename=filename,
+        content_type=document.get("content_type"),
+    )
+
+
+# ───────────────────────────────────────────────
+# APAGAR DOCUMENTO (liberta a referência ao blob)
+# ───────────────────────────────────────────────
+@documentos_router.delete("/{document_id}")
+async def delete_document(document_id: str):
+    database = get_database()
+    oid = parse_object_id(document_id, "Documento")
+    document = await database.documentos.find_one_and_delete({"_id": oid})
+    if not document:
+        raise HTTPException(status_code=404, detail="Documento não encontrado")
+
+    if document.get("sha256"):
+        await release(database, document["sha256"])
+    elif document.get("file_id"):
+        # documentos anteriores ao armazenamento por conteúdo têm ficheiro próprio
         bucket = AsyncIOMotorGridFSBucket(database)
-        buffer = io.BytesIO()
         try:
-            await bucket.download_to_stream(file_id, buffer)
-        except Exception:
-            raise HTTPException(status_code=404, detail="Arquivo GridFS não encontrado")
-
-        buffer.seek(0)
-        headers = {
-            "Content-Disposition": f"attachment; filename=\"{document.get('originalName') or document_id}\"",
-        }
-        return StreamingResponse(
-            buffer,
-            media_type=document.get("content_type") or "application/octet-stream",
-            headers=headers,
-        )
+            await bucket.delete(document["file_id"])
+        except NoFile:
+            pass
+    return {"status": "deleted"}
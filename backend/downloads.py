@@ -0,0 +1,324 @@
+"""
+Respostas de download partilhadas pelos routers.
+
+Lê ficheiros do GridFS bloco a bloco (sem bufferizar o ficheiro inteiro),
+serve ficheiros de UPLOAD_ROOT com ETag / Last-Modified e implementa
+pedidos condicionais (304) e parciais (Range / If-Range).
+"""
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from pathlib import Path
+from typing import AsyncIterator, Optional
+from urllib.parse import quote
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket, AsyncIOMotorGridOut
+
+from storage import UPLOAD_ROOT, run_io
+
+# os documentos podem ser substituídos no mesmo caminho: o browser guarda,
+# mas revalida sempre (o 304 custa só um stat)
+CACHE_CONTROL = "private, no-cache"
+FILE_CHUNK_SIZE = 256 * 1024
+
+
+# ───────────────────────────────────────────────
+# Cabeçalhos
+# ───────────────────────────────────────────────
+def content_disposition(filename: str, disposition: str = "attachment") -> str:
+    """
+    Content-Disposition seguro para nomes com acentos (RFC 6266 / 5987).
+    """
+    ascii_name = filename.encode("ascii", "replace").decode("ascii").replace('"', "'")
+    return f"{disposition}; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}"
+
+
+def http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def parse_http_date(value: str) -> Optional[datetime]:
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+# ───────────────────────────────────────────────
+# Pedidos condicionais (If-None-Match / If-Modified-Since)
+# ───────────────────────────────────────────────
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in candidates or etag.removeprefix("W/") in candidates
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        since = parse_http_date(if_modified_since)
+        if since is not None:
+            if last_modified.tzinfo is None:
+                last_modified = last_modified.replace(tzinfo=timezone.utc)
+            return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def not_modified_response(headers: dict) -> Response:
+    kept = {key: value for key, value in headers.items() if key in {"ETag", "Last-Modified", "Cache-Control"}}
+    return Response(status_code=304, headers=kept)
+
+
+# ───────────────────────────────────────────────
+# Range / If-Range
+# ───────────────────────────────────────────────
+def parse_range(range_header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """
+    Interpreta ``Range: bytes=...`` e devolve (início, fim) inclusivos.
+
+    Devolve None quando o cabeçalho não existe, é inválido ou pede vários
+    intervalos (nesses casos serve-se o ficheiro inteiro, o que a RFC 9110
+    permite). Levanta 416 quando o intervalo não cabe no ficheiro.
+    """
+    if not range_header:
+        return None
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first == "":
+            suffix = int(last)
+            if suffix <= 0:
+                raise ValueError
+            start, end = max(size - suffix, 0), size - 1
+        else:
+            start = int(first)
+            end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Intervalo pedido fora do ficheiro",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    if start < 0 or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def if_range_allows(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """
+    Com If-Range, só se responde parcialmente se o ficheiro não mudou.
+    """
+    if_range = request.headers.get("if-range")
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == etag and not etag.startswith("W/")
+    since = parse_http_date(if_range)
+    if since is None or last_modified is None:
+        return False
+    return http_date(last_modified) == http_date(since)
+
+
+def requested_range(request: Request, size: int, etag: str,
+                    last_modified: Optional[datetime]) -> Optional[tuple[int, int]]:
+    if not if_range_allows(request, etag, last_modified):
+        return None
+    return parse_range(request.headers.get("range"), size)
+
+
+def ranged_headers(headers: dict, byte_range: Optional[tuple[int, int]], size: int) -> tuple[int, dict]:
+    """
+    Completa os cabeçalhos de tamanho/intervalo e devolve (status, headers).
+    """
+    headers["Accept-Ranges"] = "bytes"
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return 200, headers
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return 206, headers
+
+
+# ───────────────────────────────────────────────
+# GridFS em streaming
+# ───────────────────────────────────────────────
+async def iter_gridfs(grid_out: AsyncIOMotorGridOut, start: int = 0,
+                      end: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    Lê do GridFS um chunk de cada vez, entre start e end (inclusivos).
+    """
+    if end is None:
+        end = grid_out.length - 1
+    remaining = end - start + 1
+    if start:
+        grid_out.seek(start)
+    try:
+        while remaining > 0:
+            chunk = await grid_out.readchunk()
+            if not chunk:
+                break
+            if len(chunk) > remaining:
+                chunk = chunk[:remaining]
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        grid_out.close()
+
+
+async def gridfs_download_response(database, file_id, request: Request, filename: Optional[str] = None,
+                                   content_type: Optional[str] = None) -> Response:
+    """
+    Resposta em streaming de um ficheiro do GridFS, com suporte a Range.
+    """
+    bucket = AsyncIOMotorGridFSBucket(database)
+    try:
+        grid_out = await bucket.open_download_stream(file_id)
+    except NoFile:
+        raise HTTPException(status_code=404, detail="Arquivo GridFS não encontrado")
+
+    size = grid_out.length
+    # ficheiros GridFS são imutáveis: o file_id identifica o conteúdo
+    etag = f'"{file_id}"'
+    last_modified = grid_out.upload_date
+    headers = {
+        "Content-Disposition": content_disposition(filename or grid_out.filename or str(file_id)),
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL,
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if is_not_modified(request, etag, last_modified):
+        grid_out.close()
+        return not_modified_response(headers)
+
+    byte_range = requested_range(request, size, etag, last_modified) if size else None
+    status_code, headers = ranged_headers(headers, byte_range, size)
+    start, end = byte_range or (0, size - 1)
+    return StreamingResponse(
+        iter_gridfs(grid_out, start, end),
+        status_code=status_code,
+        media_type=content_type or "application/octet-stream",
+        headers=headers,
+    )
+
+
+# ───────────────────────────────────────────────
+# Ficheiros em disco (UPLOAD_ROOT)
+# ───────────────────────────────────────────────
+def _stat_upload(file_path: str) -> Optional[tuple[Path, os.stat_result]]:
+    path = Path(file_path).resolve()
+    if not path.is_relative_to(UPLOAD_ROOT.resolve()):
+        return None
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return (path, stat) if path.is_file() else None
+
+
+async def stat_upload(file_path: str) -> Optional[tuple[Path, os.stat_result]]:
+    """
+    Devolve (caminho, stat) se o ficheiro existir dentro de UPLOAD_ROOT.
+    """
+    return await run_io(_stat_upload, file_path)
+
+
+class FileRangeResponse(Response):
+    """
+    Envia um intervalo de um ficheiro em disco.
+
+    Usa a extensão ASGI ``http.response.zerocopysend`` (sendfile do kernel)
+    quando o servidor a anuncia; caso contrário lê com ``os.pread`` no pool
+    de I/O, sem nunca bloquear o event loop.
+    """
+
+    def __init__(self, path: Path, start: int, count: int, status_code: int, headers: dict, media_type: str):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.count = count
+
+    async def __call__(self, scope, receive, send) -> None:
+        fd = await run_io(os.open, self.path, os.O_RDONLY)
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": fd,
+                    "offset": self.start,
+                    "count": self.count,
+                })
+                return
+            offset, remaining = self.start, self.count
+            while remaining > 0:
+                chunk = await run_io(os.pread, fd, min(FILE_CHUNK_SIZE, remaining), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0 or self.count == 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            await run_io(os.close, fd)
+
+
+async def iter_file(path: Path, start: int = 0, count: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    Lê um ficheiro em blocos no pool de I/O (para respostas compostas, ex.: ZIP).
+    """
+    fd = await run_io(os.open, path, os.O_RDONLY)
+    try:
+        offset = start
+        remaining = count if count is not None else float("inf")
+        while remaining > 0:
+            chunk = await run_io(os.pread, fd, int(min(FILE_CHUNK_SIZE, remaining)), offset)
+            if not chunk:
+                break
+            offset += len(chunk)
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await run_io(os.close, fd)
+
+
+def file_download_response(path: Path, stat: os.stat_result, request: Request, filename: Optional[str] = None,
+                           content_type: Optional[str] = None) -> Response:
+    """
+    Resposta para um ficheiro de UPLOAD_ROOT com ETag, Last-Modified, 304 e 206.
+    """
+    size = stat.st_size
+    etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+    last_modified = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+    headers = {
+        "Content-Disposition": content_disposition(filename or path.name),
+        "ETag": etag,
+        "Last-Modified": http_date(last_modified),
+        "Cache-Control": CACHE_CONTROL,
+    }
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(headers)
+
+    byte_range = requested_range(request, size, etag, last_modified) if size else None
+    status_code, headers = ranged_headers(headers, byte_range, size)
+    start, end = byte_range or (0, size - 1)
+    return FileRangeResponse(
+        path,
+        start,
+        end - start + 1,
+        status_code=status_code,
+        headers=headers,
+        media_type=content_type or "application/octet-stream",
+    )
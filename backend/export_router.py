@@ -0,0 +1,156 @@
+"""
+Exportação de candidaturas em CSV ou NDJSON, em streaming.
+
+As linhas saem diretamente do cursor do Motor: o cabeçalho (CSV) ou a
+primeira linha (NDJSON) é enviado logo, o resto em blocos de FLUSH_BYTES ou
+a cada FLUSH_SECONDS, mesmo enquanto o cursor espera pela próxima linha
+(filtros muito seletivos demoram a encher um bloco), e a memória não cresce
+com o tamanho da exportação. Cada documento embutido
+em ``applications.documents`` dá uma linha (candidaturas sem documentos dão
+uma linha com as colunas de documento vazias).
+"""
+import asyncio
+import csv
+import io
+import json
+import time
+from datetime import datetime
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from db import get_list_database
+from downloads import content_disposition
+
+router = APIRouter(tags=["exportacao"])
+
+APPLICATION_COLUMNS = [
+    "first_name", "last_name", "email", "phone", "city", "address",
+    "category", "years_experience", "municipality", "accepted_terms", "created_at",
+]
+DOCUMENT_COLUMNS = ["id", "type", "name", "content_type", "size", "download_url"]
+EXPORT_COLUMNS = ["application_id"] + APPLICATION_COLUMNS + [f"document_{name}" for name in DOCUMENT_COLUMNS]
+
+CURSOR_BATCH_SIZE = 500
+FLUSH_BYTES = 64 * 1024
+FLUSH_SECONDS = 1.0
+
+
+def _scalar(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def flatten_application(doc: dict) -> Iterator[dict]:
+    base = {"application_id": str(doc["_id"])}
+    base.update({name: _scalar(doc.get(name)) for name in APPLICATION_COLUMNS})
+    documents = doc.get("documents") or [{}]
+    for document in documents:
+        row = dict(base)
+        row.update({f"document_{name}": _scalar(document.get(name)) for name in DOCUMENT_COLUMNS})
+        yield row
+
+
+async def iter_rows(query: dict) -> AsyncIterator[dict]:
+    database = get_list_database()
+    projection = {name: 1 for name in APPLICATION_COLUMNS + ["documents"]}
+    cursor = database.applications.find(query, projection, batch_size=CURSOR_BATCH_SIZE).sort("created_at", 1)
+    async for doc in cursor:
+        for row in flatten_application(doc):
+            yield row
+
+
+async def stream_rows(query: dict, render: Callable[[dict], str], head: bytes = b"",
+                      flush_first: bool = False) -> AsyncIterator[bytes]:
+    """
+    Envia ``head`` e junta as linhas em blocos de FLUSH_BYTES. O que estiver
+    em buffer sai ao fim de FLUSH_SECONDS mesmo com o cursor parado à espera
+    da próxima linha; ``flush_first`` envia logo a primeira.
+    """
+    if head:
+        yield head
+    rows = iter_rows(query)
+    chunk, size = [], 0
+    flush_at = None if flush_first else time.monotonic() + FLUSH_SECONDS
+    # a leitura do cursor fica pendente entre envios: não é cancelada no timeout
+    next_row = None
+    try:
+        while True:
+            if next_row is None:
+                next_row = asyncio.ensure_future(rows.__anext__())
+            timeout = max(0.0, flush_at - time.monotonic()) if chunk and flush_at is not None else None
+            done, _ = await asyncio.wait({next_row}, timeout=timeout)
+            if done:
+                try:
+                    row = next_row.result()
+                except StopAsyncIteration:
+                    next_row = None
+                    break
+                next_row = None
+                line = render(row)
+                chunk.append(line)
+                size += len(line)
+            if chunk and (flush_at is None or size >= FLUSH_BYTES or time.monotonic() >= flush_at):
+                yield "".join(chunk).encode("utf-8")
+                chunk, size = [], 0
+                flush_at = time.monotonic() + FLUSH_SECONDS
+        if chunk:
+            yield "".join(chunk).encode("utf-8")
+    finally:
+        if next_row is not None:
+            next_row.cancel()
+            await asyncio.gather(next_row, return_exceptions=True)
+        await rows.aclose()
+
+
+def iter_csv(query: dict) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    # BOM para o Excel reconhecer UTF-8; o cabeçalho sai de imediato
+    head = ("\ufeff" + buffer.getvalue()).encode("utf-8")
+
+    def render(row: dict) -> str:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        return buffer.getvalue()
+
+    return stream_rows(query, render, head=head)
+
+
+def ndjson_line(row: dict) -> str:
+    return json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def iter_ndjson(query: dict) -> AsyncIterator[bytes]:
+    # a primeira linha sai logo, como o cabeçalho do CSV
+    return stream_rows(query, ndjson_line, flush_first=True)
+
+
+@router.get("/applications/export")
+async def export_applications(format: str = "csv", category: Optional[str] = None,
+                              municipality: Optional[str] = None):
+    """
+    Exporta candidaturas (e metadados dos documentos) em ``csv`` ou ``ndjson``.
+    """
+    query = {}
+    if category:
+        query["category"] = category
+    if municipality:
+        query["municipality"] = municipality
+
+    stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    if format == "csv":
+        body, media_type = iter_csv(query), "text/csv; charset=utf-8"
+    elif format == "ndjson":
+        body, media_type = iter_ndjson(query), "application/x-ndjson"
+    else:
+        raise HTTPException(status_code=400, detail="format deve ser csv ou ndjson")
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": content_disposition(f"candidaturas-{stamp}.{format}")},
+    )
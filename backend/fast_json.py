@@ -0,0 +1,57 @@
+"""
+Serialização rápida das listagens lidas do Mongo.
+
+As listagens devolvem a resposta já codificada com orjson (ObjectId e
+datetime tratados diretamente), sem passar pelos modelos Pydantic nem pelo
+``response_model`` do FastAPI: os documentos vêm com a projeção do modelo
+e o que está gravado foi validado na escrita. O ``response_model`` fica
+nas rotas só para o esquema OpenAPI.
+"""
+from functools import lru_cache
+from typing import Iterable, List, Tuple
+
+import orjson
+from bson import Decimal128, ObjectId
+from fastapi.responses import JSONResponse
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class MongoJSONResponse(JSONResponse):
+    """
+    JSONResponse codificada com orjson; aceita ObjectId/datetime nos dados.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+@lru_cache(maxsize=None)
+def output_fields(model) -> Tuple[Tuple[str, object], ...]:
+    """
+    (chave de saída, valor por omissão) dos campos do modelo, pela ordem do modelo.
+    """
+    fields = []
+    for name, field in model.model_fields.items():
+        default = None if field.is_required() or field.default_factory else field.default
+        fields.append((field.alias or name, default))
+    return tuple(fields)
+
+
+def trusted_items(docs: Iterable[dict], model) -> List[dict]:
+    """
+    Documentos Mongo com as chaves do esquema de ``model`` (``_id`` incluído),
+    sem validação.
+    """
+    fields = output_fields(model)
+    return [{key: doc.get(key, default) for key, default in fields} for doc in docs]
@@ -0,0 +1,78 @@
+"""
+Liveness e readiness da API, com o estado do pool de ligações ao Mongo.
+
+``/api/health`` só confirma que o processo responde. ``/api/health/ready``
+faz ping ao Mongo (503 se falhar) e devolve, por servidor, ligações abertas,
+em uso, utilização face a maxPoolSize e espera média/máxima no checkout —
+dados para dimensionar MONGO_MAX_POOL_SIZE pelo número de workers.
+"""
+import asyncio
+import os
+import time
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+import mongo_monitoring
+from db import get_database
+from mongo_models import missing_required_indexes
+
+router = APIRouter(tags=["saúde"])
+
+HEALTH_PING_TIMEOUT_SECONDS = float(os.getenv("HEALTH_PING_TIMEOUT_SECONDS", "2"))
+
+
+def pool_summary(database) -> dict:
+    pool_options = database.client.options.pool_options
+    max_pool_size = pool_options.max_pool_size
+    summary = {
+        "max_pool_size": max_pool_size,
+        "min_pool_size": pool_options.min_pool_size,
+        "wait_queue_timeout_s": pool_options.wait_queue_timeout,
+        "servers": {},
+    }
+    if mongo_monitoring.pool_listener is None:
+        summary["servers"] = None  # MONGO_MONITORING=false
+        return summary
+    for address, stats in mongo_monitoring.pool_listener.snapshot().items():
+        checkouts = stats["checkouts"]
+        summary["servers"][address] = {
+            "open": stats["open"],
+            "in_use": stats["in_use"],
+            "utilization": round(stats["in_use"] / max_pool_size, 3) if max_pool_size else None,
+            "checkouts": checkouts,
+            "checkout_failures": stats["checkout_failures"],
+            "wait_mean_ms": round(stats["wait_total_s"] / checkouts * 1000, 3) if checkouts else 0.0,
+            "wait_max_ms": round(stats["wait_max_s"] * 1000, 3),
+        }
+    return summary
+
+
+@router.get("/health")
+async def liveness():
+    return {"status": "ok"}
+
+
+@router.get("/health/ready")
+async def readiness():
+    """
+    Pronto a receber tráfego: Mongo responde ao ping dentro do prazo e os
+    índices únicos obrigatórios existem.
+    """
+    database = get_database()
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(database.command("ping"), HEALTH_PING_TIMEOUT_SECONDS)
+        mongo = {"status": "ok", "ping_ms": round((time.perf_counter() - started) * 1000, 2)}
+        missing = await asyncio.wait_for(missing_required_indexes(database), HEALTH_PING_TIMEOUT_SECONDS)
+        if missing:
+            mongo.update(status="error", missing_indexes=missing)
+    except Exception as exc:
+        mongo = {"status": "error", "error": str(exc) or type(exc).__name__}
+    status_code = 200 if mongo["status"] == "ok" else 503
+    body = {
+        "status": "ok" if status_code == 200 else "unavailable",
+        "mongo": mongo,
+        "pool": pool_summary(database),
+    }
+    return JSONResponse(body, status_code=status_code)
@@ -0,0 +1,201 @@
+"""
+Importação em massa de candidatos e jurados (CSV ou NDJSON).
+
+O corpo do pedido é lido em streaming, linha a linha; as linhas são
+validadas com os modelos *Create e gravadas em lotes com ``insert_many``
+não ordenado. Só um lote está em memória de cada vez. A resposta traz o
+relatório por linha (validação e violações de índice único, ex.: email).
+"""
+import codecs
+import csv
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from db import get_database
+from mongo_models import CandidateCreate, JurorCreate
+from search import with_search_terms
+
+router = APIRouter(tags=["importacao"])
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+MAX_REPORTED_ERRORS = 1000
+DUPLICATE_KEY = 11000
+
+
+# ───────────────────────────────────────────────
+# Leitura do corpo em streaming
+# ───────────────────────────────────────────────
+async def iter_lines(request: Request) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        yield pending.rstrip("\r")
+
+
+async def iter_csv_rows(request: Request) -> AsyncIterator[tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Produz (nº da linha, registo, erro). Campos entre aspas podem ter quebras
+    de linha: junta linhas até o número de aspas ser par.
+    """
+    header: Optional[List[str]] = None
+    record, record_line, line_number = "", 0, 0
+    async for line in iter_lines(request):
+        line_number += 1
+        record = f"{record}\n{line}" if record else line
+        record_line = record_line or line_number
+        if record.count('"') % 2:
+            continue
+        text, row_number, record, record_line = record, record_line, "", 0
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield row_number, None, f"esperadas {len(header)} colunas, encontradas {len(values)}"
+            continue
+        yield row_number, {key: value for key, value in zip(header, values) if value != ""}, None
+    if record:
+        yield record_line, None, "aspas por fechar"
+
+
+async def iter_ndjson_rows(request: Request) -> AsyncIterator[tuple[int, Optional[dict], Optional[str]]]:
+    line_number = 0
+    async for line in iter_lines(request):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield line_number, None, f"JSON inválido: {exc}"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "cada linha deve ser um objeto JSON"
+            continue
+        yield line_number, row, None
+
+
+def rows_for(request: Request, format: Optional[str]):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    kind = (format or "").lower() or ("csv" if content_type in {"text/csv", "application/csv"} else "ndjson")
+    if kind == "csv":
+        return iter_csv_rows(request)
+    if kind in {"ndjson", "jsonl"}:
+        return iter_ndjson_rows(request)
+    raise HTTPException(status_code=415, detail="Formato suportado: csv ou ndjson")
+
+
+# ───────────────────────────────────────────────
+# Gravação em lotes
+# ───────────────────────────────────────────────
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+
+    def error(self, row: int, message) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda item: item["row"]),
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def _validation_messages(exc: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in exc.errors()]
+
+
+async def _flush(collection, batch: List[tuple[int, dict]], report: ImportReport) -> None:
+    if not batch:
+        return
+    try:
+        result = await collection.insert_many([doc for _, doc in batch], ordered=False)
+        report.inserted += len(result.inserted_ids)
+    except BulkWriteError as exc:
+        details = exc.details
+        report.inserted += details.get("nInserted", 0)
+        for write_error in details.get("writeErrors", []):
+            row_number = batch[write_error["index"]][0]
+            if write_error.get("code") == DUPLICATE_KEY:
+                fields = ", ".join(write_error.get("keyValue", {}) or ["chave única"])
+                report.error(row_number, f"duplicado ({fields})")
+            else:
+                report.error(row_number, write_error.get("errmsg", "erro de escrita"))
+
+
+async def import_rows(rows, collection, model, prepare) -> dict:
+    report = ImportReport()
+    batch: List[tuple[int, dict]] = []
+    async for row_number, row, error in rows:
+        report.rows += 1
+        if error:
+            report.error(row_number, error)
+            continue
+        try:
+            payload = model(**row)
+        except ValidationError as exc:
+            report.error(row_number, _validation_messages(exc))
+            continue
+        batch.append((row_number, prepare(payload)))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await _flush(collection, batch, report)
+            batch = []
+    await _flush(collection, batch, report)
+    return report.as_dict()
+
+
+def _candidate_doc(payload: CandidateCreate) -> dict:
+    doc = with_search_terms("candidatos", payload.dict())
+    doc["created_at"] = doc["updated_at"] = payload.registrationDate
+    return doc
+
+
+def _juror_doc(payload: JurorCreate) -> dict:
+    doc = with_search_terms("jurados", payload.dict())
+    doc["created_at"] = doc["updated_at"] = datetime.utcnow()
+    return doc
+
+
+# ───────────────────────────────────────────────
+# Rotas
+# ───────────────────────────────────────────────
+@router.post("/candidates/import")
+async def import_candidates(request: Request, format: Optional[str] = None):
+    """
+    Importa candidatos. Envie ``text/csv`` (com cabeçalho) ou
+    ``application/x-ndjson``; ``?format=csv|ndjson`` força o formato.
+    """
+    db = get_database()
+    return await import_rows(rows_for(request, format), db.candidatos, CandidateCreate, _candidate_doc)
+
+
+@router.post("/jurors/import")
+async def import_jurors(request: Request, format: Optional[str] = None):
+    """
+    Importa jurados (mesmos formatos de /candidates/import).
+    """
+    db = get_database()
+    return await import_rows(rows_for(request, format), db.jurados, JurorCreate, _juror_doc)
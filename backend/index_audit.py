@@ -0,0 +1,148 @@
+"""
+Auditoria de índices: corre ``explain`` sobre a forma da consulta de cada
+rota e assinala COLLSCAN, SORT em memória e consultas lentas.
+
+Uso:
+    # no arranque da API
+    $env:INDEX_AUDIT = "1"
+    # ou isoladamente
+    .venv\\Scripts\\python.exe index_audit.py
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import List
+
+from bson import ObjectId
+
+from db import get_database
+from pagination import KEYSET_SORT
+
+logger = logging.getLogger("prentma.index_audit")
+
+SLOW_MS = int(os.getenv("INDEX_AUDIT_SLOW_MS", "100"))
+
+_ANY_ID = ObjectId()
+_ANY_DATE = datetime(2000, 1, 1)
+
+# (rota, coleção, filtro, ordenação) — valores fictícios, só interessa a forma
+QUERY_SHAPES = [
+    ("GET /api/applications", "applications", {}, [("created_at", -1)]),
+    ("GET /api/applications/{id}/documents/{doc}", "application_documents",
+     {"_id": _ANY_ID, "application_id": _ANY_ID}, None),
+    ("GET /api/candidates", "candidatos", {}, KEYSET_SORT),
+    ("GET /api/candidates?categoryId", "candidatos", {"categoryId": _ANY_ID}, KEYSET_SORT),
+    ("GET /api/categories", "categories", {}, KEYSET_SORT),
+    ("GET /api/events", "events", {}, KEYSET_SORT),
+    ("GET /api/jurors", "jurados", {}, KEYSET_SORT),
+    ("GET /api/evaluations", "avaliacoes", {}, KEYSET_SORT),
+    ("GET /api/results", "resultados", {}, KEYSET_SORT),
+    ("GET /documentos", "documentos", {}, [("uploadDate", -1)]),
+    ("GET /documentos?candidateId", "documentos", {"candidateId": _ANY_ID}, [("uploadDate", -1)]),
+    ("avaliacoes por candidato (pontuações)", "avaliacoes", {"candidateId": {"$in": [_ANY_ID]}}, None),
+    ("GET /api/categories/{id}/leaderboard", "pontuacoes", {"categoryId": _ANY_ID},
+     [("mean", -1), ("count", -1), ("_id", 1)]),
+    # pesquisa com facetas: o $match + $sort antes do $facet
+    ("GET /api/applications/search", "applications", {}, KEYSET_SORT),
+    ("GET /api/applications/search?category", "applications", {"category": "x"}, KEYSET_SORT),
+    ("GET /api/applications/search?municipality", "applications", {"municipality": {"$in": ["x", "y"]}}, KEYSET_SORT),
+    ("GET /api/applications/search?city", "applications", {"city": "x"}, KEYSET_SORT),
+    ("GET /api/applications/search?years_experience", "applications", {"years_experience": {"$in": ["1", 1]}},
+     KEYSET_SORT),
+    ("GET /api/applications/search?category&municipality", "applications",
+     {"category": "x", "municipality": "y"}, KEYSET_SORT),
+    ("GET /api/applications/export", "applications", {"category": "x"}, [("created_at", 1)]),
+    ("GET /api/applications/export?municipality", "applications", {"municipality": "x"}, [("created_at", 1)]),
+    # pesquisa (search.py); o modo texto ordena por textScore, sempre em memória
+    ("GET /api/search (prefixo)", "candidatos", {"search_terms": {"$regex": "^ana"}}, None),
+    ("GET /api/search (prefixo)", "applications", {"search_terms": {"$regex": "^ana"}}, None),
+    ("GET /api/search (prefixo)", "jurados", {"search_terms": {"$regex": "^ana"}}, None),
+    ("GET /api/search (várias palavras)", "applications", {"$or": [
+        {"search_terms": {"$regex": "^ana sil"}},
+        {"$and": [{"search_terms": {"$regex": "^ana"}}, {"search_terms": {"$regex": "^sil"}}]},
+    ]}, None),
+    ("GET /api/search?mode=text", "candidatos", {"$text": {"$search": "ana"}}, None),
+    ("GET /api/search?mode=text", "applications", {"$text": {"$search": "ana"}}, None),
+    ("GET /api/search?mode=text", "jurados", {"$text": {"$search": "ana"}}, None),
+    # upsert de /api/evaluations/batch
+    ("POST /api/evaluations/batch", "avaliacoes", {"candidateId": _ANY_ID, "jurorId": _ANY_ID}, None),
+    # polling de /api/live/results sem change streams
+    ("GET /api/live/results (polling)", "avaliacoes", {"$or": [
+        {"updated_at": {"$gt": _ANY_DATE}}, {"updated_at": _ANY_DATE, "_id": {"$gt": _ANY_ID}},
+    ]}, [("updated_at", 1), ("_id", 1)]),
+    ("GET /api/live/results (polling)", "resultados", {"$or": [
+        {"updated_at": {"$gt": _ANY_DATE}}, {"updated_at": _ANY_DATE, "_id": {"$gt": _ANY_ID}},
+    ]}, [("updated_at", 1), ("_id", 1)]),
+]
+
+
+def _plan_stages(plan: dict) -> List[str]:
+    """
+    Percorre a árvore do plano vencedor e devolve os nomes dos estágios.
+    """
+    if not isinstance(plan, dict):
+        return []
+    stages = [plan["stage"]] if "stage" in plan else []
+    for key in ("inputStage", "queryPlan", "outerStage", "innerStage"):
+        stages += _plan_stages(plan.get(key))
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+
+async def audit_query(database, route: str, collection: str, query: dict, sort) -> dict:
+    cursor = database[collection].find(query).limit(50)
+    if sort:
+        cursor = cursor.sort(sort)
+    explain = await cursor.explain()
+    stages = [stage.upper() for stage in _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))]
+    stats = explain.get("executionStats", {})
+    problems = []
+    if "COLLSCAN" in stages:
+        problems.append("COLLSCAN")
+    if "SORT" in stages:
+        problems.append("SORT em memória")
+    elapsed = stats.get("executionTimeMillis")
+    if elapsed is not None and elapsed > SLOW_MS:
+        problems.append(f"lenta ({elapsed} ms)")
+    return {
+        "route": route,
+        "collection": collection,
+        "stages": stages,
+        "docs_examined": stats.get("totalDocsExamined"),
+        "returned": stats.get("nReturned"),
+        "time_ms": elapsed,
+        "problems": problems,
+    }
+
+
+async def run_index_audit(database=None) -> List[dict]:
+    """
+    Audita todas as formas de consulta e regista no log as problemáticas.
+    """
+    database = database if database is not None else get_database()
+    reports = await asyncio.gather(
+        *(audit_query(database, *shape) for shape in QUERY_SHAPES), return_exceptions=True
+    )
+    results = []
+    for shape, report in zip(QUERY_SHAPES, reports):
+        if isinstance(report, Exception):
+            logger.error("Auditoria falhou para %s: %s", shape[0], report)
+            continue
+        results.append(report)
+        if report["problems"]:
+            logger.warning(
+                "Índice em falta para %s (%s): %s — plano %s",
+                report["route"], report["collection"], ", ".join(report["problems"]), " > ".join(report["stages"]),
+            )
+    logger.info("Auditoria de índices: %d/%d consultas sem problemas",
+                sum(1 for report in results if not report["problems"]), len(QUERY_SHAPES))
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    for item in asyncio.run(run_index_audit()):
+        status = ", ".join(item["problems"]) or "ok"
+        print(f"{item['route']:<50} {item['collection']:<22} {status}")
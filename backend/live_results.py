@@ -0,0 +1,265 @@
+"""
+Resultados e avaliações em direto por Server-Sent Events.
+
+``GET /api/live/results`` mantém a ligação aberta e envia cada inserção ou
+alteração em ``resultados`` e ``avaliacoes``. Por processo há um único
+leitor a montante, partilhado por todos os clientes ligados, que distribui
+os eventos pelas filas de cada subscritor:
+
+ - change stream do Mongo (replica set / Atlas), com ``updateLookup`` para
+   enviar o documento completo. Uma falha a meio (rede, eleição) reabre o
+   stream com o resume token do último evento, com backoff;
+ - se o servidor não suporta change streams (mongod standalone) ou com
+   LIVE_MODE=poll (testes com mongomock), consulta a cada
+   LIVE_POLL_INTERVAL_SECONDS só o que mudou por (updated_at, _id), a partir
+   do último evento visto, com o índice dessas chaves. Remoções não são
+   vistas neste modo.
+
+O leitor arranca com o primeiro cliente e pára quando sai o último; um
+cliente lento perde eventos em vez de atrasar os outros.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Set
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pymongo.errors import OperationFailure, PyMongoError
+
+from db import get_database
+from fast_json import dumps
+
+logger = logging.getLogger("prentma.live")
+
+router = APIRouter(tags=["direto"])
+
+# nome na API -> coleção
+LIVE_SOURCES = {"results": "resultados", "evaluations": "avaliacoes"}
+
+LIVE_POLL_INTERVAL_SECONDS = float(os.getenv("LIVE_POLL_INTERVAL_SECONDS", "2"))
+LIVE_HEARTBEAT_SECONDS = float(os.getenv("LIVE_HEARTBEAT_SECONDS", "15"))
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "256"))
+LIVE_POLL_BATCH = int(os.getenv("LIVE_POLL_BATCH", "500"))
+# auto: change stream com fallback para polling; poll: sempre polling
+LIVE_MODE = os.getenv("LIVE_MODE", "auto")
+
+# 40573: $changeStream só em replica set / sharded; 136: change streams desativados
+CHANGE_STREAMS_UNSUPPORTED = {40573, 136}
+CHANGE_STREAM_HISTORY_LOST = 286
+
+
+def sse_message(event: dict) -> bytes:
+    return b"event: change\ndata: " + dumps(event) + b"\n\n"
+
+
+class LiveFeed:
+    def __init__(self, sources: Dict[str, str] = LIVE_SOURCES, mode: str = LIVE_MODE):
+        self.collections = tuple(sources.values())
+        self.mode = mode
+        self.upstream: Optional[str] = None  # "change_stream" | "polling"
+        self.dropped = 0
+        self.reconnects = 0
+        self._resume_token = None
+        # updated_at (ou hora no cluster) do último evento publicado
+        self._last_event_at: Optional[datetime] = None
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    # subscritores ──────────────────────────────
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: dict) -> None:
+        item = (event["collection"], sse_message(event))
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(item)
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self._subscribers.clear()
+
+    # leitura a montante ────────────────────────
+    async def _run(self) -> None:
+        database = get_database()
+        if self.mode != "poll":
+            try:
+                await self._watch(database)
+            except asyncio.CancelledError:
+                raise
+            except (OperationFailure, NotImplementedError) as exc:
+                logger.info("Change streams indisponíveis (%s); a usar polling por updated_at", exc)
+        # continua do último evento visto; sem eventos, a partir de agora
+        await self._poll(database, self._last_event_at or datetime.utcnow())
+
+    async def _watch(self, database) -> None:
+        """
+        Change stream com retoma: após uma falha (rede, eleição de primário)
+        reabre com ``resume_after`` do último evento, com backoff. Só sai
+        (para polling) se o servidor não suportar change streams.
+        """
+        pipeline = [{"$match": {
+            "ns.coll": {"$in": list(self.collections)},
+            "operationType": {"$in": ["insert", "update", "replace", "delete"]},
+        }}]
+        attempt = 0
+        while True:
+            try:
+                async with database.watch(
+                    pipeline, full_document="updateLookup", resume_after=self._resume_token
+                ) as stream:
+                    self.upstream = "change_stream"
+                    attempt = 0
+                    logger.info("Resultados em direto: change stream em %s", ", ".join(self.collections))
+                    async for change in stream:
+                        self._publish_change(change)
+                        self._resume_token = stream.resume_token
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as exc:
+                if exc.code in CHANGE_STREAMS_UNSUPPORTED:
+                    raise
+                if exc.code == CHANGE_STREAM_HISTORY_LOST:
+                    # o token saiu do oplog: recupera por updated_at e recomeça sem token
+                    logger.error("Change stream sem histórico para retomar; a recuperar por updated_at")
+                    self._resume_token = None
+                    try:
+                        await self._catch_up(database)
+                        continue
+                    except PyMongoError as catch_up_error:
+                        logger.error("Recuperação por updated_at falhou: %s", catch_up_error)
+                logger.error("Change stream falhou (%s); nova tentativa", exc)
+            except NotImplementedError:
+                raise
+            except Exception as exc:
+                logger.error("Change stream falhou (%s); nova tentativa", exc)
+            self.upstream = "reconnecting"
+            self.reconnects += 1
+            await asyncio.sleep(min(30.0, 0.5 * 2 ** attempt))
+            attempt += 1
+
+    def _publish_change(self, change: dict) -> None:
+        document = change.get("fullDocument")
+        self._last_event_at = (
+            (document or {}).get("updated_at")
+            or change.get("wallTime")
+            or change["clusterTime"].as_datetime().replace(tzinfo=None)
+        )
+        self.publish({
+            "collection": change["ns"]["coll"],
+            "operation": change["operationType"],
+            "_id": change["documentKey"]["_id"],
+            "document": document,
+        })
+
+    async def _catch_up(self, database) -> None:
+        since = self._last_event_at or datetime.utcnow()
+        for name in self.collections:
+            last_at, last_id = since, None
+            while True:
+                position = await self._poll_collection(database[name], name, last_at, last_id)
+                if position == (last_at, last_id):
+                    break
+                last_at, last_id = position
+
+    async def _poll(self, database, since: datetime) -> None:
+        self.upstream = "polling"
+        # posição (updated_at, _id) do último documento enviado, por coleção
+        positions = {name: (since, None) for name in self.collections}
+        while True:
+            for name in self.collections:
+                try:
+                    positions[name] = await self._poll_collection(database[name], name, *positions[name])
+                except PyMongoError as exc:
+                    logger.error("Polling de %s falhou: %s", name, exc)
+            await asyncio.sleep(LIVE_POLL_INTERVAL_SECONDS)
+
+    async def _poll_collection(self, collection, name: str, last_at: datetime, last_id):
+        if last_id is None:
+            # inclui o próprio instante: repetir um evento é melhor que perdê-lo
+            query = {"updated_at": {"$gte": last_at}}
+        else:
+            query = {"$or": [
+                {"updated_at": {"$gt": last_at}},
+                {"updated_at": last_at, "_id": {"$gt": last_id}},
+            ]}
+        cursor = collection.find(query).sort([("updated_at", 1), ("_id", 1)]).limit(LIVE_POLL_BATCH)
+        async for doc in cursor:
+            operation = "insert" if doc.get("created_at") == doc["updated_at"] else "update"
+            self.publish({"collection": name, "operation": operation, "_id": doc["_id"], "document": doc})
+            last_at, last_id = doc["updated_at"], doc["_id"]
+            self._last_event_at = max(self._last_event_at or last_at, last_at)
+        return last_at, last_id
+
+
+feed = LiveFeed()
+
+
+# ───────────────────────────────────────────────
+# Rota SSE
+# ───────────────────────────────────────────────
+async def event_stream(request: Request, collections: Iterable[str]):
+    wanted = set(collections)
+    queue = feed.subscribe()
+    try:
+        yield b"retry: 3000\n\n"
+        while not await request.is_disconnected():
+            try:
+                collection, message = await asyncio.wait_for(queue.get(), LIVE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # comentário SSE: mantém proxies e balanceadores com a ligação aberta
+                yield b": ping\n\n"
+                continue
+            if collection in wanted:
+                yield message
+    finally:
+        feed.unsubscribe(queue)
+
+
+@router.get("/live/results")
+async def live_results(request: Request, types: Optional[str] = None):
+    """
+    Stream ``text/event-stream`` com as alterações em resultados e avaliações
+    (``types=results`` ou ``types=evaluations`` restringe). Cada evento traz
+    ``collection``, ``operation``, ``_id`` e ``document``.
+    """
+    names = [name.strip() for name in (types or ",".join(LIVE_SOURCES)).split(",") if name.strip()]
+    unknown = [name for name in names if name not in LIVE_SOURCES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Tipos desconhecidos: {', '.join(unknown)}")
+    return StreamingResponse(
+        event_stream(request, [LIVE_SOURCES[name] for name in names]),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/live/status")
+async def live_status():
+    return {
+        "upstream": feed.upstream,
+        "subscribers": feed.subscribers,
+        "dropped": feed.dropped,
+        "reconnects": feed.reconnects,
+    }
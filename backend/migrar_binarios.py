@@ -1,59 +1,120 @@
+"""
+Migra arquivos binários (campo data) de application_documents para o disco
+do servidor, atualizando os documentos com a localização do blob e
+removendo o campo data.
+
+Os bytes vão para o armazenamento por conteúdo (blob_store.py), como os
+uploads novos: conteúdo repetido fica uma só vez e ``release`` consegue
+apagá-lo quando deixa de ser usado.
+
+Processa em lotes: as candidaturas de cada lote vêm numa só consulta
+($in), a descodificação e o hash correm no pool de I/O de storage.py, os
+blobs são gravados em paralelo e as atualizações seguem num único
+bulk_write por lote.
+
+Uso:
+    python migrar_binarios.py [--batch-size 200]
+"""
+import argparse
 import asyncio
-import base64
-import os
-from bson import ObjectId, Binary
-from pathlib import Path
+import hashlib
+import time
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from blob_store import blob_location, release_all, store_all, store_bytes
 from db import get_database
+from storage import legacy_bytes, run_io
+
+DEFAULT_BATCH_SIZE = 200
+
+
+class Progress:
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.skipped = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+
+    def report(self) -> None:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        rate = self.done / elapsed
+        remaining = (self.total - self.done - self.skipped) / rate if rate else 0
+        print(f"  {self.done + self.skipped}/{self.total} processados "
+              f"({self.done} migrados, {self.skipped} ignorados, {self.bytes / 1e6:.1f} MB) "
+              f"{rate:.1f} docs/s, faltam ~{remaining:.0f}s")
+
+
+def _decode_and_hash(data_field) -> tuple[bytes, str]:
+    payload = legacy_bytes(data_field)
+    return payload, hashlib.sha256(payload).hexdigest()
 
-# pasta raiz de uploads igual no server.py
-UPLOAD_ROOT = Path(__file__).parent / "categorias"
-UPLOAD_ROOT.mkdir(exist_ok=True)
 
-async def migrate():
+async def store_legacy(db, doc: dict) -> dict:
+    payload, digest = await run_io(_decode_and_hash, doc["data"])
+    return await store_bytes(db, payload, digest)
+
+
+async def migrate_batch(db, batch: list, progress: Progress) -> None:
+    app_ids = list({doc["application_id"] for doc in batch})
+    existing = {app["_id"] async for app in db.applications.find({"_id": {"$in": app_ids}}, {"_id": 1})}
+    docs = [doc for doc in batch if doc["application_id"] in existing]
+
+    # gravação concorrente; o pool de storage.py limita as threads
+    blobs = await store_all(db, [store_legacy(db, doc) for doc in docs])
+    operations = [
+        UpdateOne(
+            {"_id": doc["_id"]},
+            {"$unset": {"data": ""}, "$set": {**blob_location(blob), "size": blob["size"]}},
+        )
+        for doc, blob in zip(docs, blobs)
+    ]
+    failed = set()
+    if operations:
+        try:
+            await db.application_documents.bulk_write(operations, ordered=False)
+        except BulkWriteError as exc:
+            # as linhas que falharam mantêm o data: tira a referência que não ficou gravada
+            failed = {error["index"] for error in exc.details.get("writeErrors", [])}
+            await release_all(db, [blobs[index] for index in failed])
+            print(f"  {len(failed)} documentos não atualizados; ficam para a próxima execução")
+    progress.done += len(operations) - len(failed)
+    progress.bytes += sum(blob["size"] for index, blob in enumerate(blobs) if index not in failed)
+    progress.skipped += len(batch) - len(docs)
+
+
+async def migrate(batch_size: int = DEFAULT_BATCH_SIZE):
     """
     Migra arquivos binários (campo data) do MongoDB para o disco do servidor,
     atualizando os documentos com file_path e removendo o campo data.
     """
     db = get_database()
-    cursor = db.application_documents.find({"data": {"$exists": True}})
+    query = {"data": {"$exists": True}}
+    progress = Progress(await db.application_documents.count_documents(query))
+    print(f"{progress.total} documentos a migrar")
 
-    count = 0
+    cursor = db.application_documents.find(
+        query, {"application_id": 1, "name": 1, "data": 1}, batch_size=batch_size
+    )
+    batch = []
     async for doc in cursor:
-        app = await db.applications.find_one({"_id": doc["application_id"]})
-        if not app:
-            continue
-
-        # monta pasta categoria/nome do candidato
-        first_name = app.get("first_name","")
-        last_name = app.get("last_name","")
-        category = app.get("category","SemCategoria")
-        candidate_name = f"{first_name}_{last_name}".replace(" ", "_")
-        category_name = category.replace(" ", "_")
-
-        candidate_folder = UPLOAD_ROOT / category_name / candidate_name
-        candidate_folder.mkdir(parents=True, exist_ok=True)
-
-        file_path = candidate_folder / doc["name"]
-
-        # pega os bytes do campo data
-        data_field = doc["data"]
-        if isinstance(data_field, Binary):
-            payload = bytes(data_field)
-        else:
-            payload = base64.b64decode(data_field)
-
-        # grava no disco
-        with open(file_path, "wb") as f:
-            f.write(payload)
-
-        # atualiza doc no Mongo
-        await db.application_documents.update_one(
-            {"_id": doc["_id"]},
-            {"$unset": {"data": ""}, "$set": {"file_path": str(file_path)}},
-        )
-        count += 1
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            await migrate_batch(db, batch, progress)
+            progress.report()
+            batch = []
+    if batch:
+        await migrate_batch(db, batch, progress)
+        progress.report()
+
+    print(f"Migração concluída: {progress.done} arquivos migrados, "
+          f"{progress.skipped} sem candidatura.")
 
-    print(f"Migração concluída: {count} arquivos migrados.")
 
 if __name__ == "__main__":
-    asyncio.run(migrate())
+    parser = argparse.ArgumentParser(description="Migra o campo data para o armazenamento de blobs.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+    asyncio.run(migrate(args.batch_size))
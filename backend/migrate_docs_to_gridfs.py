@@ -1,71 +1,209 @@
-"""Migra documentos armazenados no campo `data` da coleção `documentos` para GridFS.
+"""Migra documentos armazenados no campo `data` para GridFS, em lotes paralelos.
 Uso:
     # opcionalmente exportar MONGO_URL
     $env:MONGO_URL = "mongodb://localhost:27017/prentma"
-    .venv\Scripts\python.exe migrate_docs_to_gridfs.py
+    .venv\Scripts\python.exe migrate_docs_to_gridfs.py [--workers 8] [--batch-size 100]
+        [--collections documentos application_documents] [--checkpoint ficheiro.json]
+        [--dry-run] [--restart]
 
-O script faz:
- - busca documentos em `documentos` que têm o campo `data`
- - salva os bytes no GridFS
- - atualiza o documento com `file_id`, `content_type`, e remove `data`
- - imprime um resumo
+O script faz, por coleção e por lotes ordenados por _id:
+ - lê os documentos que ainda têm o campo `data`
+ - grava os bytes no GridFS com `--workers` threads em paralelo
+ - atualiza os documentos com `file_id`, `content_type` e remove `data`
+   (um único bulk_write por lote)
+ - grava um checkpoint (último _id) depois de cada lote; ao relançar, retoma
+   a partir daí. Ficheiros GridFS levam metadata.source_collection/source_id,
+   por isso um lote interrompido a meio não duplica ficheiros.
+ - imprime o progresso e o débito (docs/s, MB/s)
+
+Com --dry-run nada é escrito: só conta documentos e bytes a migrar.
 """
+import argparse
 import os
-from pymongo import MongoClient
-from bson import ObjectId
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from bson import json_util
 from gridfs import GridFS
+from pymongo import ASCENDING, MongoClient, UpdateOne
 
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/prentma")
-print("Conectando em", MONGO_URL)
-client = MongoClient(MONGO_URL)
-db = client.get_default_database()
-fs = GridFS(db)
+DEFAULT_COLLECTIONS = ["documentos", "application_documents", "documents"]
+DEFAULT_CHECKPOINT = Path(__file__).parent / ".migrate_docs_to_gridfs.json"
 
-collections_to_migrate = ["documentos", "application_documents", "documents"]
-total = 0
 
 def to_bytes_safe(data):
     # aceita Binary, bytes, bytearray
     try:
-        if isinstance(data, (bytes, bytearray)):
-            return bytes(data)
-        # some Binary objects support buffer protocol
         return bytes(data)
     except Exception:
         return None
 
-for coll_name in collections_to_migrate:
+
+# ───────────────────────────────────────────────
+# Checkpoint
+# ───────────────────────────────────────────────
+def load_checkpoint(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    return json_util.loads(path.read_text(encoding="utf-8"))
+
+
+def save_checkpoint(path: Path, state: dict) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json_util.dumps(state, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class Throughput:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.docs = 0
+        self.bytes = 0
+
+    def add(self, docs: int, size: int) -> None:
+        self.docs += docs
+        self.bytes += size
+
+    def __str__(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return (f"{self.docs} docs, {self.bytes / 1e6:.1f} MB em {elapsed:.1f}s "
+                f"({self.docs / elapsed:.1f} docs/s, {self.bytes / 1e6 / elapsed:.2f} MB/s)")
+
+
+# ───────────────────────────────────────────────
+# Migração
+# ───────────────────────────────────────────────
+def existing_files(db, coll_name: str, ids: list) -> dict:
+    """
+    Ficheiros já gravados por uma execução interrompida: {source_id: file_id}.
+    """
+    cursor = db.fs.files.find(
+        {"metadata.source_collection": coll_name, "metadata.source_id": {"$in": ids}},
+        {"metadata.source_id": 1},
+    )
+    return {doc["metadata"]["source_id"]: doc["_id"] for doc in cursor}
+
+
+def put_file(fs: GridFS, coll_name: str, doc: dict, file_bytes: bytes):
+    doc_id = doc["_id"]
+    filename = doc.get("originalName") or doc.get("name") or str(doc_id)
+    content_type = doc.get("content_type") or doc.get("contentType") or "application/octet-stream"
+    file_id = fs.put(
+        file_bytes,
+        filename=filename,
+        contentType=content_type,
+        metadata={"source_collection": coll_name, "source_id": doc_id},
+    )
+    return file_id, content_type
+
+
+def migrate_batch(db, fs, pool, coll_name: str, docs: list, dry_run: bool) -> tuple[int, int, int]:
+    """
+    Devolve (migrados, bytes, ignorados) do lote.
+    """
+    payloads = []
+    skipped = 0
+    for doc in docs:
+        file_bytes = to_bytes_safe(doc.get("data"))
+        if file_bytes is None:
+            print(f"  - Pular {doc['_id']}: não foi possível converter 'data' para bytes")
+            skipped += 1
+            continue
+        payloads.append((doc, file_bytes))
+    size = sum(len(file_bytes) for _, file_bytes in payloads)
+    if dry_run or not payloads:
+        return len(payloads), size, skipped
+
+    already = existing_files(db, coll_name, [doc["_id"] for doc, _ in payloads])
+
+    def store(item):
+        doc, file_bytes = item
+        if doc["_id"] in already:
+            content_type = doc.get("content_type") or doc.get("contentType") or "application/octet-stream"
+            return doc["_id"], already[doc["_id"]], content_type
+        file_id, content_type = put_file(fs, coll_name, doc, file_bytes)
+        return doc["_id"], file_id, content_type
+
+    operations = [
+        UpdateOne(
+            {"_id": doc_id},
+            {"$set": {"file_id": file_id, "content_type": content_type}, "$unset": {"data": ""}},
+        )
+        for doc_id, file_id, content_type in pool.map(store, payloads)
+    ]
+    db[coll_name].bulk_write(operations, ordered=False)
+    return len(operations), size, skipped
+
+
+def migrate_collection(db, fs, pool, coll_name: str, args, state: dict, total: Throughput) -> None:
     col = db[coll_name]
-    cursor = col.find({"data": {"$exists": True}})
-    migrated = 0
-    print(f"Processando coleção {coll_name}...")
+    progress = state.setdefault(coll_name, {"last_id": None, "migrated": 0, "skipped": 0})
+    query = {"data": {"$exists": True}}
+    if progress["last_id"] is not None:
+        query["_id"] = {"$gt": progress["last_id"]}
+        print(f"Processando coleção {coll_name} (retoma depois de {progress['last_id']})...")
+    else:
+        print(f"Processando coleção {coll_name}...")
+
+    throughput = Throughput()
+    cursor = col.find(query, batch_size=args.batch_size).sort("_id", ASCENDING)
+    batch = []
     for doc in cursor:
-        doc_id = doc.get("_id")
-        data = doc.get("data")
-        if data is None:
-            continue
-        file_bytes = to_bytes_safe(data)
-        if file_bytes is None:
-            print(f"  - Pular {doc_id}: não foi possível converter 'data' para bytes")
+        batch.append(doc)
+        if len(batch) < args.batch_size:
             continue
+        migrate_step(db, fs, pool, coll_name, batch, args, state, progress, throughput, total)
+        batch = []
+    if batch:
+        migrate_step(db, fs, pool, coll_name, batch, args, state, progress, throughput, total)
+    print(f"Coleção {coll_name}: {throughput}; ignorados {progress['skipped']}")
+
+
+def migrate_step(db, fs, pool, coll_name, batch, args, state, progress, throughput, total) -> None:
+    migrated, size, skipped = migrate_batch(db, fs, pool, coll_name, batch, args.dry_run)
+    throughput.add(migrated, size)
+    total.add(migrated, size)
+    progress["migrated"] += migrated
+    progress["skipped"] += skipped
+    progress["last_id"] = batch[-1]["_id"]
+    if not args.dry_run:
+        save_checkpoint(args.checkpoint, state)
+    print(f"  {coll_name}: {throughput}")
 
-        filename = doc.get("originalName") or doc.get("name") or str(doc_id)
-        content_type = doc.get("content_type") or doc.get("contentType") or "application/octet-stream"
 
-        # grava no GridFS
-        file_id = fs.put(file_bytes, filename=filename, contentType=content_type)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Migra o campo `data` para GridFS.")
+    parser.add_argument("--workers", type=int, default=8, help="uploads GridFS em paralelo")
+    parser.add_argument("--batch-size", type=int, default=100, help="documentos por lote")
+    parser.add_argument("--collections", nargs="+", default=DEFAULT_COLLECTIONS)
+    parser.add_argument("--checkpoint", type=Path, default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--dry-run", action="store_true", help="só conta, não escreve nada")
+    parser.add_argument("--restart", action="store_true", help="ignora o checkpoint existente")
+    return parser.parse_args(argv)
 
-        # atualiza documento: adiciona file_id (ObjectId) e remove data
-        update = {
-            "$set": {"file_id": file_id, "content_type": content_type},
-            "$unset": {"data": ""},
-        }
-        col.update_one({"_id": doc_id}, update)
-        migrated += 1
-        total += 1
-        print(f"  - Migrado {doc_id} -> file_id {file_id}")
 
-    print(f"Coleção {coll_name}: migrados {migrated} documentos")
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    print("Conectando em", MONGO_URL)
+    client = MongoClient(MONGO_URL, maxPoolSize=args.workers + 2)
+    db = client.get_default_database()
+    fs = GridFS(db)
+    state = {} if args.restart or args.dry_run else load_checkpoint(args.checkpoint)
+    if not args.dry_run:
+        db.fs.files.create_index([("metadata.source_collection", ASCENDING), ("metadata.source_id", ASCENDING)])
+
+    total = Throughput()
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            for coll_name in args.collections:
+                migrate_collection(db, fs, pool, coll_name, args, state, total)
+    finally:
+        client.close()
+    label = "A migrar (dry-run)" if args.dry_run else "Total migrado em todas coleções"
+    print(f"{label}: {total}")
+
 
-print(f"Total migrado em todas coleções: {total}")
-client.close()
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,18 @@
+import asyncio
+import logging
 from datetime import datetime
-from typing import Optional
+from typing import Generic, List, Optional, TypeVar
 
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
 from pydantic import BaseModel, EmailStr, Field, GetCoreSchemaHandler, GetJsonSchemaHandler
 from pydantic_core import core_schema
 
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
 
+logger = logging.getLogger("prentma.backend")
+
 # ───────────────────────────────────────────────
 # ObjectId compatível com Pydantic v2
 # ───────────────────────────────────────────────
@@ -85,6 +90,18 @@ class EvaluationCreate(BaseModel):
     comment: str
     date: datetime = Field(default_factory=datetime.utcnow)
 
+MAX_EVALUATION_BATCH = 500
+
+class EvaluationScore(BaseModel):
+    candidateId: PyObjectId
+    score: float
+    comment: str
+    date: datetime = Field(default_factory=datetime.utcnow)
+
+class EvaluationBatch(BaseModel):
+    jurorId: PyObjectId
+    evaluations: List[EvaluationScore] = Field(min_length=1, max_length=MAX_EVALUATION_BATCH)
+
 class ResultCreate(BaseModel):
     candidateId: PyObjectId
     categoryId: PyObjectId
@@ -232,6 +249,31 @@ class ResultOut(BaseModel):
         populate_by_name = True
 
 
+class LeaderboardEntry(BaseModel):
+    position: int
+    candidateId: PyObjectId = Field(validation_alias="_id")
+    candidateName: Optional[str] = None
+    categoryId: Optional[PyObjectId] = None
+    count: int
+    sum: float
+    mean: float
+    min: float
+    max: float
+
+    class Config:
+        json_encoders = {ObjectId: str}
+
+
+# ───────────────────────────────────────────────
+# PÁGINA (paginação por cursor)
+# ───────────────────────────────────────────────
+ItemT = TypeVar("ItemT")
+
+class Page(BaseModel, Generic[ItemT]):
+    items: List[ItemT]
+    next_cursor: Optional[str] = None
+
+
 class SupportMessage(BaseModel):
     name: str
     email: EmailStr
@@ -240,16 +282,140 @@ class SupportMessage(BaseModel):
     created_at: datetime = datetime.utcnow()
 
 
+# ───────────────────────────────────────────────
+# PLANO DE ÍNDICES
+# ───────────────────────────────────────────────
+# ordem (created_at desc, _id desc) das listagens paginadas
+KEYSET = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+INDEX_SPEC = {
+    "applications": [
+        # listagem (created_at) e pesquisa com facetas sem filtro (created_at, _id)
+        IndexModel(KEYSET),
+        # exportação / listagens filtradas por categoria e município
+        IndexModel([("category", ASCENDING), ("municipality", ASCENDING)] + KEYSET),
+        IndexModel([("municipality", ASCENDING)] + KEYSET),
+        # pesquisa com facetas: um filtro + ordem (created_at, _id) do keyset
+        IndexModel([("category", ASCENDING)] + KEYSET),
+        IndexModel([("city", ASCENDING)] + KEYSET),
+        IndexModel([("years_experience", ASCENDING)] + KEYSET),
+        # pesquisa (search.py): prefixo sobre search_terms e índice de texto
+        IndexModel([("search_terms", ASCENDING)]),
+        IndexModel(
+            [("first_name", TEXT), ("last_name", TEXT), ("email", TEXT)],
+            default_language="none",
+            name="applications_text",
+        ),
+    ],
+    "application_documents": [
+        # download usa (_id, application_id): o _id já resolve; este serve
+        # as consultas "documentos de uma candidatura"
+        IndexModel([("application_id", ASCENDING)]),
+        # arquivo ZIP por categoria
+        IndexModel([("category", ASCENDING), ("application_id", ASCENDING)]),
+    ],
+    "candidatos": [
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel(KEYSET),
+        IndexModel([("categoryId", ASCENDING)] + KEYSET),
+        IndexModel([("search_terms", ASCENDING)]),
+        IndexModel(
+            [("name", TEXT), ("email", TEXT), ("identityDocument", TEXT)],
+            default_language="none",
+            name="candidatos_text",
+        ),
+    ],
+    "categories": [IndexModel(KEYSET)],
+    "events": [IndexModel(KEYSET)],
+    "jurados": [
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel(KEYSET),
+        IndexModel([("search_terms", ASCENDING)]),
+        IndexModel([("name", TEXT), ("email", TEXT)], default_language="none", name="jurados_text"),
+    ],
+    "avaliacoes": [
+        IndexModel(KEYSET),
+        # polling de live_results.py quando não há change streams
+        IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "resultados": [
+        IndexModel(KEYSET),
+        IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "documentos": [
+        IndexModel([("candidateId", ASCENDING), ("type", ASCENDING)]),
+        IndexModel([("candidateId", ASCENDING), ("uploadDate", DESCENDING)]),
+        IndexModel([("uploadDate", DESCENDING)]),
+    ],
+    "pontuacoes": [
+        IndexModel([("categoryId", ASCENDING), ("mean", DESCENDING), ("count", DESCENDING), ("_id", ASCENDING)]),
+    ],
+}
+
+
+# Índices únicos de que a API depende para não duplicar dados. Cada um é
+# criado à parte (uma falha não leva os restantes índices da coleção) e o
+# arranque falha se algum não existir.
+REQUIRED_INDEXES = {
+    "avaliacoes": [
+        # uma avaliação por (candidato, jurado): upserts de /evaluations/batch
+        # e 409 em POST/PATCH; também serve as consultas por candidato.
+        # Dados antigos com pares repetidos: python dedupe_avaliacoes.py
+        IndexModel([("candidateId", ASCENDING), ("jurorId", ASCENDING)], unique=True, name="candidateId_1_jurorId_1"),
+    ],
+}
+
+
 # ───────────────────────────────────────────────
 # FUNÇÃO PARA CRIAR ÍNDICES
 # ───────────────────────────────────────────────
+async def _create_collection_indexes(database, name, models):
+    try:
+        return name, await database[name].create_indexes(models), None
+    except Exception as exc:
+        return name, [], exc
+
+
+async def _create_required_index(database, name, model):
+    try:
+        return name, await database[name].create_indexes([model]), None
+    except Exception as exc:
+        return name, [], exc
+
+
+async def missing_required_indexes(database) -> list:
+    """
+    "coleção.índice" de REQUIRED_INDEXES que não existem na base.
+    """
+    missing = []
+    for name, models in REQUIRED_INDEXES.items():
+        existing = await database[name].index_information()
+        missing.extend(
+            f"{name}.{model.document['name']}" for model in models if model.document["name"] not in existing
+        )
+    return missing
+
+
 async def ensure_indexes(database):
     """
-    Cria índices recomendados para performance e integridade.
+    Cria os índices de INDEX_SPEC, uma coleção por pedido e todas em paralelo.
     Chame no startup_event do FastAPI.
+
+    Uma falha (ex.: emails duplicados que impedem o índice único) é registada
+    no log sem impedir as restantes coleções. Os índices de REQUIRED_INDEXES
+    vão um a um; confirme-os depois com ``missing_required_indexes``.
     """
-    # Documentos indexados por candidato e tipo
-    await database.documentos.create_index([("candidateId", 1), ("type", 1)])
-    # Email único para candidatos e jurados
-    await database.candidatos.create_index("email", unique=True)
-    await database.jurados.create_index("email", unique=True)
+    results = await asyncio.gather(
+        *(_create_collection_indexes(database, name, models) for name, models in INDEX_SPEC.items()),
+        *(
+            _create_required_index(database, name, model)
+            for name, models in REQUIRED_INDEXES.items()
+            for model in models
+        ),
+    )
+    for name, created, error in results:
+        if error is not None:
+            logger.error("Falha ao criar índices em %s: %s", name, error)
+        else:
+            logger.info("Índices em %s: %s", name, ", ".join(created))
+    return results
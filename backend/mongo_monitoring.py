@@ -0,0 +1,258 @@
+"""
+Monitorização de comandos e do pool de ligações do MongoDB.
+
+Listeners do pymongo registados na criação do cliente (``db.get_database``):
+ - latência por comando e coleção, falhas e operações lentas, em /metrics;
+ - operações acima de MONGO_SLOW_MS ficam no log ``prentma.mongo`` com a
+   forma da consulta (valores trocados pelo tipo) e nas últimas N
+   entradas em /metrics/mongo-slow;
+ - tempo de espera por uma ligação do pool e ligações em uso.
+
+Os callbacks correm na thread que executa a operação: só fazem contas.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter
+from pymongo import monitoring
+
+from metrics import registry
+
+logger = logging.getLogger("prentma.mongo")
+
+MONGO_MONITORING = os.getenv("MONGO_MONITORING", "true").lower() in {"1", "true", "yes"}
+MONGO_SLOW_MS = float(os.getenv("MONGO_SLOW_MS", "100"))
+SLOW_LOG_SIZE = int(os.getenv("MONGO_SLOW_LOG_SIZE", "200"))
+
+# comandos de manutenção da ligação: não interessam para a latência da API
+IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions", "buildInfo"}
+
+COMMAND_LATENCY = registry.histogram(
+    "mongodb_command_duration_seconds", "Latência dos comandos MongoDB.", ("command", "collection"))
+COMMAND_FAILURES = registry.counter(
+    "mongodb_command_failures_total", "Comandos MongoDB com erro.", ("command", "collection"))
+SLOW_COMMANDS = registry.counter(
+    "mongodb_slow_commands_total", "Comandos MongoDB acima de MONGO_SLOW_MS.", ("command", "collection"))
+POOL_CHECKOUT_WAIT = registry.histogram(
+    "mongodb_pool_checkout_wait_seconds", "Espera por uma ligação do pool.", ("address",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+POOL_CHECKOUT_FAILURES = registry.counter(
+    "mongodb_pool_checkout_failures_total", "Falhas a obter ligação do pool.", ("address", "reason"))
+POOL_CONNECTIONS = registry.gauge(
+    "mongodb_pool_connections", "Ligações abertas no pool.", ("address",))
+POOL_CHECKED_OUT = registry.gauge(
+    "mongodb_pool_checked_out", "Ligações do pool em uso.", ("address",))
+
+slow_operations: deque = deque(maxlen=SLOW_LOG_SIZE)
+
+
+# ───────────────────────────────────────────────
+# Forma da consulta
+# ───────────────────────────────────────────────
+def query_shape(value, depth: int = 0):
+    """
+    Troca valores pelo nome do tipo, mantendo campos e operadores:
+    {"email": "a@b", "age": {"$gt": 3}} -> {"email": "str", "age": {"$gt": "int"}}.
+    """
+    if depth > 6:
+        return "..."
+    if isinstance(value, dict):
+        return {key: query_shape(item, depth + 1) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [query_shape(value[0], depth + 1)] if value else []
+    return type(value).__name__
+
+
+def command_shape(command_name: str, command: dict) -> dict:
+    if command_name == "find":
+        shape = {"filter": command.get("filter", {}), "sort": command.get("sort"), "projection": command.get("projection")}
+    elif command_name == "aggregate":
+        shape = {"pipeline": command.get("pipeline", [])}
+    elif command_name in {"update", "findAndModify"}:
+        updates = command.get("updates") or [command]
+        shape = {"filter": updates[0].get("q", updates[0].get("query", {}))}
+    elif command_name == "delete":
+        deletes = command.get("deletes") or [{}]
+        shape = {"filter": deletes[0].get("q", {})}
+    elif command_name in {"count", "distinct"}:
+        shape = {"filter": command.get("query", {})}
+    else:
+        return {}
+    return query_shape({key: value for key, value in shape.items() if value is not None})
+
+
+def command_collection(command_name: str, command: dict) -> str:
+    if command_name == "getMore":
+        return command.get("collection", "")
+    target = command.get(command_name)
+    return target if isinstance(target, str) else ""
+
+
+# ───────────────────────────────────────────────
+# Listeners
+# ───────────────────────────────────────────────
+class CommandMetricsListener(monitoring.CommandListener):
+    def __init__(self):
+        # comandos em curso: (connection_id, request_id) -> (coleção, comando);
+        # a forma só é calculada se o comando for lento
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event) -> None:
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        collection = command_collection(event.command_name, event.command)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (collection, event.command)
+
+    def _finish(self, event):
+        with self._lock:
+            return self._pending.pop((event.connection_id, event.request_id), None)
+
+    def succeeded(self, event) -> None:
+        pending = self._finish(event)
+        if pending is None:
+            return
+        collection, command = pending
+        seconds = event.duration_micros / 1e6
+        COMMAND_LATENCY.observe(seconds, event.command_name, collection)
+        if seconds * 1000 >= MONGO_SLOW_MS:
+            self._slow(event, collection, command, seconds)
+
+    def failed(self, event) -> None:
+        pending = self._finish(event)
+        if pending is None:
+            return
+        collection, command = pending
+        seconds = event.duration_micros / 1e6
+        COMMAND_LATENCY.observe(seconds, event.command_name, collection)
+        COMMAND_FAILURES.inc(event.command_name, collection)
+        if seconds * 1000 >= MONGO_SLOW_MS:
+            self._slow(event, collection, command, seconds)
+
+    @staticmethod
+    def _slow(event, collection: str, command: dict, seconds: float) -> None:
+        SLOW_COMMANDS.inc(event.command_name, collection)
+        shape = command_shape(event.command_name, command)
+        entry = {
+            "at": datetime.utcnow(),
+            "command": event.command_name,
+            "collection": collection,
+            "duration_ms": round(seconds * 1000, 1),
+            "shape": shape,
+        }
+        slow_operations.append(entry)
+        logger.warning("Mongo lento: %s %s %.1fms %s", event.command_name, collection, seconds * 1000, shape)
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """
+    Alimenta as métricas do pool e mantém um resumo por servidor para o
+    endpoint de readiness (ligações abertas, em uso, espera no checkout).
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, dict] = {}
+
+    @staticmethod
+    def _address(event) -> str:
+        host, port = event.address
+        return f"{host}:{port}"
+
+    def _update(self, address: str, **changes) -> None:
+        with self._lock:
+            stats = self.stats.get(address)
+            if stats is None:
+                stats = self.stats[address] = {
+                    "open": 0, "in_use": 0, "checkouts": 0, "checkout_failures": 0,
+                    "wait_total_s": 0.0, "wait_max_s": 0.0,
+                }
+            for key, value in changes.items():
+                if key == "wait_max_s":
+                    stats[key] = max(stats[key], value)
+                else:
+                    stats[key] += value
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {address: dict(stats) for address, stats in self.stats.items()}
+
+    def connection_check_out_started(self, event) -> None:
+        self._local.started = time.monotonic()
+
+    def connection_checked_out(self, event) -> None:
+        address = self._address(event)
+        wait = getattr(event, "duration", None)
+        if wait is None:
+            wait = time.monotonic() - getattr(self._local, "started", time.monotonic())
+        POOL_CHECKOUT_WAIT.observe(wait, address)
+        POOL_CHECKED_OUT.inc(address)
+        self._update(address, in_use=1, checkouts=1, wait_total_s=wait, wait_max_s=wait)
+
+    def connection_check_out_failed(self, event) -> None:
+        address = self._address(event)
+        POOL_CHECKOUT_FAILURES.inc(address, str(event.reason))
+        self._update(address, checkout_failures=1)
+
+    def connection_checked_in(self, event) -> None:
+        address = self._address(event)
+        POOL_CHECKED_OUT.dec(address)
+        self._update(address, in_use=-1)
+
+    def connection_created(self, event) -> None:
+        address = self._address(event)
+        POOL_CONNECTIONS.inc(address)
+        self._update(address, open=1)
+
+    def connection_closed(self, event) -> None:
+        address = self._address(event)
+        POOL_CONNECTIONS.dec(address)
+        self._update(address, open=-1)
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_ready(self, event) -> None:
+        pass
+
+
+# listener do cliente atual (None com MONGO_MONITORING=false)
+pool_listener: Optional[PoolMetricsListener] = None
+
+
+def event_listeners() -> List:
+    """
+    Listeners a passar ao AsyncIOMotorClient (vazio com MONGO_MONITORING=false).
+    """
+    global pool_listener
+    if not MONGO_MONITORING:
+        return []
+    pool_listener = PoolMetricsListener()
+    return [CommandMetricsListener(), pool_listener]
+
+
+router = APIRouter(tags=["métricas"])
+
+
+@router.get("/metrics/mongo-slow", include_in_schema=False)
+async def mongo_slow_operations():
+    """
+    Últimas operações lentas deste processo (mais recentes primeiro).
+    """
+    return {"threshold_ms": MONGO_SLOW_MS, "operations": list(reversed(slow_operations))}
@@ -0,0 +1,88 @@
+"""
+Paginação por cursor (keyset) sobre (created_at, _id).
+
+O cursor é opaco para o cliente: base64 de ``[created_at, _id]`` do último
+item devolvido. A página seguinte começa estritamente depois desse par, por
+isso o custo de cada página não depende de quantas já foram lidas.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+from fast_json import MongoJSONResponse, trusted_items
+from projection import (
+    fields_projection,
+    model_fields,
+    model_projection,
+    parse_fields,
+    sparse_items,
+)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# ordem usada por todas as listagens e pelos índices compostos correspondentes
+KEYSET_SORT = [("created_at", -1), ("_id", -1)]
+
+
+def encode_cursor(doc: dict) -> str:
+    created_at = doc.get("created_at")
+    raw = json.dumps([created_at.isoformat() if isinstance(created_at, datetime) else None, str(doc["_id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[Optional[datetime], ObjectId]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, raw_id = json.loads(base64.urlsafe_b64decode(padded))
+        return (datetime.fromisoformat(created_at) if created_at else None), ObjectId(raw_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="cursor inválido")
+
+
+def keyset_filter(cursor: str) -> dict:
+    """
+    Filtro para os itens que vêm depois do cursor na ordem KEYSET_SORT.
+
+    Documentos sem created_at (null) ficam no fim da ordem descendente.
+    """
+    created_at, last_id = decode_cursor(cursor)
+    if created_at is None:
+        return {"created_at": None, "_id": {"$lt": last_id}}
+    return {
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}},
+            {"created_at": None},
+        ]
+    }
+
+
+def clamp_limit(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+async def fetch_page(collection, query: dict, limit: int, cursor: Optional[str], model,
+                     fields: Optional[str] = None):
+    """
+    Lê uma página de ``collection`` e devolve ``{"items", "next_cursor"}``
+    já serializado (orjson, ver fast_json).
+
+    Sem ``fields`` os itens têm os campos de ``model`` (lidos com a projeção
+    do modelo); com ``fields`` só os campos pedidos, mais ``_id``.
+    """
+    requested = parse_fields(fields, model_fields(model))
+    projection = fields_projection(requested) if requested else model_projection(model)
+    limit = clamp_limit(limit)
+    if cursor:
+        query = {"$and": [query, keyset_filter(cursor)]} if query else keyset_filter(cursor)
+
+    # pede um a mais só para saber se existe página seguinte
+    docs = await collection.find(query, projection).sort(KEYSET_SORT).limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    items = sparse_items(docs[:limit], requested) if requested else trusted_items(docs[:limit], model)
+    return MongoJSONResponse({"items": items, "next_cursor": next_cursor})
@@ -0,0 +1,50 @@
+"""
+Projeções Mongo e ``fields=`` (sparse fieldsets) nas listagens.
+
+Ler só os campos necessários reduz o payload, a descodificação BSON e a
+validação Pydantic das tabelas de administração.
+"""
+from typing import Iterable, List, Optional
+
+from fastapi import HTTPException
+
+
+def model_fields(model) -> List[str]:
+    """
+    Campos guardados no Mongo para um modelo *Out (alias ``_id`` incluído).
+    """
+    return [field.alias or name for name, field in model.model_fields.items()]
+
+
+def model_projection(model) -> dict:
+    """
+    Projeção por omissão: só o que o modelo devolve, mais a chave do cursor.
+    """
+    projection = {name: 1 for name in model_fields(model)}
+    projection["created_at"] = 1
+    return projection
+
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str]) -> Optional[List[str]]:
+    """
+    Converte ``fields=a,b,c`` numa lista validada (400 para campos desconhecidos).
+    """
+    if not fields:
+        return None
+    allowed = set(allowed)
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Campos desconhecidos: {', '.join(unknown)}")
+    return requested
+
+
+def fields_projection(requested: List[str]) -> dict:
+    projection = {name: 1 for name in requested}
+    projection["created_at"] = 1  # necessário para o cursor
+    return projection
+
+
+def sparse_items(docs: Iterable[dict], requested: List[str]) -> List[dict]:
+    keep = set(requested) | {"_id"}
+    return [{key: value for key, value in doc.items() if key in keep} for doc in docs]
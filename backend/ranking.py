@@ -0,0 +1,158 @@
+"""
+Pontuações agregadas por candidato e classificação por categoria.
+
+A coleção ``pontuacoes`` guarda, por candidato, count/sum/mean/min/max das
+avaliações. Cada escrita em ``avaliacoes`` (e cada mudança de categoria ou
+remoção de candidato) recalcula só os candidatos afetados, por isso a
+classificação lê apenas os agregados.
+
+Duas escritas concorrentes sobre o mesmo candidato podiam gravar por último
+um agregado lido antes da outra avaliação. Cada agregado tem uma ``revision``
+e só é substituído se não mudou desde a leitura; se mudou, volta a calcular.
+"""
+from datetime import datetime
+from typing import Iterable, List
+
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Query
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from db import get_database
+from mongo_models import LeaderboardEntry
+
+router = APIRouter(tags=["classificacao"])
+
+REFRESH_ATTEMPTS = 5
+
+
+# ───────────────────────────────────────────────
+# Manutenção dos agregados
+# ───────────────────────────────────────────────
+async def _refresh_once(db, ids: List[ObjectId]) -> List[ObjectId]:
+    """
+    Uma passagem de ``refresh_candidates``. Devolve os candidatos cujo
+    agregado foi alterado por outro pedido entre a leitura e a escrita.
+    """
+    revisions = {
+        doc["_id"]: doc.get("revision")
+        async for doc in db.pontuacoes.find({"_id": {"$in": ids}}, {"revision": 1})
+    }
+    stats = await db.avaliacoes.aggregate([
+        {"$match": {"candidateId": {"$in": ids}}},
+        {"$group": {
+            "_id": "$candidateId",
+            "count": {"$sum": 1},
+            "sum": {"$sum": "$score"},
+            "min": {"$min": "$score"},
+            "max": {"$max": "$score"},
+        }},
+    ]).to_list(length=None)
+    categories = {
+        doc["_id"]: doc.get("categoryId")
+        async for doc in db.candidatos.find({"_id": {"$in": ids}}, {"categoryId": 1})
+    }
+
+    now = datetime.utcnow()
+    operations = []
+    expected = {}  # candidato -> revision gravada (None: removido)
+    for row in stats:
+        candidate_id = row.pop("_id")
+        if candidate_id not in categories:
+            continue  # candidato removido: sai da classificação
+        row["mean"] = row["sum"] / row["count"]
+        row["categoryId"] = categories[candidate_id]
+        row["updated_at"] = now
+        row["revision"] = expected[candidate_id] = ObjectId()
+        if candidate_id in revisions:
+            operations.append(UpdateOne(
+                {"_id": candidate_id, "revision": revisions[candidate_id]}, {"$set": row}
+            ))
+        else:
+            operations.append(InsertOne({"_id": candidate_id, **row}))
+    for candidate_id, revision in revisions.items():
+        if candidate_id not in expected:
+            expected[candidate_id] = None
+            operations.append(DeleteOne({"_id": candidate_id, "revision": revision}))
+    if not operations:
+        return []
+
+    try:
+        await db.pontuacoes.bulk_write(operations, ordered=False)
+    except BulkWriteError as exc:
+        # só um InsertOne concorrente (chave duplicada) é esperado aqui
+        if any(error.get("code") != 11000 for error in exc.details.get("writeErrors", [])):
+            raise
+    current = {
+        doc["_id"]: doc.get("revision")
+        async for doc in db.pontuacoes.find({"_id": {"$in": list(expected)}}, {"revision": 1})
+    }
+    return [candidate_id for candidate_id, revision in expected.items() if current.get(candidate_id) != revision]
+
+
+async def refresh_candidates(db, candidate_ids: Iterable[ObjectId]) -> None:
+    """
+    Recalcula os agregados dos candidatos indicados a partir de ``avaliacoes``.
+
+    Só lê as avaliações desses candidatos. Quem perder a corrida com outra
+    escrita volta a calcular a partir do estado atual.
+    """
+    ids = list({candidate_id for candidate_id in candidate_ids if candidate_id is not None})
+    for _ in range(REFRESH_ATTEMPTS):
+        if not ids:
+            return
+        ids = await _refresh_once(db, ids)
+    if ids:
+        raise RuntimeError(f"Agregados de {len(ids)} candidatos em conflito após {REFRESH_ATTEMPTS} tentativas")
+
+
+async def rebuild_all(db, batch_size: int = 500) -> int:
+    """
+    Reconstrói ``pontuacoes`` a partir de todas as avaliações (migração
+    inicial ou reparação). Os agregados antigos só saem no fim.
+    """
+    started = datetime.utcnow()
+    total = 0
+    batch: List[ObjectId] = []
+    async for row in db.avaliacoes.aggregate([{"$group": {"_id": "$candidateId"}}]):
+        batch.append(row["_id"])
+        if len(batch) >= batch_size:
+            await refresh_candidates(db, batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        await refresh_candidates(db, batch)
+        total += len(batch)
+    await db.pontuacoes.delete_many({"updated_at": {"$lt": started}})
+    return total
+
+
+# ───────────────────────────────────────────────
+# Classificação por categoria
+# ───────────────────────────────────────────────
+@router.get("/categories/{category_id}/leaderboard", response_model=List[LeaderboardEntry])
+async def category_leaderboard(category_id: str, limit: int = Query(50, ge=1, le=500)):
+    db = get_database()
+    if not ObjectId.is_valid(category_id):
+        raise HTTPException(status_code=400, detail="categoryId inválido")
+    cursor = (
+        db.pontuacoes.find({"categoryId": ObjectId(category_id)})
+        .sort([("mean", -1), ("count", -1), ("_id", 1)])
+        .limit(limit)
+    )
+    rows = await cursor.to_list(length=limit)
+    names = {
+        doc["_id"]: doc.get("name")
+        async for doc in db.candidatos.find({"_id": {"$in": [row["_id"] for row in rows]}}, {"name": 1})
+    }
+    return [
+        LeaderboardEntry(position=position, candidateName=names.get(row["_id"]), **row)
+        for position, row in enumerate(rows, start=1)
+    ]
+
+
+@router.post("/leaderboard/rebuild")
+async def rebuild_leaderboard():
+    db = get_database()
+    total = await rebuild_all(db)
+    return {"status": "rebuilt", "candidates": total}
@@ -1,19 +1,23 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from datetime import datetime
 from bson import ObjectId
-from pymongo import ReturnDocument
-from typing import List
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
-from db import get_database
+from cache import cache
+from db import get_database, get_list_database
 from mongo_models import (
     CandidateCreate, CandidateOut,
     CategoryCreate, CategoryOut,
     EventCreate, EventOut,
     JurorCreate, JurorOut,
-    EvaluationCreate, EvaluationOut,
+    EvaluationCreate, EvaluationOut, EvaluationBatch,
     ResultCreate, ResultOut,
-    PyObjectId
+    Page, PyObjectId
 )
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, fetch_page
+from ranking import refresh_candidates
+from search import with_search_terms
 
 router = APIRouter(tags=["CRUD"])
 
@@ -32,26 +36,27 @@ def parse_object_id(raw_id: str, label: str) -> ObjectId:
 @router.post("/candidates", response_model=CandidateOut)
 async def create_candidate(payload: CandidateCreate):
     db = get_database()
-    doc = payload.dict()
+    doc = with_search_terms("candidatos", payload.dict())
     doc["created_at"] = doc["updated_at"] = payload.registrationDate
     result = await db.candidatos.insert_one(doc)
     doc["_id"] = result.inserted_id
     return CandidateOut(**doc)
 
-@router.get("/candidates", response_model=List[CandidateOut])
-async def list_candidates(categoryId: str | None = None):
-    db = get_database()
+@router.get("/candidates", response_model=Page[CandidateOut])
+async def list_candidates(
+    categoryId: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    fields: str | None = None,
+):
+    db = get_list_database()
     query = {}
     if categoryId:
         if not PyObjectId.is_valid(categoryId):
             raise HTTPException(status_code=400, detail="categoryId inválido")
         query["categoryId"] = ObjectId(categoryId)
 
-    cursor = db.candidatos.find(query).sort("created_at", -1)
-    items = []
-    async for doc in cursor:
-        items.append(CandidateOut(**doc))
-    return items
+    return await fetch_page(db.candidatos, query, limit, cursor, CandidateOut, fields)
 
 @router.get("/candidates/{candidate_id}", response_model=CandidateOut)
 async def get_candidate(candidate_id: str):
@@ -66,13 +71,17 @@ async def get_candidate(candidate_id: str):
 async def update_candidate(candidate_id: str, payload: CandidateCreate):
     db = get_database()
     oid = parse_object_id(candidate_id, "Candidato")
-    updates = {k: v for k, v in payload.dict().items() if v is not None}
+    updates = with_search_terms("candidatos", {k: v for k, v in payload.dict().items() if v is not None})
     updates["updated_at"] = payload.registrationDate
-    doc = await db.candidatos.find_one_and_update(
-        {"_id": oid}, {"$set": updates}, return_document=ReturnDocument.AFTER
+    previous = await db.candidatos.find_one_and_update(
+        {"_id": oid}, {"$set": updates}, return_document=ReturnDocument.BEFORE
     )
-    if not doc:
+    if not previous:
         raise HTTPException(404, "Candidato não encontrado")
+    doc = {**previous, **updates}
+    if doc.get("categoryId") != previous.get("categoryId"):
+        # a pontuação passa para a classificação da nova categoria
+        await refresh_candidates(db, [oid])
     return CandidateOut(**doc)
 
 @router.delete("/candidates/{candidate_id}")
@@ -82,6 +91,8 @@ async def delete_candidate(candidate_id: str):
     result = await db.candidatos.delete_one({"_id": oid})
     if result.deleted_count == 0:
         raise HTTPException(404, "Candidato não encontrado")
+    # sem candidato, o agregado sai da classificação
+    await refresh_candidates(db, [oid])
     return {"status": "deleted"}
 
 
@@ -92,19 +103,23 @@ async def delete_candidate(candidate_id: str):
 async def create_category(payload: CategoryCreate):
     db = get_database()
     doc = payload.dict()
-    doc["created_at"] = doc["updated_at"] = doc.get("created_at", None)
+    doc["created_at"] = doc["updated_at"] = datetime.utcnow()
     result = await db.categories.insert_one(doc)
     doc["_id"] = result.inserted_id
+    await cache.invalidate("categories")
     return CategoryOut(**doc)
 
-@router.get("/categories", response_model=List[CategoryOut])
-async def list_categories():
+@router.get("/categories", response_model=Page[CategoryOut])
+async def list_categories(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    fields: str | None = None,
+):
     db = get_database()
-    cursor = db.categories.find().sort("created_at", -1)
-    items = []
-    async for doc in cursor:
-        items.append(CategoryOut(**doc))
-    return items
+    return await cache.get_or_load(
+        "categories", (limit, cursor, fields),
+        lambda: fetch_page(db.categories, {}, limit, cursor, CategoryOut, fields),
+    )
 
 @router.patch("/categories/{category_id}", response_model=CategoryOut)
 async def update_category(category_id: str, payload: CategoryCreate):
@@ -117,6 +132,7 @@ async def update_category(category_id: str, payload: CategoryCreate):
     )
     if not doc:
         raise HTTPException(404, "Categoria não encontrada")
+    await cache.invalidate("categories")
     return CategoryOut(**doc)
 
 @router.delete("/categories/{category_id}")
@@ -126,6 +142,7 @@ async def delete_category(category_id: str):
     result = await db.categories.delete_one({"_id": oid})
     if result.deleted_count == 0:
         raise HTTPException(404, "Categoria não encontrada")
+    await cache.invalidate("categories")
     return {"status": "deleted"}
 
 
@@ -139,16 +156,20 @@ async def create_event(payload: EventCreate):
     doc["created_at"] = doc["updated_at"] = datetime.utcnow()
     result = await db.events.insert_one(doc)
     doc["_id"] = result.inserted_id
+    await cache.invalidate("events")
     return EventOut(**doc)
 
-@router.get("/events", response_model=List[EventOut])
-async def list_events():
+@router.get("/events", response_model=Page[EventOut])
+async def list_events(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    fields: str | None = None,
+):
     db = get_database()
-    cursor = db.events.find().sort("created_at", -1)
-    items = []
-    async for doc in cursor:
-        items.append(EventOut(**doc))
-    return items
+    return await cache.get_or_load(
+        "events", (limit, cursor, fields),
+        lambda: fetch_page(db.events, {}, limit, cursor, EventOut, fields),
+    )
 
 @router.patch("/events/{event_id}", response_model=EventOut)
 async def update_event(event_id: str, payload: EventCreate):
@@ -161,6 +182,7 @@ async def update_event(event_id: str, payload: EventCreate):
     )
     if not doc:
         raise HTTPException(404, "Evento não encontrado")
+    await cache.invalidate("events")
     return EventOut(**doc)
 
 @router.delete("/events/{event_id}")
@@ -170,6 +192,7 @@ async def delete_event(event_id: str):
     result = await db.events.delete_one({"_id": oid})
     if result.deleted_count == 0:
         raise HTTPException(404, "Evento não encontrado")
+    await cache.invalidate("events")
     return {"status": "deleted"}
 
 
@@ -179,26 +202,26 @@ async def delete_event(event_id: str):
 @router.post("/jurors", response_model=JurorOut)
 async def create_juror(payload: JurorCreate):
     db = get_database()
-    doc = payload.dict()
+    doc = with_search_terms("jurados", payload.dict())
     doc["created_at"] = doc["updated_at"] = datetime.utcnow()
     result = await db.jurados.insert_one(doc)
     doc["_id"] = result.inserted_id
     return JurorOut(**doc)
 
-@router.get("/jurors", response_model=List[JurorOut])
-async def list_jurors():
-    db = get_database()
-    cursor = db.jurados.find().sort("created_at", -1)
-    items = []
-    async for doc in cursor:
-        items.append(JurorOut(**doc))
-    return items
+@router.get("/jurors", response_model=Page[JurorOut])
+async def list_jurors(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    fields: str | None = None,
+):
+    db = get_list_database()
+    return await fetch_page(db.jurados, {}, limit, cursor, JurorOut, fields)
 
 @router.patch("/jurors/{juror_id}", response_model=JurorOut)
 async def update_juror(juror_id: str, payload: JurorCreate):
     db = get_database()
     oid = parse_object_id(juror_id, "Jurado")
-    updates = {k: v for k, v in payload.dict().items() if v is not None}
+    updates = with_search_terms("jurados", {k: v for k, v in payload.dict().items() if v is not None})
     updates["updated_at"] = datetime.utcnow()
     doc = await db.jurados.find_one_and_update(
         {"_id": oid}, {"$set": updates}, return_document=ReturnDocument.AFTER
@@ -225,18 +248,87 @@ async def create_evaluation(payload: EvaluationCreate):
     db = get_database()
     doc = payload.dict()
     doc["created_at"] = doc["updated_at"] = datetime.utcnow()
-    result = await db.avaliacoes.insert_one(doc)
+    try:
+        result = await db.avaliacoes.insert_one(doc)
+    except DuplicateKeyError:
+        raise HTTPException(409, "Este jurado já avaliou este candidato")
     doc["_id"] = result.inserted_id
+    await refresh_candidates(db, [doc["candidateId"]])
     return EvaluationOut(**doc)
 
-@router.get("/evaluations", response_model=List[EvaluationOut])
-async def list_evaluations():
+@router.post("/evaluations/batch")
+async def submit_evaluations(payload: EvaluationBatch):
+    """
+    Todas as avaliações de um jurado num pedido: um único ``bulk_write`` não
+    ordenado de upserts por (candidateId, jurorId), por isso reenviar o lote
+    atualiza as notas em vez de as duplicar. Devolve o estado de cada item
+    pela ordem recebida.
+    """
     db = get_database()
-    cursor = db.avaliacoes.find().sort("created_at", -1)
-    items = []
-    async for doc in cursor:
-        items.append(EvaluationOut(**doc))
-    return items
+    now = datetime.utcnow()
+    items = payload.evaluations
+    statuses = [{"candidateId": str(item.candidateId)} for item in items]
+    operations, positions, seen = [], [], set()
+    for index, item in enumerate(items):
+        if item.candidateId in seen:
+            statuses[index].update(status="error", error="candidateId repetido no lote")
+            continue
+        seen.add(item.candidateId)
+        operations.append(UpdateOne(
+            {"candidateId": item.candidateId, "jurorId": payload.jurorId},
+            {
+                "$set": {"score": item.score, "comment": item.comment, "date": item.date, "updated_at": now},
+                "$setOnInsert": {"created_at": now},
+            },
+            upsert=True,
+        ))
+        positions.append(index)
+
+    try:
+        result = await db.avaliacoes.bulk_write(operations, ordered=False)
+        upserted, write_errors = result.upserted_ids, {}
+    except BulkWriteError as exc:
+        upserted = {row["index"]: row["_id"] for row in exc.details.get("upserted", [])}
+        write_errors = {
+            error["index"]: error.get("errmsg", "erro de escrita") for error in exc.details.get("writeErrors", [])
+        }
+
+    written = [items[index].candidateId for op, index in enumerate(positions) if op not in write_errors]
+    evaluation_ids = {
+        doc["candidateId"]: doc["_id"]
+        async for doc in db.avaliacoes.find(
+            {"jurorId": payload.jurorId, "candidateId": {"$in": written}}, {"candidateId": 1}
+        )
+    }
+    for op, index in enumerate(positions):
+        if op in write_errors:
+            statuses[index].update(status="error", error=write_errors[op])
+        else:
+            statuses[index].update(
+                status="created" if op in upserted else "updated",
+                _id=str(evaluation_ids.get(items[index].candidateId)),
+            )
+
+    await refresh_candidates(db, written)
+    counts = {"created": 0, "updated": 0, "error": 0}
+    for status in statuses:
+        counts[status["status"]] += 1
+    return {
+        "jurorId": str(payload.jurorId),
+        "created": counts["created"],
+        "updated": counts["updated"],
+        "failed": counts["error"],
+        "items": statuses,
+    }
+
+@router.get("/evaluations", response_model=Page[EvaluationOut])
+async def list_evaluations(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    fields: str | None = None,
+):
+    db = get_list_database()
+    return await fetch_page(db.avaliacoes, {}, limit, cursor, EvaluationOut, fields)
 
 @router.patch("/evaluations/{evaluation_id}", response_model=EvaluationOut)
 async def update_evaluation(evaluation_id: str, payload: EvaluationCreate):
@@ -244,20 +336,26 @@ async def update_evaluation(evaluation_id: str, payload: EvaluationCreate):
     oid = parse_object_id(evaluation_id, "Avaliacao")
     updates = {k: v for k, v in payload.dict().items() if v is not None}
     updates["updated_at"] = datetime.utcnow()
-    doc = await db.avaliacoes.find_one_and_update(
-        {"_id": oid}, {"$set": updates}, return_document=ReturnDocument.AFTER
-    )
-    if not doc:
+    try:
+        previous = await db.avaliacoes.find_one_and_update(
+            {"_id": oid}, {"$set": updates}, return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        raise HTTPException(409, "Este jurado já avaliou este candidato")
+    if not previous:
         raise HTTPException(404, "Avaliacao não encontrada")
+    doc = {**previous, **updates}
+    await refresh_candidates(db, [previous["candidateId"], doc["candidateId"]])
     return EvaluationOut(**doc)
 
 @router.delete("/evaluations/{evaluation_id}")
 async def delete_evaluation(evaluation_id: str):
     db = get_database()
     oid = parse_object_id(evaluation_id, "Avaliacao")
-    result = await db.avaliacoes.delete_one({"_id": oid})
-    if result.deleted_count == 0:
+    doc = await db.avaliacoes.find_one_and_delete({"_id": oid}, projection={"candidateId": 1})
+    if not doc:
         raise HTTPException(404, "Avaliacao não encontrada")
+    await refresh_candidates(db, [doc["candidateId"]])
     return {"status": "deleted"}
 
 
@@ -273,14 +371,14 @@ async def create_result(payload: ResultCreate):
     doc["_id"] = result.inserted_id
     return ResultOut(**doc)
 
-@router.get("/results", response_model=List[ResultOut])
-async def list_results():
-    db = get_database()
-    cursor = db.resultados.find().sort("created_at", -1)
-    items = []
-    async for doc in cursor:
-        items.append(ResultOut(**doc))
-    return items
+@router.get("/results", response_model=Page[ResultOut])
+async def list_results(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    fields: str | None = None,
+):
+    db = get_list_database()
+    return await fetch_page(db.resultados, {}, limit, cursor, ResultOut, fields)
 
 @router.patch("/results/{result_id}", response_model=ResultOut)
 async def update_result(result_id: str, payload: ResultCreate):
@@ -0,0 +1,166 @@
+"""
+Pesquisa de candidatos, candidaturas e jurados por nome, email e BI.
+
+Dois modos em ``GET /api/search``:
+ - ``prefix`` (autocompletar, por omissão): cada documento guarda em
+   ``search_terms`` os termos normalizados (minúsculas, sem acentos) do
+   nome, email e documento de identificação, palavra a palavra e por
+   inteiro. ``^prefixo`` sobre esse campo usa o índice multikey como um
+   intervalo, por isso não percorre a coleção.
+ - ``text``: índice de texto do Mongo (palavras completas, ordenado por
+   relevância).
+
+``search_terms`` é preenchido nas escritas (routes_crud, importação,
+candidaturas); para dados antigos: ``python search.py --backfill``.
+"""
+import argparse
+import asyncio
+import re
+import unicodedata
+from typing import Iterable, List, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from pymongo import UpdateOne
+
+from db import get_database, get_list_database
+from fast_json import MongoJSONResponse
+
+router = APIRouter(tags=["pesquisa"])
+
+# coleção -> campos pesquisáveis
+SEARCH_SOURCES = {
+    "candidatos": ("name", "email", "identityDocument"),
+    "applications": ("first_name", "last_name", "email"),
+    "jurados": ("name", "email"),
+}
+# nome na API -> (coleção, campos devolvidos)
+SEARCH_TARGETS = {
+    "candidates": ("candidatos", ("name", "email", "identityDocument", "categoryId")),
+    "applications": ("applications", ("first_name", "last_name", "email", "category", "municipality")),
+    "jurors": ("jurados", ("name", "email", "specialty")),
+}
+MIN_PREFIX_LENGTH = 2
+MAX_SEARCH_RESULTS = 50
+
+
+def normalize(value) -> str:
+    """
+    Minúsculas, sem acentos e com espaços simples: "  João  Mário" -> "joao mario".
+    """
+    if value is None:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(value))
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())
+
+
+def search_terms(doc: dict, fields: Iterable[str]) -> List[str]:
+    terms = set()
+    for field in fields:
+        value = normalize(doc.get(field))
+        if not value:
+            continue
+        terms.add(value)
+        terms.update(value.split())
+    return sorted(terms)
+
+
+def with_search_terms(collection: str, doc: dict) -> dict:
+    """
+    Acrescenta ``search_terms`` a um documento antes de o gravar.
+    """
+    fields = SEARCH_SOURCES[collection]
+    if collection == "applications":
+        # nome completo também como termo, para "ana sil" encontrar "Ana Silva"
+        doc["search_terms"] = search_terms(
+            {**doc, "full_name": f"{doc.get('first_name') or ''} {doc.get('last_name') or ''}"},
+            fields + ("full_name",),
+        )
+    else:
+        doc["search_terms"] = search_terms(doc, fields)
+    return doc
+
+
+# ───────────────────────────────────────────────
+# Consultas
+# ───────────────────────────────────────────────
+def prefix_query(q: str) -> dict:
+    words = normalize(q).split()
+    if not words or len("".join(words)) < MIN_PREFIX_LENGTH:
+        raise HTTPException(status_code=400, detail=f"q deve ter pelo menos {MIN_PREFIX_LENGTH} caracteres")
+    # a frase inteira como prefixo de um termo, ou cada palavra como prefixo de algum termo
+    phrase = {"search_terms": {"$regex": f"^{re.escape(' '.join(words))}"}}
+    if len(words) == 1:
+        return phrase
+    return {"$or": [phrase, {"$and": [{"search_terms": {"$regex": f"^{re.escape(word)}"}} for word in words]}]}
+
+
+async def search_collection(database, target: str, q: str, mode: str, limit: int) -> list:
+    collection_name, fields = SEARCH_TARGETS[target]
+    projection = {field: 1 for field in fields}
+    collection = database[collection_name]
+    if mode == "text":
+        projection["score"] = {"$meta": "textScore"}
+        cursor = collection.find({"$text": {"$search": q}}, projection).sort([("score", {"$meta": "textScore"})])
+    else:
+        cursor = collection.find(prefix_query(q), projection)
+    return await cursor.limit(limit).to_list(length=limit)
+
+
+@router.get("/search")
+async def search(
+    q: str,
+    mode: str = Query("prefix", pattern="^(prefix|text)$"),
+    types: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=MAX_SEARCH_RESULTS),
+):
+    """
+    Pesquisa em candidatos, candidaturas e jurados (``types=candidates,jurors``
+    restringe). ``mode=prefix`` para autocompletar, ``mode=text`` para palavras
+    completas ordenadas por relevância.
+    """
+    targets = [name.strip() for name in (types or ",".join(SEARCH_TARGETS)).split(",") if name.strip()]
+    unknown = [name for name in targets if name not in SEARCH_TARGETS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Tipos desconhecidos: {', '.join(unknown)}")
+    if mode == "prefix":
+        prefix_query(q)  # valida antes de lançar as consultas
+
+    database = get_list_database()
+    found = await asyncio.gather(*(search_collection(database, target, q, mode, limit) for target in targets))
+    return MongoJSONResponse({"query": q, "mode": mode, "results": dict(zip(targets, found))})
+
+
+# ───────────────────────────────────────────────
+# Preenchimento de search_terms em dados existentes
+# ───────────────────────────────────────────────
+async def backfill_search_terms(database, batch_size: int = 500) -> dict:
+    counts = {}
+    for collection_name, fields in SEARCH_SOURCES.items():
+        collection = database[collection_name]
+        projection = {field: 1 for field in fields}
+        operations, updated = [], 0
+        async for doc in collection.find({}, projection, batch_size=batch_size):
+            terms = with_search_terms(collection_name, dict(doc))["search_terms"]
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"search_terms": terms}}))
+            if len(operations) >= batch_size:
+                await collection.bulk_write(operations, ordered=False)
+                updated += len(operations)
+                operations = []
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+        counts[collection_name] = updated
+        print(f"{collection_name}: {updated} documentos atualizados")
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manutenção da pesquisa.")
+    parser.add_argument("--backfill", action="store_true", help="recalcula search_terms em todas as coleções")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    if args.backfill:
+        asyncio.run(backfill_search_terms(get_database(), args.batch_size))
+    else:
+        parser.print_help()
@@ -17,6 +17,7 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 from sms_router import router as sms_router
+from sms_dispatcher import dispatcher as sms_dispatcher
 import base64
 import io
 import logging
@@ -26,13 +27,12 @@ from pathlib import Path
 from typing import List
 
 from bson import Binary, ObjectId
-from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi import APIRouter, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
-from motor.motor_asyncio import AsyncIOMotorGridFSBucket
 
 # importa do novo db.py
-from db import get_database
+from db import get_database, get_list_database
 
 # importa modelos
 from mongo_models import (
@@ -43,17 +43,44 @@ from mongo_models import (
     DocumentCreate, DocumentUpdate, DocumentOut,
     EvaluationCreate, EvaluationUpdate, EvaluationOut,
     ResultCreate, ResultUpdate, ResultOut,
-    ensure_indexes,
+    ensure_indexes, missing_required_indexes,
 )
+from index_audit import run_index_audit
+from projection import fields_projection, parse_fields, sparse_items
+from pagination import DEFAULT_PAGE_SIZE, KEYSET_SORT, MAX_PAGE_SIZE, encode_cursor, keyset_filter
+from fast_json import MongoJSONResponse
 
 # importa o router de documentos
 from documentos_router import documentos_router
+from downloads import file_download_response, gridfs_download_response, stat_upload
 # importa o router de CRUD (candidatos, categorias, etc.)
 from routes_crud import router as crud_router
+# pontuações agregadas e classificação por categoria
+from ranking import router as ranking_router
+# importação em massa (CSV / NDJSON)
+from import_router import router as import_router
+# exportação de candidaturas em streaming (CSV / NDJSON)
+from export_router import router as export_router
+# arquivos ZIP dos documentos, gerados em streaming
+from archive_router import router as archive_router
+# latência e contagens por rota em /metrics (Prometheus)
+from metrics import METRICS_ENABLED, MetricsMiddleware
+from metrics import router as metrics_router
+from mongo_monitoring import router as mongo_metrics_router
+# liveness / readiness com o estado do pool Mongo
+from health_router import router as health_router
+# pesquisa por prefixo / texto em candidatos, candidaturas e jurados
+from search import router as search_router
+from search import with_search_terms
+# resultados / avaliações em direto (SSE)
+from live_results import feed as live_feed
+from live_results import router as live_router
+# parser multipart em streaming
+from storage import MultipartUploadParser, discard_streamed_files
+# ficheiros endereçados por conteúdo (um exemplar por SHA-256)
+from blob_store import blob_location, release_all, store_all, store_base64, store_path
 
 ROOT_DIR = Path(__file__).parent
-UPLOAD_ROOT = Path(ROOT_DIR) / "categorias"
-UPLOAD_ROOT.mkdir(exist_ok=True)  # cria pasta raiz
 
 app = FastAPI(title="PRENTMA API", description="Backend API for PRENTMA", version="1.0.0")
 api_router = APIRouter(prefix="/api")
@@ -89,108 +116,239 @@ async def support_message(payload: dict = Body(...)):
 # ───────────────────────────────────────────────
 # SUBMISSÃO DE CANDIDATURA
 # ───────────────────────────────────────────────
+APPLICATION_FIELDS = (
+    "first_name", "last_name", "email", "phone", "city", "address",
+    "category", "years_experience", "municipality", "accepted_terms",
+)
+
+
+def build_application_doc(payload: dict) -> dict:
+    """
+    Monta o documento base da candidatura a partir dos campos do formulário.
+    """
+    application_doc = {field: payload.get(field) for field in APPLICATION_FIELDS}
+    application_doc["documents"] = []
+    application_doc["created_at"] = datetime.utcnow()
+    return with_search_terms("applications", application_doc)
+
+
+def build_document_records(application_id, payload: dict, document_type: str, filename: str,
+                           content_type: str | None, size, blob: dict) -> tuple[dict, dict]:
+    """
+    Devolve (linha de application_documents, resumo embutido em applications.documents).
+    """
+    stored_document = {
+        "_id": ObjectId(),
+        "application_id": application_id,
+        "type": document_type,
+        "name": filename,
+        "category": payload.get("category"),
+        "candidate_name": f"{payload.get('first_name','')} {payload.get('last_name','')}",
+        "content_type": content_type or "application/octet-stream",
+        "size": size,
+        "uploaded_at": datetime.utcnow(),
+    }
+    # sha256 + file_path (caminho físico no servidor) ou file_id do blob partilhado
+    stored_document.update(blob_location(blob))
+    summary = {
+        "id": str(stored_document["_id"]),
+        "type": stored_document["type"],
+        "name": stored_document["name"],
+        "category": stored_document["category"],
+        "candidate_name": stored_document["candidate_name"],
+        "content_type": stored_document["content_type"],
+        "size": stored_document["size"],
+        "download_url": f"/api/applications/{application_id}/documents/{stored_document['_id']}",
+    }
+    return stored_document, summary
+
+
+async def insert_application(database, application_doc: dict, stored_documents: list) -> None:
+    """
+    Grava a candidatura (documents já embutidos) e as linhas dos anexos:
+    uma escrita para cada. Se a segunda falhar, remove a primeira, para não
+    ficar uma candidatura a apontar para blobs que o chamador vai libertar.
+    """
+    await database.applications.insert_one(application_doc)
+    if not stored_documents:
+        return
+    try:
+        await database.application_documents.insert_many(stored_documents)
+    except Exception:
+        await database.application_documents.delete_many({"application_id": application_doc["_id"]})
+        await database.applications.delete_one({"_id": application_doc["_id"]})
+        raise
+
+
 @api_router.post("/applications", status_code=201)
 async def create_application(payload: dict):
     """
     Recebe os dados do formulário (payload) e grava no MongoDB.
     """
     database = get_database()
-    applications = database.applications
-
-    # monta o documento básico
-    application_doc = {
-        "first_name": payload.get("first_name"),
-        "last_name": payload.get("last_name"),
-        "email": payload.get("email"),
-        "phone": payload.get("phone"),
-        "city": payload.get("city"),
-        "address": payload.get("address"),
-        "category": payload.get("category"),
-        "years_experience": payload.get("years_experience"),
-        "municipality": payload.get("municipality"),
-        "accepted_terms": payload.get("accepted_terms"),
-        "documents": [],
-        "created_at": datetime.utcnow(),
-    }
 
-    # salva aplicação
-    result = await applications.insert_one(application_doc)
-    application_id = result.inserted_id
+    # monta o documento básico; o _id é gerado aqui para ligar os documentos
+    application_doc = build_application_doc(payload)
+    application_id = application_doc["_id"] = ObjectId()
 
-    # grava documentos se houver
-    documents_collection = database.application_documents
+    # grava os anexos em paralelo no pool de I/O (decode base64 e hash incluídos);
+    # conteúdo repetido (mesmo BI noutra candidatura) reaproveita o blob existente
     docs_payload = payload.get("documents", [])
-    docs_meta = []
-
-    for document in docs_payload:
-        # decode base64
-        file_bytes = base64.b64decode(document["data"])
-        candidate_name = f"{payload.get('first_name','')}_{payload.get('last_name','')}".strip().replace(" ", "_")
-        category_name = payload.get("category", "SemCategoria").replace(" ", "_")
-
-        # cria pastas conforme categoria/nome candidato
-        candidate_folder = UPLOAD_ROOT / category_name / candidate_name
-        candidate_folder.mkdir(parents=True, exist_ok=True)
-
-        # salva arquivo fisicamente
-        filename = document["name"]
-        file_path = candidate_folder / filename
-        with open(file_path, "wb") as f:
-            f.write(file_bytes)
-
-        # só metadados no Mongo
-        stored_document = {
-            "_id": ObjectId(),
-            "application_id": application_id,
-            "type": document["type"],
-            "name": filename,
-            "category": payload.get("category"),
-            "candidate_name": f"{payload.get('first_name','')} {payload.get('last_name','')}",
-            "content_type": document.get("content_type") or "application/octet-stream",
-            "size": document.get("size"),
-            "file_path": str(file_path),  # caminho físico no servidor
-            "uploaded_at": datetime.utcnow(),
-        }
-        await documents_collection.insert_one(stored_document)
-
-        docs_meta.append(
-            {
-                "id": str(stored_document["_id"]),
-                "type": stored_document["type"],
-                "name": stored_document["name"],
-                "category": stored_document["category"],
-                "candidate_name": stored_document["candidate_name"],
-                "content_type": stored_document["content_type"],
-                "size": stored_document["size"],
-                "download_url": f"/api/applications/{application_id}/documents/{stored_document['_id']}",
-            }
-        )
+    blobs = await store_all(database, [store_base64(database, document["data"]) for document in docs_payload])
+
+    # só metadados no Mongo
+    stored_documents = []
+    try:
+        for document, blob in zip(docs_payload, blobs):
+            stored_document, summary = build_document_records(
+                application_id, payload, document["type"], Path(document["name"]).name,
+                document.get("content_type"), document.get("size") or blob["size"], blob,
+            )
+            stored_documents.append(stored_document)
+            application_doc["documents"].append(summary)
+        await insert_application(database, application_doc, stored_documents)
+    except Exception:
+        await release_all(database, blobs)
+        raise
+    return {"message": "Candidatura criada com sucesso", "id": str(application_id)}
+
+
+@api_router.post("/applications/upload", status_code=201)
+async def create_application_upload(request: Request):
+    """
+    Variante multipart/form-data da submissão.
+
+    Campos de texto são os mesmos do JSON; cada parte com ficheiro é um
+    documento cujo tipo é o nome do campo (ex.: ``bi``, ``cv``). Os ficheiros
+    são gravados em disco em blocos à medida que chegam, por isso a memória
+    usada não depende do tamanho dos anexos.
+    """
+    fields, files = await MultipartUploadParser(request).parse()
+    payload = dict(fields)
+    if "accepted_terms" in payload:
+        payload["accepted_terms"] = payload["accepted_terms"].strip().lower() in {"1", "true", "on", "yes"}
+
+    database = get_database()
+    application_doc = build_application_doc(payload)
+    application_id = application_doc["_id"] = ObjectId()
 
-    if docs_meta:
-        await applications.update_one(
-            {"_id": application_id},
-            {"$set": {"documents": docs_meta}},
+    try:
+        blobs = await store_all(
+            database,
+            [store_path(database, streamed.temp_path, streamed.digest.hexdigest(), streamed.size)
+             for streamed in files],
         )
-        application_doc["documents"] = docs_meta
+    except Exception:
+        await discard_streamed_files(files)
+        raise
 
-    application_doc["_id"] = application_id
+    stored_documents = []
+    try:
+        for streamed, blob in zip(files, blobs):
+            stored_document, summary = build_document_records(
+                application_id, payload, streamed.field_name, streamed.filename,
+                streamed.content_type, streamed.size, blob,
+            )
+            stored_documents.append(stored_document)
+            application_doc["documents"].append(summary)
+        await insert_application(database, application_doc, stored_documents)
+    except Exception:
+        await release_all(database, blobs)
+        raise
     return {"message": "Candidatura criada com sucesso", "id": str(application_id)}
 
 # ───────────────────────────────────────────────
 # LISTAR TODAS AS CANDIDATURAS
 # ───────────────────────────────────────────────
+# campos da tabela de candidaturas (pesquisa com facetas)
+APPLICATION_LIST_FIELDS = (
+    "first_name", "last_name", "email", "phone", "category", "municipality", "city", "created_at",
+)
+# documento completo menos o conteúdo legado embutido e os termos de pesquisa internos
+APPLICATION_DEFAULT_PROJECTION = {"documents.data": 0, "search_terms": 0}
+
+
 @api_router.get("/applications")
-async def list_applications(limit: int = 50):
+async def list_applications(limit: int = 50, fields: str | None = None):
     """
     Lista candidaturas recentes com metadados.
+
+    Por omissão devolve a candidatura completa (sem ``documents[].data``);
+    ``fields=a,b`` devolve só esses campos (ex.: ``fields=first_name,documents``).
     """
-    database = get_database()
-    cursor = database.applications.find().sort("created_at", -1).limit(limit)
-    apps = []
-    async for doc in cursor:
-        doc["_id"] = str(doc["_id"])
-        apps.append(doc)
-    return apps
+    database = get_list_database()
+    requested = parse_fields(fields, APPLICATION_FIELDS + ("documents", "created_at"))
+    projection = {name: 1 for name in requested} if requested else APPLICATION_DEFAULT_PROJECTION
+    apps = await database.applications.find({}, projection).sort("created_at", -1).limit(limit).to_list(length=limit)
+    return MongoJSONResponse(apps)
+
+# ───────────────────────────────────────────────
+# PESQUISA DE CANDIDATURAS COM FACETAS
+# ───────────────────────────────────────────────
+APPLICATION_FACETS = ("category", "municipality", "city", "years_experience")
+MAX_FACET_VALUES = 100
+
+
+def facet_filter(name: str, raw: str) -> dict:
+    """
+    ``a,b`` -> {"$in": [...]}; years_experience aceita o valor como texto ou número.
+    """
+    values = [value.strip() for value in raw.split(",") if value.strip()]
+    if name == "years_experience":
+        values += [int(value) for value in values if value.lstrip("-").isdigit()]
+    return values[0] if len(values) == 1 else {"$in": values}
+
+
+@api_router.get("/applications/search")
+async def search_applications(
+    category: str | None = None,
+    municipality: str | None = None,
+    city: str | None = None,
+    years_experience: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    fields: str | None = None,
+):
+    """
+    Página de candidaturas filtradas + total + contagens por faceta, numa só
+    agregação ``$facet``. Cada filtro aceita vários valores separados por
+    vírgula; as contagens são calculadas sobre o resultado já filtrado.
+    """
+    database = get_list_database()
+    requested = parse_fields(fields, APPLICATION_FIELDS + ("documents", "created_at")) or APPLICATION_LIST_FIELDS
+    filters = {"category": category, "municipality": municipality, "city": city, "years_experience": years_experience}
+    match = {name: facet_filter(name, raw) for name, raw in filters.items() if raw}
+
+    # $match + $sort antes do $facet usam os índices (filtro, created_at)
+    items_stage = [{"$limit": limit + 1}, {"$project": fields_projection(list(requested))}]
+    if cursor:
+        items_stage.insert(0, {"$match": keyset_filter(cursor)})
+    facets = {
+        "items": items_stage,
+        "total": [{"$count": "count"}],
+    }
+    for name in APPLICATION_FACETS:
+        # years_experience chega como texto ou número conforme o formulário
+        key = {"$toString": f"${name}"} if name == "years_experience" else f"${name}"
+        facets[name] = [
+            {"$group": {"_id": key, "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": MAX_FACET_VALUES},
+        ]
+    pipeline = [{"$match": match}, {"$sort": dict(KEYSET_SORT)}, {"$facet": facets}]
+
+    result = (await database.applications.aggregate(pipeline).to_list(length=1))[0]
+    docs = result["items"]
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return MongoJSONResponse({
+        "items": sparse_items(docs[:limit], list(requested)),
+        "next_cursor": next_cursor,
+        "total": result["total"][0]["count"] if result["total"] else 0,
+        "facets": {
+            name: [{"value": row["_id"], "count": row["count"]} for row in result[name]]
+            for name in APPLICATION_FACETS
+        },
+    })
 
 # ───────────────────────────────────────────────
 # LISTAR DOCUMENTOS DE UMA CANDIDATURA
@@ -211,7 +369,7 @@ async def list_application_documents(application_id: str):
 # DOWNLOAD DE DOCUMENTO ESPECÍFICO
 # ───────────────────────────────────────────────
 @api_router.get("/applications/{application_id}/documents/{document_id}")
-async def download_application_document(application_id: str, document_id: str):
+async def download_application_document(application_id: str, document_id: str, request: Request):
     """
     Faz download de um documento específico de uma candidatura.
     """
@@ -226,33 +384,28 @@ async def download_application_document(application_id: str, document_id: str):
     if not document:
         raise HTTPException(status_code=404, detail="Documento não encontrado")
 
-    # 1) se arquivo gravao fisicamente no servidor
+    # 1) se arquivo gravado fisicamente no servidor: ETag, 304 e Range
     file_path = document.get("file_path")
-    if file_path and os.path.exists(file_path):
-        filename = document.get("name") or Path(file_path).name
-        headers = {"Content-Disposition": f"attachment; filename=\"{filename}\""}
-        return StreamingResponse(
-            open(file_path, "rb"),
-            media_type=document.get("content_type") or "application/octet-stream",
-            headers=headers,
+    uploaded = await stat_upload(file_path) if file_path else None
+    if uploaded:
+        path, stat = uploaded
+        return file_download_response(
+            path,
+            stat,
+            request,
+            filename=document.get("name") or path.name,
+            content_type=document.get("content_type"),
         )
 
-    # 2) se arquivo foi migrado para GridFS (campo file_id)
+    # 2) se arquivo foi migrado para GridFS (campo file_id): streaming com Range
     file_id = document.get("file_id")
     if file_id:
-        bucket = AsyncIOMotorGridFSBucket(database)
-        buffer = io.BytesIO()
-        try:
-            await bucket.download_to_stream(file_id, buffer)
-        except Exception:
-            raise HTTPException(status_code=404, detail="Arquivo GridFS não encontrado")
-        buffer.seek(0)
-        filename = document.get("name") or document.get("originalName") or str(file_id)
-        headers = {"Content-Disposition": f"attachment; filename=\"{filename}\""}
-        return StreamingResponse(
-            buffer,
-            media_type=document.get("content_type") or "application/octet-stream",
-            headers=headers,
+        return await gridfs_download_response(
+            database,
+            file_id,
+            request,
+            filename=document.get("name") or document.get("originalName") or str(file_id),
+            content_type=document.get("content_type"),
         )
 
     # 3) fallback: se ainda existir campo 'data' com BinData
@@ -278,27 +431,8 @@ async def download_application_document(application_id: str, document_id: str):
     raise HTTPException(status_code=404, detail="Arquivo não encontrado")
 
 # ───────────────────────────────────────────────
-# CRUD CATEGORIAS (exemplo)
+# CATEGORIA POR ID (criação e listagem paginada ficam em routes_crud)
 # ───────────────────────────────────────────────
-@api_router.post("/categories", response_model=CategoryOut, status_code=201, tags=["categorias"])
-async def create_category(payload: CategoryCreate):
-    database = get_database()
-    category_doc = payload.model_dump()
-    category_doc["created_at"] = datetime.utcnow()
-    category_doc["updated_at"] = datetime.utcnow()
-    result = await database.categories.insert_one(category_doc)
-    category_doc["_id"] = result.inserted_id
-    return CategoryOut.model_validate(category_doc)
-
-@api_router.get("/categories", response_model=List[CategoryOut], tags=["categorias"])
-async def list_categories():
-    database = get_database()
-    cursor = database.categories.find().sort("created_at", -1)
-    items: List[CategoryOut] = []
-    async for doc in cursor:
-        items.append(CategoryOut.model_validate(doc))
-    return items
-
 @api_router.get("/categories/{category_id}", response_model=CategoryOut, tags=["categorias"])
 async def get_category(category_id: str):
     database = get_database()
@@ -326,6 +460,17 @@ async def support_message(payload: dict = Body(...)):
 app.include_router(api_router)
 app.include_router(documentos_router)
 app.include_router(crud_router, prefix="/api")
+app.include_router(ranking_router, prefix="/api")
+app.include_router(import_router, prefix="/api")
+app.include_router(export_router, prefix="/api")
+app.include_router(archive_router, prefix="/api")
+app.include_router(health_router, prefix="/api")
+app.include_router(search_router, prefix="/api")
+app.include_router(live_router, prefix="/api")
+if METRICS_ENABLED:
+    app.include_router(metrics_router)
+    app.include_router(mongo_metrics_router)
+    app.add_middleware(MetricsMiddleware)
 
 # ───────────────────────────────────────────────
 # Configurações CORS
@@ -348,13 +493,25 @@ async def startup_event():
     try:
         await database.command("ping")
         await ensure_indexes(database)
+        missing = await missing_required_indexes(database)
         logger.info("Connected to MongoDB")
+        # modo diagnóstico: explain de cada rota (COLLSCAN / SORT em memória)
+        if os.getenv("INDEX_AUDIT", "false").lower() in {"1", "true", "yes"}:
+            await run_index_audit(database)
     except Exception as exc:
         logger.exception("Unable to reach MongoDB")
         raise RuntimeError("Cannot connect to MongoDB") from exc
+    # sem o índice único, /evaluations/batch deixaria de ser idempotente
+    if missing:
+        raise RuntimeError(
+            f"Índices obrigatórios em falta: {', '.join(missing)} "
+            "(pares duplicados? corra python dedupe_avaliacoes.py)"
+        )
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await sms_dispatcher.stop()
+    await live_feed.stop()
     from db import client
     if client is not None:
         client.close()
@@ -0,0 +1,228 @@
+"""
+Envio de SMS pela TelcoSMS com um cliente HTTP partilhado.
+
+Um único ``httpx.AsyncClient`` (ligações keep-alive reutilizadas) serve
+todos os envios. Os envios em massa entram numa fila e são despachados por
+um número fixo de workers, com limite de taxa e novas tentativas com
+backoff exponencial, sem prender os workers da API.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger("sms")
+
+# Usa a chave QAS (sandbox)
+TELCOSMS_API_KEY = os.getenv("TELCOSMS_QAS_KEY", "qas059051b96c15f9b1a1c068827e")
+# endpoint v1; aponte para telcosms_stub.py em desenvolvimento/testes
+TELCOSMS_URL = os.getenv("TELCOSMS_URL", "https://www.telcosms.co.ao/send_message")
+
+SMS_CONCURRENCY = int(os.getenv("SMS_CONCURRENCY", "10"))
+SMS_RATE_PER_SECOND = float(os.getenv("SMS_RATE_PER_SECOND", "20"))
+SMS_MAX_RETRIES = int(os.getenv("SMS_MAX_RETRIES", "3"))
+SMS_QUEUE_SIZE = int(os.getenv("SMS_QUEUE_SIZE", "10000"))
+SMS_TIMEOUT_SECONDS = float(os.getenv("SMS_TIMEOUT_SECONDS", "10"))
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def build_payload(phone_number: str, message_body: str) -> dict:
+    return {
+        "message": 1,
+        "api_key_app": TELCOSMS_API_KEY,
+        "phone_number": phone_number,
+        "message_body": message_body,
+    }
+
+
+class RateLimiter:
+    """
+    Token bucket: no máximo ``rate`` envios por segundo (com rajada igual a rate).
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.capacity = max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class SmsJob:
+    """
+    Estado de um envio em massa (mantido em memória no worker que o aceitou).
+    """
+
+    def __init__(self, total: int = 0):
+        self.id = uuid.uuid4().hex
+        self.total = total
+        self.sent = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self._done = asyncio.Event()
+
+    @property
+    def pending(self) -> int:
+        return self.total - self.sent - self.failed
+
+    def record(self, phone_number: str, ok: bool, error: Optional[str] = None) -> None:
+        if ok:
+            self.sent += 1
+        else:
+            self.failed += 1
+            if len(self.errors) < 1000:
+                self.errors.append({"phone_number": phone_number, "error": error})
+        if self.pending <= 0:
+            self.finished_at = datetime.utcnow()
+            self._done.set()
+
+    async def wait(self) -> None:
+        if self.total:
+            await self._done.wait()
+
+    def as_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": "done" if self.pending <= 0 else "running",
+            "total": self.total,
+            "sent": self.sent,
+            "failed": self.failed,
+            "pending": self.pending,
+            "errors": self.errors,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class SmsDispatcher:
+    def __init__(self, url: str = TELCOSMS_URL, concurrency: int = SMS_CONCURRENCY,
+                 rate_per_second: float = SMS_RATE_PER_SECOND, max_retries: int = SMS_MAX_RETRIES,
+                 queue_size: int = SMS_QUEUE_SIZE, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.url = url
+        # None = rede; nos testes, httpx.ASGITransport(app=telcosms_stub.app)
+        self.transport = transport
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.queue_size = queue_size
+        self.rate_limiter = RateLimiter(rate_per_second)
+        self.jobs: Dict[str, SmsJob] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    # ciclo de vida ──────────────────────────────
+    async def start(self) -> None:
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            transport=self.transport,
+            timeout=SMS_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+        )
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # envio ─────────────────────────────────────
+    async def send_now(self, phone_number: str, message_body: str) -> httpx.Response:
+        """
+        Envia um SMS com limite de taxa e novas tentativas; devolve a última resposta.
+        """
+        await self.start()
+        payload = build_payload(phone_number, message_body)
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire()
+            try:
+                resp = await self._client.post(self.url, json=payload)
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                if resp.status_code not in RETRYABLE_STATUS or attempt >= self.max_retries:
+                    return resp
+                delay = self._retry_after(resp) or self._backoff(attempt)
+            attempt += 1
+            logger.info("SMS para %s: nova tentativa %d em %.2fs", phone_number, attempt, delay)
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        return min(30.0, 0.5 * 2 ** attempt) * (0.5 + random.random() / 2)
+
+    @staticmethod
+    def _retry_after(resp: httpx.Response) -> Optional[float]:
+        try:
+            return min(30.0, float(resp.headers["retry-after"]))
+        except (KeyError, ValueError):
+            return None
+
+    async def submit_bulk(self, messages: Iterable[Tuple[str, str]]) -> SmsJob:
+        """
+        Coloca os envios na fila e devolve o job logo; espera só se a fila encher.
+        """
+        await self.start()
+        self._prune_jobs()
+        messages = list(messages)
+        job = SmsJob(total=len(messages))
+        self.jobs[job.id] = job
+        if not messages:
+            job.finished_at = datetime.utcnow()
+        for phone_number, message_body in messages:
+            await self._queue.put((job, phone_number, message_body))
+        return job
+
+    def _prune_jobs(self, max_age_seconds: float = 3600) -> None:
+        now = datetime.utcnow()
+        for job_id in [job_id for job_id, job in self.jobs.items()
+                       if job.finished_at and (now - job.finished_at).total_seconds() > max_age_seconds]:
+            del self.jobs[job_id]
+
+    async def _worker(self) -> None:
+        while True:
+            job, phone_number, message_body = await self._queue.get()
+            try:
+                resp = await self.send_now(phone_number, message_body)
+                ok = resp.is_success
+                job.record(phone_number, ok, None if ok else f"HTTP {resp.status_code}: {resp.text[:200]}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.error("Erro ao enviar SMS para %s: %s", phone_number, exc)
+                job.record(phone_number, False, str(exc))
+            finally:
+                self._queue.task_done()
+
+
+dispatcher = SmsDispatcher()
@@ -1,41 +1,81 @@
 # sms_router.py
-from fastapi import APIRouter
-import httpx
-import os
+from typing import List, Optional
+
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
 import logging
 
+from db import get_database
+from sms_dispatcher import build_payload, dispatcher
+
 router = APIRouter(prefix="/api", tags=["sms"])
 
 # Configuração do logger (para ver no terminal)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("sms")
 
-# Usa a chave QAS (sandbox)
-TELCOSMS_API_KEY = os.getenv("TELCOSMS_QAS_KEY", "qas059051b96c15f9b1a1c068827e")
-TELCOSMS_URL = "https://www.telcosms.co.ao/send_message"  # endpoint v1
+
+class BulkSmsRequest(BaseModel):
+    message_body: str
+    phone_numbers: List[str] = []
+    categoryId: Optional[str] = None
+
 
 @router.post("/send-sms")
 async def send_sms(phone_number: str, message_body: str):
     """
     Envia um SMS (modo teste com QAS).
     """
-    payload = {
-        "message": 1,
-        "api_key_app": TELCOSMS_API_KEY,
-        "phone_number": phone_number,
-        "message_body": message_body,
-    }
+    payload = build_payload(phone_number, message_body)
     logger.info("Payload TelcoSMS: %s", payload)
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        try:
-            resp = await client.post(TELCOSMS_URL, json=payload)
-            logger.info("Resposta TelcoSMS: %s %s", resp.status_code, resp.text)
-            return {
-                "status": resp.status_code,
-                "response": resp.text,
-                "payload": payload
-            }
-        except Exception as e:
-            logger.error("Erro ao enviar SMS: %s", e)
-            return {"error": str(e)}
+    try:
+        resp = await dispatcher.send_now(phone_number, message_body)
+        logger.info("Resposta TelcoSMS: %s %s", resp.status_code, resp.text)
+        return {
+            "status": resp.status_code,
+            "response": resp.text,
+            "payload": payload
+        }
+    except Exception as e:
+        logger.error("Erro ao enviar SMS: %s", e)
+        return {"error": str(e)}
+
+
+@router.post("/send-sms/bulk", status_code=202)
+async def send_sms_bulk(payload: BulkSmsRequest):
+    """
+    Envia a mesma mensagem a vários números e/ou a todos os candidatos de uma
+    categoria. Responde logo com o job; o progresso fica em /send-sms/jobs/{id}.
+    """
+    if payload.categoryId is not None and not ObjectId.is_valid(payload.categoryId):
+        raise HTTPException(status_code=400, detail="categoryId inválido")
+
+    async def recipients():
+        seen = set()
+        for phone_number in payload.phone_numbers:
+            if phone_number not in seen:
+                seen.add(phone_number)
+                yield phone_number
+        if payload.categoryId:
+            database = get_database()
+            cursor = database.candidatos.find({"categoryId": ObjectId(payload.categoryId)}, {"phone": 1})
+            async for candidate in cursor:
+                phone_number = candidate.get("phone")
+                if phone_number and phone_number not in seen:
+                    seen.add(phone_number)
+                    yield phone_number
+
+    messages = [(phone_number, payload.message_body) async for phone_number in recipients()]
+    job = await dispatcher.submit_bulk(messages)
+    logger.info("Job SMS %s: %d mensagens na fila", job.id, job.total)
+    return job.as_dict()
+
+
+@router.get("/send-sms/jobs/{job_id}")
+async def get_sms_job(job_id: str):
+    job = dispatcher.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado neste worker")
+    return job.as_dict()
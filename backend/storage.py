@@ -0,0 +1,212 @@
+"""
+Armazenamento em disco dos documentos de candidatura.
+
+Concentra a pasta raiz de uploads, os nomes de pasta seguros e o parser
+multipart que grava cada ficheiro em blocos à medida que chega, sem
+carregar o pedido inteiro em memória.
+"""
+import asyncio
+import base64
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, Request
+from multipart.multipart import MultipartParser, parse_options_header
+
+ROOT_DIR = Path(__file__).parent
+UPLOAD_ROOT = ROOT_DIR / "categorias"
+UPLOAD_ROOT.mkdir(exist_ok=True)  # cria pasta raiz
+
+# ficheiros em receção ficam aqui até o pedido terminar; mesma partição
+# que UPLOAD_ROOT para que a passagem para a pasta final seja um rename
+INCOMING_DIR = UPLOAD_ROOT / ".incoming"
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "50")) * 1024 * 1024
+MAX_FIELD_BYTES = 64 * 1024
+
+# pool dedicado e limitado para I/O de ficheiros, para que picos de
+# submissões não esgotem o threadpool partilhado do Starlette
+FILE_IO_WORKERS = int(os.getenv("FILE_IO_WORKERS", "8"))
+_file_io_executor = ThreadPoolExecutor(max_workers=FILE_IO_WORKERS, thread_name_prefix="prentma-io")
+
+
+async def run_io(func, *args):
+    """
+    Executa uma função bloqueante de disco no pool de I/O.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_file_io_executor, func, *args)
+
+
+# ───────────────────────────────────────────────
+# Nomes de pasta
+# ───────────────────────────────────────────────
+def safe_segment(value: Optional[str], default: str) -> str:
+    """
+    Normaliza um nome para ser usado como pasta (sem separadores de caminho).
+    """
+    cleaned = (value or "").strip().replace(" ", "_").replace("/", "_").replace("\\", "_")
+    if cleaned in {"", ".", ".."}:
+        return default
+    return cleaned
+
+
+# ───────────────────────────────────────────────
+# Parser multipart com escrita em streaming
+# ───────────────────────────────────────────────
+class StreamedFile:
+    """
+    Ficheiro recebido num pedido multipart, já gravado em INCOMING_DIR.
+    """
+
+    def __init__(self, field_name: str, filename: str, content_type: str, temp_path: Path):
+        self.field_name = field_name
+        self.filename = filename
+        self.content_type = content_type
+        self.temp_path = temp_path
+        self.size = 0
+        self.handle = None
+        # SHA-256 calculado na thread de I/O enquanto o ficheiro é escrito
+        self.digest = hashlib.sha256()
+
+
+class MultipartUploadParser:
+    """
+    Lê o corpo do pedido em blocos e encaminha cada parte:
+    campos de texto ficam em memória (limitados a MAX_FIELD_BYTES),
+    ficheiros vão direto para disco numa thread do pool.
+    """
+
+    def __init__(self, request: Request):
+        self.request = request
+        self.fields: Dict[str, str] = {}
+        self.files: List[StreamedFile] = []
+
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._field_name = ""
+        self._field_data = bytearray()
+        self._current_file: Optional[StreamedFile] = None
+        # operações de disco pendentes, executadas após cada bloco
+        self._pending: List[tuple] = []
+
+    # callbacks síncronos do python-multipart ───────
+    def on_part_begin(self) -> None:
+        self._headers = {}
+        self._field_data = bytearray()
+        self._current_file = None
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._field_name = options.get(b"name", b"").decode("utf-8", "replace")
+        raw_filename = options.get(b"filename")
+        if raw_filename is None:
+            return
+        filename = Path(raw_filename.decode("utf-8", "replace")).name or "ficheiro"
+        content_type = self._headers.get(b"content-type", b"").decode("latin-1") or "application/octet-stream"
+        temp_path = INCOMING_DIR / f"{os.urandom(12).hex()}.part"
+        self._current_file = StreamedFile(self._field_name, filename, content_type, temp_path)
+        self.files.append(self._current_file)
+        self._pending.append(("open", self._current_file, None))
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._current_file is None:
+            if len(self._field_data) + (end - start) > MAX_FIELD_BYTES:
+                raise HTTPException(status_code=413, detail=f"Campo '{self._field_name}' demasiado grande")
+            self._field_data += data[start:end]
+            return
+        self._current_file.size += end - start
+        if self._current_file.size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Arquivo '{self._current_file.filename}' excede o limite")
+        self._pending.append(("write", self._current_file, data[start:end]))
+
+    def on_part_end(self) -> None:
+        if self._current_file is None:
+            self.fields[self._field_name] = self._field_data.decode("utf-8", "replace")
+        else:
+            self._pending.append(("close", self._current_file, None))
+
+    # operações de disco ───────────────────────────
+    @staticmethod
+    def _apply(pending: List[tuple]) -> None:
+        for action, streamed, chunk in pending:
+            if action == "open":
+                INCOMING_DIR.mkdir(parents=True, exist_ok=True)
+                streamed.handle = open(streamed.temp_path, "wb")
+            elif action == "write":
+                streamed.handle.write(chunk)
+                streamed.digest.update(chunk)
+            else:
+                streamed.handle.close()
+                streamed.handle = None
+
+    async def _flush(self) -> None:
+        if self._pending:
+            pending, self._pending = self._pending, []
+            await run_io(self._apply, pending)
+
+    def _cleanup(self) -> None:
+        for streamed in self.files:
+            if streamed.handle is not None:
+                streamed.handle.close()
+            streamed.temp_path.unlink(missing_ok=True)
+
+    async def parse(self) -> tuple[Dict[str, str], List[StreamedFile]]:
+        content_type, params = parse_options_header(self.request.headers.get("content-type", ""))
+        boundary = params.get(b"boundary")
+        if content_type != b"multipart/form-data" or not boundary:
+            raise HTTPException(status_code=415, detail="Esperado multipart/form-data")
+
+        callbacks = {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+        parser = MultipartParser(boundary, callbacks)
+        try:
+            async for chunk in self.request.stream():
+                parser.write(chunk)
+                await self._flush()
+            parser.finalize()
+            await self._flush()
+        except BaseException:
+            self._pending = []
+            await run_io(self._cleanup)
+            raise
+        return self.fields, self.files
+
+
+async def discard_streamed_files(files: List[StreamedFile]) -> None:
+    def _remove():
+        for streamed in files:
+            streamed.temp_path.unlink(missing_ok=True)
+
+    await run_io(_remove)
+
+
+def legacy_bytes(data_field) -> bytes:
+    """
+    Bytes do campo legado ``data`` (Binary ou texto base64).
+    """
+    if isinstance(data_field, (bytes, bytearray)):  # Binary é subclasse de bytes
+        return bytes(data_field)
+    return base64.b64decode(data_field)
@@ -0,0 +1,47 @@
+"""
+Servidor TelcoSMS falso para desenvolvimento, testes e benchmarks.
+
+Responde como o endpoint v1 ``/send_message`` sem enviar SMS, com latência
+e taxa de erros configuráveis, e conta o que recebeu.
+Uso:
+    uvicorn telcosms_stub:app --port 9100
+    $env:TELCOSMS_URL = "http://127.0.0.1:9100/send_message"
+"""
+import asyncio
+import os
+import random
+
+from fastapi import Body, FastAPI
+from fastapi.responses import JSONResponse
+
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "50"))
+STUB_FAILURE_RATE = float(os.getenv("STUB_FAILURE_RATE", "0"))
+
+app = FastAPI(title="TelcoSMS stub")
+stats = {"received": 0, "accepted": 0, "failed": 0}
+messages: list = []
+
+
+@app.post("/send_message")
+async def send_message(payload: dict = Body(...)):
+    stats["received"] += 1
+    await asyncio.sleep(STUB_LATENCY_MS / 1000)
+    if random.random() < STUB_FAILURE_RATE:
+        stats["failed"] += 1
+        return JSONResponse({"error": "stub failure"}, status_code=503, headers={"Retry-After": "0"})
+    stats["accepted"] += 1
+    messages.append({"phone_number": payload.get("phone_number"), "message_body": payload.get("message_body")})
+    del messages[:-1000]  # guarda só os últimos
+    return {"status": "success", "message_id": stats["accepted"]}
+
+
+@app.get("/stats")
+async def get_stats():
+    return {**stats, "last_messages": messages[-20:]}
+
+
+@app.post("/reset")
+async def reset():
+    stats.update(received=0, accepted=0, failed=0)
+    messages.clear()
+    return stats
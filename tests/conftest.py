@@ -0,0 +1,64 @@
+"""
+Fixtures comuns: a API corre em processo (httpx.ASGITransport) sobre um
+Mongo em memória (mongomock-motor), novo em cada teste.
+
+    pip install -r backend/requirements.txt
+    python -m pytest -q tests
+"""
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+import db  # noqa: E402
+from cache import cache  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def database(monkeypatch):
+    client = mongomock_motor.AsyncMongoMockClient()
+    monkeypatch.setattr(db, "client", client)
+    monkeypatch.setattr(db, "_database", client["prentma_test"])
+    monkeypatch.setattr(db, "_list_database", None)
+    # o cache é por processo: não pode passar dados de um teste para o outro
+    cache._entries.clear()
+    cache._versions.clear()
+    cache._generations.clear()
+    return db._database
+
+
+@pytest.fixture
+def upload_root(tmp_path, monkeypatch):
+    """
+    Ficheiros (blobs e uploads a meio) numa pasta temporária do teste.
+    """
+    import blob_store
+    import downloads
+    import storage
+
+    root = tmp_path / "categorias"
+    root.mkdir()
+    monkeypatch.setattr(storage, "UPLOAD_ROOT", root)
+    monkeypatch.setattr(storage, "INCOMING_DIR", root / ".incoming")
+    monkeypatch.setattr(downloads, "UPLOAD_ROOT", root)
+    monkeypatch.setattr(blob_store, "BLOB_DIR", root / ".blobs")
+    return root
+
+
+@pytest.fixture
+async def client(database):
+    import server
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test") as http:
+        yield http
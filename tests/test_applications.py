@@ -0,0 +1,133 @@
+import base64
+import binascii
+import hashlib
+from pathlib import Path
+
+import pytest
+from pymongo.errors import AutoReconnect
+
+pytestmark = pytest.mark.anyio
+
+APPLICATION = {
+    "first_name": "Ana", "last_name": "Silva", "email": "ana@x.ao", "phone": "923000000",
+    "city": "Luanda", "category": "cooperativa", "municipality": "Luanda", "accepted_terms": True,
+}
+
+
+def attachment(content: bytes, doc_type: str = "bi") -> dict:
+    return {
+        "type": doc_type, "name": f"{doc_type}.pdf", "content_type": "application/pdf",
+        "data": base64.b64encode(content).decode(),
+    }
+
+
+def sha256(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def stored_files(root) -> list:
+    return sorted(path for path in root.rglob("*") if path.is_file())
+
+
+@pytest.fixture
+def break_document_insert(database, monkeypatch):
+    """
+    A partir da chamada, insert_many em application_documents falha.
+    """
+    async def insert_many(self, *args, **kwargs):
+        raise AutoReconnect("ligação perdida")
+
+    return lambda: monkeypatch.setattr(type(database.application_documents), "insert_many", insert_many)
+
+
+# ───────────────────────────────────────────────
+# Referências dos blobs quando a submissão falha
+# ───────────────────────────────────────────────
+async def test_failed_store_releases_stored_attachments(client, database, upload_root):
+    with pytest.raises(binascii.Error):
+        await client.post("/api/applications", json={
+            **APPLICATION, "documents": [attachment(b"bilhete"), {**attachment(b""), "data": "a"}],
+        })
+    assert await database.blobs.count_documents({}) == 0
+    assert await database.applications.count_documents({}) == 0
+    assert stored_files(upload_root) == []
+
+
+async def test_failed_insert_releases_references(client, database, upload_root, break_document_insert):
+    resp = await client.post("/api/applications", json={**APPLICATION, "documents": [attachment(b"bilhete")]})
+    assert resp.status_code == 201
+    shared = await database.blobs.find_one({"_id": sha256(b"bilhete")})
+    break_document_insert()
+    with pytest.raises(AutoReconnect):
+        await client.post("/api/applications", json={
+            **APPLICATION, "documents": [attachment(b"bilhete"), attachment(b"curriculo", "cv")],
+        })
+
+    assert (await database.blobs.find_one({"_id": sha256(b"bilhete")}))["refcount"] == 1
+    assert await database.blobs.find_one({"_id": sha256(b"curriculo")}) is None
+    assert stored_files(upload_root) == [Path(shared["file_path"])]
+    assert await database.applications.count_documents({}) == 1
+
+
+async def test_failed_multipart_insert_releases_references(client, database, upload_root, break_document_insert):
+    break_document_insert()
+    form = {key: str(value) for key, value in APPLICATION.items()}
+    with pytest.raises(AutoReconnect):
+        await client.post("/api/applications/upload", data=form, files={
+            "bi": ("bi.pdf", b"bilhete", "application/pdf"),
+            "cv": ("cv.pdf", b"curriculo", "application/pdf"),
+        })
+    assert await database.blobs.count_documents({}) == 0
+    assert await database.applications.count_documents({}) == 0
+    assert stored_files(upload_root) == []
+
+
+# ───────────────────────────────────────────────
+# Submissão multipart (MultipartUploadParser)
+# ───────────────────────────────────────────────
+FORM = {**{key: str(value) for key, value in APPLICATION.items()}, "accepted_terms": "on"}
+
+
+async def test_multipart_submission_stores_documents(client, database, upload_root):
+    content = bytes(range(256)) * 1024  # vários blocos do corpo do pedido
+    resp = await client.post("/api/applications/upload", data=FORM, files={
+        "bi": ("../bilhete.pdf", content, "application/pdf"),
+        "cv": ("cv.txt", b"curriculo", "text/plain"),
+    })
+    assert resp.status_code == 201
+    application = await database.applications.find_one({})
+    assert str(application["_id"]) == resp.json()["id"]
+    assert application["first_name"] == "Ana" and application["accepted_terms"] is True
+    assert [(doc["type"], doc["name"], doc["size"]) for doc in application["documents"]] == [
+        ("bi", "bilhete.pdf", len(content)), ("cv", "cv.txt", 9),
+    ]
+
+    rows = await database.application_documents.find({"application_id": application["_id"]}).to_list(None)
+    assert [row["sha256"] for row in rows] == [sha256(content), sha256(b"curriculo")]
+    assert rows[1]["content_type"] == "text/plain"
+    download = await client.get(application["documents"][0]["download_url"])
+    assert download.status_code == 200 and download.content == content
+    assert not list((upload_root / ".incoming").iterdir())
+
+
+async def test_multipart_oversized_file_is_413_and_cleaned_up(client, database, upload_root, monkeypatch):
+    import storage
+
+    monkeypatch.setattr(storage, "MAX_UPLOAD_BYTES", 1000)
+    resp = await client.post("/api/applications/upload", data=FORM, files={
+        "bi": ("bi.pdf", b"x" * 500, "application/pdf"),
+        "cv": ("cv.pdf", b"y" * 1001, "application/pdf"),
+    })
+    assert resp.status_code == 413
+    assert "cv.pdf" in resp.json()["detail"]
+    assert stored_files(upload_root) == []
+    assert await database.applications.count_documents({}) == 0
+
+
+async def test_multipart_rejects_large_field_and_wrong_content_type(client, upload_root):
+    resp = await client.post("/api/applications/upload", data={**FORM, "address": "x" * 70_000},
+                             files={"bi": ("bi.pdf", b"bilhete", "application/pdf")})
+    assert resp.status_code == 413
+    assert stored_files(upload_root) == []
+    resp = await client.post("/api/applications/upload", json=APPLICATION)
+    assert resp.status_code == 415
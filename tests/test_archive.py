@@ -0,0 +1,79 @@
+import base64
+import io
+import zipfile
+from datetime import datetime
+
+import pytest
+from bson import Binary, ObjectId
+
+import archive_router
+pytestmark = pytest.mark.anyio
+
+APPLICATION = {
+    "first_name": "Ana", "last_name": "Silva", "email": "ana@x.ao", "phone": "923000000",
+    "city": "Luanda", "category": "cooperativa", "municipality": "Luanda", "accepted_terms": True,
+}
+
+
+def attachment(content: bytes) -> dict:
+    return {"type": "bi", "name": "bi.pdf", "content_type": "application/pdf",
+            "data": base64.b64encode(content).decode()}
+
+
+def read_zip(content: bytes) -> dict:
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        return {name: archive.read(name) for name in archive.namelist()}
+
+
+async def submit(client, *documents) -> str:
+    resp = await client.post("/api/applications", json={**APPLICATION, "documents": list(documents)})
+    assert resp.status_code == 201
+    return resp.json()["id"]
+
+
+async def test_application_archive_reads_disk_and_legacy_rows(client, database, upload_root):
+    application_id = await submit(client, attachment(b"frente"), attachment(b"verso"))
+    await database.application_documents.insert_many([
+        {"application_id": ObjectId(application_id), "category": "cooperativa", "candidate_name": "Ana Silva",
+         "name": "cv.pdf", "data": Binary(b"curriculo antigo"), "uploaded_at": datetime(2023, 5, 1)},
+        {"application_id": ObjectId(application_id), "category": "cooperativa", "candidate_name": "Ana Silva",
+         "name": "foto.jpg", "file_path": str(upload_root / "apagado.jpg"), "size": 10},
+    ])
+
+    resp = await client.get(f"/api/applications/{application_id}/archive")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/zip"
+    assert "Ana_Silva.zip" in resp.headers["content-disposition"]
+    files = read_zip(resp.content)
+    folder = "cooperativa/Ana_Silva"
+    assert files[f"{folder}/bi.pdf"] == b"frente"
+    # nomes repetidos recebem sufixo
+    assert files[f"{folder}/bi (2).pdf"] == b"verso"
+    assert files[f"{folder}/cv.pdf"] == b"curriculo antigo"
+    assert files["FALTAM.txt"].decode() == f"Ficheiros não encontrados:\n{folder}/foto.jpg\n"
+
+
+async def test_archive_streams_in_chunks(database, upload_root, monkeypatch):
+    monkeypatch.setattr(archive_router, "FLUSH_BYTES", 1024)
+    content = bytes(range(256)) * 64
+
+    async def entries():
+        for i in range(3):
+            yield f"doc{i}.bin", {"data": Binary(content), "size": len(content)}
+
+    chunks = [chunk async for chunk in archive_router.iter_zip(database, entries())]
+    # cada entrada sai em vários blocos em vez de um só no fim
+    assert len(chunks) > 3
+    assert read_zip(b"".join(chunks)) == {f"doc{i}.bin": content for i in range(3)}
+
+
+async def test_candidate_archive(client, database):
+    candidate_id = ObjectId()
+    await database.candidatos.insert_one({"_id": candidate_id, "name": "Rui"})
+    await database.documentos.insert_one({
+        "candidateId": candidate_id, "type": "bi", "originalName": "bi.pdf", "data": "YmlsaGV0ZQ==",
+    })
+
+    resp = await client.get(f"/api/candidates/{candidate_id}/archive")
+    assert read_zip(resp.content) == {"documentos/Rui/bi-bi.pdf": b"bilhete"}
+    assert (await client.get(f"/api/candidates/{ObjectId()}/archive")).status_code == 404
@@ -0,0 +1,87 @@
+import base64
+import hashlib
+from pathlib import Path
+
+import pytest
+from bson import ObjectId
+
+import blob_store
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def blob_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "BLOB_DIR", tmp_path / ".blobs")
+    return tmp_path / ".blobs"
+
+
+async def test_identical_content_stored_once(database):
+    first = await blob_store.store_bytes(database, b"conteudo")
+    second = await blob_store.store_base64(database, base64.b64encode(b"conteudo").decode())
+    assert first["_id"] == second["_id"] == hashlib.sha256(b"conteudo").hexdigest()
+    assert second["refcount"] == 2
+    assert second["file_path"] == first["file_path"]
+    assert Path(first["file_path"]).read_bytes() == b"conteudo"
+
+
+async def test_release_deletes_only_at_zero(database):
+    blob = await blob_store.store_bytes(database, b"conteudo")
+    await blob_store.store_bytes(database, b"conteudo")
+    path = Path(blob["file_path"])
+
+    await blob_store.release(database, blob["_id"])
+    assert (await database.blobs.find_one({"_id": blob["_id"]}))["refcount"] == 1
+    assert path.exists()
+
+    await blob_store.release(database, blob["_id"])
+    assert await database.blobs.find_one({"_id": blob["_id"]}) is None
+    assert not path.exists()
+
+
+async def test_store_path_moves_or_discards_upload(database, tmp_path):
+    digest = hashlib.sha256(b"upload").hexdigest()
+    incoming = tmp_path / "a.part"
+    incoming.write_bytes(b"upload")
+    blob = await blob_store.store_path(database, incoming, digest, 6)
+    assert not incoming.exists()
+    assert Path(blob["file_path"]).read_bytes() == b"upload"
+
+    duplicate = tmp_path / "b.part"
+    duplicate.write_bytes(b"upload")
+    again = await blob_store.store_path(database, duplicate, digest, 6)
+    assert not duplicate.exists()
+    assert again["refcount"] == 2 and again["file_path"] == blob["file_path"]
+
+
+async def test_late_unlink_does_not_remove_new_registration(database):
+    """
+    release apaga o registo; antes do unlink, outro pedido grava o mesmo conteúdo.
+    """
+    old = await blob_store.store_bytes(database, b"conteudo")
+    await database.blobs.delete_one({"_id": old["_id"]})
+    new = await blob_store.store_bytes(database, b"conteudo")
+    Path(old["file_path"]).unlink()  # o unlink atrasado do release
+    assert new["file_path"] != old["file_path"]
+    assert Path(new["file_path"]).read_bytes() == b"conteudo"
+
+
+async def test_register_repoints_record_with_missing_file(database):
+    digest = hashlib.sha256(b"conteudo").hexdigest()
+    await database.blobs.insert_one({"_id": digest, "refcount": 1, "file_path": "/nao/existe", "size": 8})
+    path = blob_store._write_blob(digest, b"conteudo")
+    blob = await blob_store._register_file(database, digest, 8, path)
+    assert blob["file_path"] == str(path)
+    assert blob["refcount"] == 2
+    assert path.exists()
+
+
+async def test_register_keeps_gridfs_only_blob(database):
+    digest = hashlib.sha256(b"conteudo").hexdigest()
+    file_id = ObjectId()
+    await database.blobs.insert_one({"_id": digest, "refcount": 1, "file_id": file_id, "size": 8})
+    path = blob_store._write_blob(digest, b"conteudo")
+    blob = await blob_store._register_file(database, digest, 8, path)
+    assert blob["file_id"] == file_id and "file_path" not in blob
+    assert blob["refcount"] == 2
+    assert not path.exists()
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from cache import ReadMostlyCache, cache
+
+pytestmark = pytest.mark.anyio
+
+CATEGORY = {"name": "Canto", "description": "Solo", "prize": "1000"}
+
+
+async def test_listing_served_from_cache_until_write(client, database):
+    await client.post("/api/categories", json=CATEGORY)
+    first = (await client.get("/api/categories")).json()
+    # escrita por fora da API: o cache continua a servir a página antiga
+    await database.categories.insert_one({**CATEGORY, "name": "Dança"})
+    assert (await client.get("/api/categories")).json() == first
+
+    await client.post("/api/categories", json={**CATEGORY, "name": "Teatro"})
+    names = {item["name"] for item in (await client.get("/api/categories")).json()["items"]}
+    assert names == {"Canto", "Dança", "Teatro"}
+
+
+async def test_version_bump_from_other_worker_drops_entries(client, database, monkeypatch):
+    monkeypatch.setattr(cache, "sync_interval", 0)
+    await client.post("/api/categories", json=CATEGORY)
+    await client.get("/api/categories")
+    await database.categories.insert_one({**CATEGORY, "name": "Dança"})
+    await database.cache_versions.update_one({"_id": "categories"}, {"$inc": {"version": 1}}, upsert=True)
+    assert len((await client.get("/api/categories")).json()["items"]) == 2
+
+
+async def test_concurrent_misses_share_one_load(database):
+    local = ReadMostlyCache()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*(local.get_or_load("ns", "k", load) for _ in range(5)))
+    assert results == [1] * 5
+    assert calls == 1
+
+
+async def test_entries_are_bounded_lru(database):
+    local = ReadMostlyCache(max_entries=3)
+
+    async def load(value):
+        return value
+
+    for key in range(4):
+        await local.get_or_load("ns", key, lambda key=key: load(key))
+    await local.get_or_load("ns", 1, lambda: load("outro"))  # hit: passa a mais recente
+    await local.get_or_load("ns", 4, lambda: load(4))
+    assert [key for _, key in local._entries] == [3, 1, 4]
+
+
+async def test_expired_entries_evicted_first(database):
+    local = ReadMostlyCache(ttl=0, max_entries=2)
+
+    async def load(value):
+        return value
+
+    for key in range(2):
+        await local.get_or_load("ns", key, lambda key=key: load(key))
+    local.ttl = 60
+    await local.get_or_load("ns", "novo", lambda: load("novo"))
+    assert [key for _, key in local._entries] == ["novo"]
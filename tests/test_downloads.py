@@ -0,0 +1,119 @@
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.routing import Route
+
+from downloads import file_download_response, http_date, parse_range, requested_range
+
+ETAG = '"1a-2b"'
+MODIFIED = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def make_request(**headers) -> Request:
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "headers": raw})
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=990-5000", (990, 999)),
+    (None, None),
+    ("bytes=0-9,20-29", None),  # vários intervalos: ficheiro inteiro
+    ("items=0-9", None),
+    ("bytes=abc", None),
+    ("bytes=50-10", None),
+    ("bytes=-0", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+def test_parse_range_past_end_is_416():
+    with pytest.raises(HTTPException) as exc:
+        parse_range("bytes=1000-", 1000)
+    assert exc.value.status_code == 416
+    assert exc.value.headers["Content-Range"] == "bytes */1000"
+
+
+def test_if_range_with_matching_etag_keeps_range():
+    request = make_request(range="bytes=0-9", if_range=ETAG)
+    assert requested_range(request, 1000, ETAG, MODIFIED) == (0, 9)
+
+
+def test_if_range_with_stale_etag_serves_whole_file():
+    request = make_request(range="bytes=0-9", if_range='"outro"')
+    assert requested_range(request, 1000, ETAG, MODIFIED) is None
+
+
+def test_if_range_never_matches_weak_etag():
+    request = make_request(range="bytes=0-9", if_range='W/"1a-2b"')
+    assert requested_range(request, 1000, 'W/"1a-2b"', MODIFIED) is None
+
+
+def test_if_range_with_date():
+    same = make_request(range="bytes=0-9", if_range=http_date(MODIFIED))
+    older = make_request(range="bytes=0-9", if_range="Sat, 01 Mar 2025 11:00:00 GMT")
+    assert requested_range(same, 1000, ETAG, MODIFIED) == (0, 9)
+    assert requested_range(older, 1000, ETAG, MODIFIED) is None
+
+
+# ───────────────────────────────────────────────
+# Ficheiros em disco: ETag, 304 e 206
+# ───────────────────────────────────────────────
+@pytest.fixture
+async def file_client(tmp_path):
+    path = tmp_path / "relatório.pdf"
+    path.write_bytes(bytes(range(256)) * 4)
+
+    async def download(request):
+        return file_download_response(path, path.stat(), request, content_type="application/pdf")
+
+    app = Starlette(routes=[Route("/file", download)])
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+        yield http, path.read_bytes()
+
+
+@pytest.mark.anyio
+async def test_file_download_full_with_validators(file_client):
+    http, content = file_client
+    resp = await http.get("/file")
+    assert resp.status_code == 200
+    assert resp.content == content
+    assert resp.headers["accept-ranges"] == "bytes"
+    assert resp.headers["etag"].startswith('"')
+    assert "filename*=UTF-8''relat%C3%B3rio.pdf" in resp.headers["content-disposition"]
+
+
+@pytest.mark.anyio
+async def test_file_download_not_modified(file_client):
+    http, _ = file_client
+    first = await http.get("/file")
+    by_etag = await http.get("/file", headers={"If-None-Match": first.headers["etag"]})
+    by_date = await http.get("/file", headers={"If-Modified-Since": first.headers["last-modified"]})
+    assert by_etag.status_code == by_date.status_code == 304
+    assert by_etag.content == b""
+    assert by_etag.headers["etag"] == first.headers["etag"]
+
+
+@pytest.mark.anyio
+async def test_file_download_partial(file_client):
+    http, content = file_client
+    etag = (await http.get("/file")).headers["etag"]
+    resp = await http.get("/file", headers={"Range": "bytes=100-199", "If-Range": etag})
+    assert resp.status_code == 206
+    assert resp.headers["content-range"] == f"bytes 100-199/{len(content)}"
+    assert resp.content == content[100:200]
+
+    stale = await http.get("/file", headers={"Range": "bytes=100-199", "If-Range": '"antigo"'})
+    assert stale.status_code == 200
+    assert stale.content == content
+
+    beyond = await http.get("/file", headers={"Range": f"bytes={len(content)}-"})
+    assert beyond.status_code == 416
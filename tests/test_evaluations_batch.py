@@ -0,0 +1,95 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+import dedupe_avaliacoes
+from mongo_models import ensure_indexes, missing_required_indexes
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def candidates(database):
+    await ensure_indexes(database)
+    category = ObjectId()
+    ids = [ObjectId() for _ in range(3)]
+    await database.candidatos.insert_many([
+        {"_id": candidate_id, "name": f"c{i}", "email": f"c{i}@x.ao", "categoryId": category}
+        for i, candidate_id in enumerate(ids)
+    ])
+    return category, [str(candidate_id) for candidate_id in ids]
+
+
+def score(candidate_id: str, value: float) -> dict:
+    return {"candidateId": candidate_id, "score": value, "comment": "ok"}
+
+
+async def test_batch_creates_and_reports_repeated_candidate(client, candidates):
+    _, (first, second, _) = candidates
+    juror = str(ObjectId())
+    resp = await client.post("/api/evaluations/batch", json={
+        "jurorId": juror,
+        "evaluations": [score(first, 8), score(second, 6), score(first, 1)],
+    })
+    body = resp.json()
+    assert resp.status_code == 200
+    assert (body["created"], body["updated"], body["failed"]) == (2, 0, 1)
+    assert [item["status"] for item in body["items"]] == ["created", "created", "error"]
+    assert body["items"][2]["candidateId"] == first
+
+
+async def test_resubmitted_batch_updates_instead_of_duplicating(client, database, candidates):
+    category, (first, second, third) = candidates
+    juror = str(ObjectId())
+    await client.post("/api/evaluations/batch", json={"jurorId": juror, "evaluations": [score(first, 8)]})
+    created = (await database.avaliacoes.find_one({"candidateId": ObjectId(first)}))["_id"]
+
+    # o novo antes do repetido: as posições de upsert coincidem também no mongomock
+    body = (await client.post("/api/evaluations/batch", json={
+        "jurorId": juror,
+        "evaluations": [score(third, 7), score(first, 9)],
+    })).json()
+    assert [item["status"] for item in body["items"]] == ["created", "updated"]
+    assert body["items"][1]["_id"] == str(created)
+    assert await database.avaliacoes.count_documents({}) == 2
+
+    board = (await client.get(f"/api/categories/{category}/leaderboard")).json()
+    assert [(row["candidateName"], row["mean"]) for row in board] == [("c0", 9.0), ("c2", 7.0)]
+    assert second not in {row["candidateId"] for row in board}
+
+
+async def test_single_create_duplicate_is_409(client, candidates):
+    _, (first, _, _) = candidates
+    payload = {**score(first, 5), "jurorId": str(ObjectId())}
+    assert (await client.post("/api/evaluations", json=payload)).status_code == 200
+    assert (await client.post("/api/evaluations", json=payload)).status_code == 409
+
+
+async def test_empty_batch_rejected(client):
+    resp = await client.post("/api/evaluations/batch", json={"jurorId": str(ObjectId()), "evaluations": []})
+    assert resp.status_code == 422
+
+
+async def test_unique_index_required(database):
+    await database.avaliacoes.insert_many([
+        {"candidateId": ObjectId("6ad3f0d482384291bffa67c2"), "jurorId": ObjectId("6ad3f0d482384291bffa67c3")}
+        for _ in range(2)
+    ])
+    await ensure_indexes(database)
+    assert await missing_required_indexes(database) == ["avaliacoes.candidateId_1_jurorId_1"]
+
+
+async def test_dedupe_keeps_latest_and_builds_index(database):
+    # dados antigos: sem o índice único
+    candidate, juror = ObjectId(), ObjectId()
+    await database.candidatos.insert_one({"_id": candidate, "name": "c0", "categoryId": ObjectId()})
+    await database.avaliacoes.insert_many([
+        {"candidateId": candidate, "jurorId": juror, "score": value, "updated_at": datetime(2025, 1, 1, value)}
+        for value in (3, 9, 5)
+    ])
+    result = await dedupe_avaliacoes.dedupe()
+    assert result == {"pairs": 1, "removed": 2}
+    assert [doc["score"] async for doc in database.avaliacoes.find()] == [9]
+    assert (await database.pontuacoes.find_one({"_id": candidate}))["mean"] == 9
+    assert await missing_required_indexes(database) == []
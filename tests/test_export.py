@@ -0,0 +1,63 @@
+import asyncio
+import csv
+import io
+import json
+
+import pytest
+
+import export_router
+from export_router import EXPORT_COLUMNS
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def applications(database):
+    await database.applications.insert_many([
+        {"first_name": f"Nome {i}", "category": "canto" if i % 2 else "dança", "municipality": "Luanda",
+         "documents": [{"id": f"d{i}", "name": "bi.pdf"}, {"id": f"e{i}", "name": "cv.pdf"}] if i == 1 else []}
+        for i in range(6)
+    ])
+
+
+async def test_ndjson_first_line_sent_immediately(database, applications):
+    chunks = [chunk async for chunk in export_router.iter_ndjson({"category": "canto"})]
+    assert chunks[0].count(b"\n") == 1
+    rows = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+    # a candidatura com dois documentos dá duas linhas
+    assert len(rows) == 4
+    assert {row["document_id"] for row in rows} == {"d1", "e1", None}
+
+
+async def test_ndjson_flushes_on_time_bound(database, applications, monkeypatch):
+    monkeypatch.setattr(export_router, "FLUSH_SECONDS", 0)
+    chunks = [chunk async for chunk in export_router.iter_ndjson({})]
+    assert [chunk.count(b"\n") for chunk in chunks] == [1] * 7
+
+
+async def test_csv_export_route(client, applications):
+    resp = await client.get("/api/applications/export", params={"category": "dança"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(resp.content.decode("utf-8-sig"))))
+    assert [row["first_name"] for row in rows] == ["Nome 0", "Nome 2", "Nome 4"]
+    assert (await client.get("/api/applications/export", params={"format": "xml"})).status_code == 400
+
+
+async def test_buffered_rows_flushed_while_cursor_waits(monkeypatch):
+    """
+    Filtro seletivo: duas linhas e depois o cursor fica parado.
+    """
+    async def slow_rows(query):
+        yield {"first_name": "Ana"}
+        yield {"first_name": "Rui"}
+        await asyncio.sleep(30)
+        yield {"first_name": "nunca"}
+
+    monkeypatch.setattr(export_router, "iter_rows", slow_rows)
+    monkeypatch.setattr(export_router, "FLUSH_SECONDS", 0.05)
+    stream = export_router.iter_csv({})
+    assert (await stream.__anext__()).startswith(b"\xef\xbb\xbfapplication_id,")
+    chunk = await asyncio.wait_for(stream.__anext__(), 1)
+    assert [row["first_name"] for row in csv.DictReader(io.StringIO(chunk.decode()), EXPORT_COLUMNS)] == ["Ana", "Rui"]
+    await stream.aclose()
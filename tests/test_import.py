@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+import import_router
+from mongo_models import ensure_indexes
+
+pytestmark = pytest.mark.anyio
+
+CATEGORY = "6ad3eede9b0ae83f47b331ab"
+CSV_HEADER = "name,email,phone,identityDocument,categoryId,registrationStatus"
+
+
+async def test_csv_candidates_report_per_row_errors(client, database, monkeypatch):
+    await ensure_indexes(database)
+    monkeypatch.setattr(import_router, "IMPORT_BATCH_SIZE", 2)
+    body = "\n".join([
+        CSV_HEADER,
+        f"Ana,ana@x.ao,923,001LA,{CATEGORY},ok",
+        f'"Rui\nManuel",rui@x.ao,924,002LA,{CATEGORY},ok',  # linha 3-4: aspas com quebra de linha
+        f"Eva,nao-e-email,925,003LA,{CATEGORY},ok",
+        "Só,duas",
+        f"Ana Repetida,ana@x.ao,926,004LA,{CATEGORY},ok",
+        "",
+    ])
+    resp = await client.post("/api/candidates/import", content=body.encode(), headers={"Content-Type": "text/csv"})
+    report = resp.json()
+    assert resp.status_code == 200
+    assert (report["rows"], report["inserted"], report["failed"]) == (5, 2, 3)
+    assert [error["row"] for error in report["errors"]] == [5, 6, 7]
+    assert report["errors"][0]["error"][0].startswith("email:")
+    assert "esperadas 6 colunas" in report["errors"][1]["error"]
+    assert report["errors"][2]["error"].startswith("duplicado")
+
+    names = sorted([doc["name"] async for doc in database.candidatos.find()])
+    assert names == ["Ana", "Rui\nManuel"]
+    assert (await database.candidatos.find_one({"name": "Ana"}))["search_terms"]
+
+
+async def test_ndjson_jurors_import(client, database):
+    lines = [
+        json.dumps({"name": "Ângela", "email": "angela@x.ao", "specialty": "canto"}),
+        "{nao é json",
+        "[1, 2]",
+        json.dumps({"name": "Sem email", "specialty": "dança"}),
+    ]
+    resp = await client.post("/api/jurors/import", params={"format": "ndjson"},
+                             content="\n".join(lines).encode())
+    report = resp.json()
+    assert (report["rows"], report["inserted"], report["failed"]) == (4, 1, 3)
+    assert [error["row"] for error in report["errors"]] == [2, 3, 4]
+    assert report["errors"][1]["error"] == "cada linha deve ser um objeto JSON"
+    assert [doc["name"] async for doc in database.jurados.find()] == ["Ângela"]
+
+
+async def test_import_rejects_unknown_format(client):
+    resp = await client.post("/api/jurors/import", params={"format": "xlsx"}, content=b"x")
+    assert resp.status_code == 415
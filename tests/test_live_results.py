@@ -0,0 +1,148 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId, Timestamp
+from pymongo.errors import AutoReconnect, OperationFailure
+
+import live_results
+from live_results import LiveFeed, event_stream
+
+pytestmark = pytest.mark.anyio
+
+
+class ConnectedRequest:
+    async def is_disconnected(self) -> bool:
+        return False
+
+
+@pytest.fixture(autouse=True)
+def fast_intervals(monkeypatch):
+    monkeypatch.setattr(live_results, "LIVE_POLL_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setattr(live_results, "LIVE_HEARTBEAT_SECONDS", 0.05)
+
+
+async def next_event(stream) -> bytes:
+    while True:
+        message = await asyncio.wait_for(stream.__anext__(), 1)
+        if message.startswith(b"event:"):
+            return message
+
+
+async def test_polling_fans_out_one_upstream_to_all_subscribers(client, database, monkeypatch):
+    feed = LiveFeed(mode="poll")
+    monkeypatch.setattr(live_results, "feed", feed)
+    everything = [event_stream(ConnectedRequest(), feed.collections) for _ in range(3)]
+    only_results = event_stream(ConnectedRequest(), ["resultados"])
+    for stream in everything + [only_results]:
+        assert await stream.__anext__() == b"retry: 3000\n\n"
+    assert feed.subscribers == 4
+
+    await asyncio.sleep(0.05)
+    await client.post("/api/evaluations", json={
+        "candidateId": str(ObjectId()), "jurorId": str(ObjectId()), "score": 7, "comment": "ok",
+    })
+    await client.post("/api/results", json={
+        "candidateId": str(ObjectId()), "categoryId": str(ObjectId()), "position": 1, "prize": "1000",
+    })
+
+    for stream in everything:
+        received = {await next_event(stream), await next_event(stream)}
+        assert {b'"collection":"avaliacoes"' in m for m in received} == {True, False}
+    assert b'"collection":"resultados","operation":"insert"' in await next_event(only_results)
+    assert feed.upstream == "polling"
+
+    for stream in everything + [only_results]:
+        await stream.aclose()
+    assert feed.subscribers == 0 and feed._task is None
+
+
+async def test_idle_stream_sends_heartbeat(database, monkeypatch):
+    feed = LiveFeed(mode="poll")
+    monkeypatch.setattr(live_results, "feed", feed)
+    stream = event_stream(ConnectedRequest(), feed.collections)
+    await stream.__anext__()
+    assert await asyncio.wait_for(stream.__anext__(), 1) == b": ping\n\n"
+    await stream.aclose()
+
+
+async def test_live_results_rejects_unknown_type(client):
+    assert (await client.get("/api/live/results", params={"types": "jurados"})).status_code == 400
+
+
+# ───────────────────────────────────────────────
+# Change stream: retoma e fallback
+# ───────────────────────────────────────────────
+def change(number: int) -> dict:
+    return {
+        "ns": {"coll": "resultados"},
+        "operationType": "insert",
+        "documentKey": {"_id": number},
+        "fullDocument": {"_id": number, "updated_at": datetime(2025, 1, 1, 0, 0, number)},
+        "clusterTime": Timestamp(1, 1),
+    }
+
+
+class FakeStream:
+    def __init__(self, changes, error):
+        self.changes, self.error, self.resume_token = changes, error, None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def __aiter__(self):
+        for item in self.changes:
+            self.resume_token = {"_data": item["documentKey"]["_id"]}
+            yield item
+        raise self.error
+
+
+class FakeDatabase:
+    """watch() falha a meio uma vez e depois diz que não há replica set."""
+
+    def __init__(self, real):
+        self.real = real
+        self.resume_tokens = []
+
+    def watch(self, pipeline, full_document, resume_after):
+        self.resume_tokens.append(resume_after)
+        if len(self.resume_tokens) == 1:
+            return FakeStream([change(1), change(2)], AutoReconnect("queda de rede"))
+        return FakeStream([change(3)], OperationFailure("só em replica set", code=40573))
+
+    def __getitem__(self, name):
+        return self.real[name]
+
+
+async def test_change_stream_resumes_then_falls_back_from_last_event(database, monkeypatch):
+    # escritas entre a queda do stream e o polling: só a posterior ao último evento
+    await database.resultados.insert_many([
+        {"position": 1, "updated_at": datetime(2025, 1, 1, 0, 0, 0)},
+        {"position": 2, "updated_at": datetime(2025, 1, 1, 0, 0, 4)},
+    ])
+    fake = FakeDatabase(database)
+    monkeypatch.setattr(live_results, "get_database", lambda: fake)
+    sleeps = []
+    real_sleep = asyncio.sleep
+
+    async def no_backoff(delay):
+        sleeps.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(live_results.asyncio, "sleep", no_backoff)
+    feed = LiveFeed()
+    queue = feed.subscribe()
+    for _ in range(50):
+        await real_sleep(0)
+        if queue.qsize() == 4:
+            break
+
+    assert fake.resume_tokens == [None, {"_data": 2}]
+    assert feed.reconnects == 1 and sleeps[0] == 0.5
+    assert feed.upstream == "polling"
+    assert feed._last_event_at == datetime(2025, 1, 1, 0, 0, 4)
+    assert queue.qsize() == 4
+    await feed.stop()
@@ -0,0 +1,107 @@
+import base64
+import hashlib
+from pathlib import Path
+
+import pytest
+from bson import Binary, ObjectId
+from gridfs import GridFS
+
+import blob_store
+import migrar_binarios
+import migrate_docs_to_gridfs
+
+pytestmark = pytest.mark.anyio
+
+
+# ───────────────────────────────────────────────
+# migrar_binarios: campo data -> blobs em disco
+# ───────────────────────────────────────────────
+async def test_migrar_binarios_moves_data_into_blob_store(database, upload_root):
+    app_id, orphan_app = ObjectId(), ObjectId()
+    await database.applications.insert_one({"_id": app_id, "first_name": "Ana", "category": "cooperativa"})
+    await database.application_documents.insert_many([
+        # mesmo nome e conteúdo em duas linhas: um só ficheiro, duas referências
+        {"application_id": app_id, "name": "bi.pdf", "data": Binary(b"bilhete")},
+        {"application_id": app_id, "name": "bi.pdf", "data": base64.b64encode(b"bilhete").decode()},
+        {"application_id": app_id, "name": "cv.pdf", "data": base64.b64encode(b"curriculo").decode()},
+        {"application_id": orphan_app, "name": "x.pdf", "data": Binary(b"orfao")},
+    ])
+
+    await migrar_binarios.migrate(batch_size=2)
+
+    rows = await database.application_documents.find({"application_id": app_id}).to_list(None)
+    assert all("data" not in row for row in rows)
+    assert [row["sha256"] for row in rows] == [hashlib.sha256(content).hexdigest()
+                                                for content in (b"bilhete", b"bilhete", b"curriculo")]
+    assert Path(rows[0]["file_path"]).read_bytes() == b"bilhete"
+    assert rows[0]["file_path"] == rows[1]["file_path"] and rows[0]["size"] == 7
+    assert (await database.blobs.find_one({"_id": rows[0]["sha256"]}))["refcount"] == 2
+    # sem candidatura fica como estava
+    assert await database.application_documents.count_documents({"data": {"$exists": True}}) == 1
+
+    for row in rows:
+        await blob_store.release(database, row["sha256"])
+    assert await database.blobs.count_documents({}) == 0
+    assert not [path for path in (upload_root / ".blobs").rglob("*") if path.is_file()]
+
+
+# ───────────────────────────────────────────────
+# migrate_docs_to_gridfs: campo data -> GridFS (pymongo síncrono)
+# ───────────────────────────────────────────────
+@pytest.fixture
+def sync_db(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    from mongomock.gridfs import enable_gridfs_integration
+
+    enable_gridfs_integration()
+    client = mongomock.MongoClient("mongodb://localhost:27017/prentma")
+    monkeypatch.setattr(migrate_docs_to_gridfs, "MongoClient", lambda *args, **kwargs: client)
+    return client.get_default_database()
+
+
+def run_gridfs_migration(tmp_path, *extra):
+    migrate_docs_to_gridfs.main([
+        "--workers", "2", "--batch-size", "2", "--collections", "documentos",
+        "--checkpoint", str(tmp_path / "checkpoint.json"), *extra,
+    ])
+
+
+def test_gridfs_migration_moves_data_and_checkpoints(sync_db, tmp_path):
+    sync_db.documentos.insert_many(
+        [{"originalName": f"doc{i}.pdf", "data": Binary(b"x" * i)} for i in range(1, 6)] + [{"data": None}]
+    )
+
+    run_gridfs_migration(tmp_path, "--dry-run")
+    assert sync_db.documentos.count_documents({"data": {"$exists": True}}) == 6
+    assert not (tmp_path / "checkpoint.json").exists()
+
+    run_gridfs_migration(tmp_path)
+    fs = GridFS(sync_db)
+    doc = sync_db.documentos.find_one({"originalName": "doc3.pdf"})
+    assert "data" not in doc and doc["content_type"] == "application/octet-stream"
+    assert fs.get(doc["file_id"]).read() == b"xxx"
+    assert sync_db.fs.files.count_documents({}) == 5
+    # sem bytes convertíveis: fica como estava e conta como ignorado
+    assert sync_db.documentos.count_documents({"data": {"$exists": True}}) == 1
+    state = migrate_docs_to_gridfs.load_checkpoint(tmp_path / "checkpoint.json")
+    assert (state["documentos"]["migrated"], state["documentos"]["skipped"]) == (5, 1)
+
+
+def test_gridfs_migration_resumes_without_duplicating_files(sync_db, tmp_path):
+    ids = sync_db.documentos.insert_many(
+        [{"originalName": f"doc{i}.pdf", "data": Binary(b"x" * i)} for i in range(1, 5)]
+    ).inserted_ids
+    # execução interrompida: o lote de doc1/doc2 acabou e o ficheiro de doc3
+    # foi gravado, mas a linha ainda tem data
+    migrate_docs_to_gridfs.save_checkpoint(tmp_path / "checkpoint.json", {
+        "documentos": {"last_id": ids[1], "migrated": 2, "skipped": 0},
+    })
+    fs = GridFS(sync_db)
+    orphan = fs.put(b"xxx", metadata={"source_collection": "documentos", "source_id": ids[2]})
+
+    run_gridfs_migration(tmp_path)
+    # antes do checkpoint nada foi tocado
+    assert sync_db.documentos.count_documents({"_id": {"$in": ids[:2]}, "data": {"$exists": True}}) == 2
+    assert sync_db.documentos.find_one({"_id": ids[2]})["file_id"] == orphan
+    assert fs.get(sync_db.documentos.find_one({"_id": ids[3]})["file_id"]).read() == b"xxxx"
+    assert sync_db.fs.files.count_documents({}) == 2
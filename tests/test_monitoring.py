@@ -0,0 +1,132 @@
+from collections import deque
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+import mongo_monitoring
+from mongo_models import ensure_indexes
+
+pytestmark = pytest.mark.anyio
+
+
+def sample(text: str, name: str, **labels) -> float:
+    """
+    Valor de uma série no texto do Prometheus (a ordem dos rótulos conta).
+    """
+    series = name + "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+    for line in text.splitlines():
+        if line.startswith(series + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+async def test_metrics_count_requests_by_route_template(client):
+    before = (await client.get("/metrics")).text
+    ids = [str(ObjectId()) for _ in range(2)]
+    for candidate_id in ids:
+        await client.get(f"/api/candidates/{candidate_id}")
+    await client.get("/nao-existe")
+
+    resp = await client.get("/metrics")
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = resp.text
+    route = "/api/candidates/{candidate_id}"
+    # uma série por modelo de rota, não por ID
+    assert sample(text, "http_requests_total", method="GET", route=route, status="404") \
+        - sample(before, "http_requests_total", method="GET", route=route, status="404") == 2
+    assert sample(text, "http_request_duration_seconds_count", method="GET", route=route) \
+        - sample(before, "http_request_duration_seconds_count", method="GET", route=route) == 2
+    assert sample(text, "http_requests_total", method="GET", route="unmatched", status="404") \
+        - sample(before, "http_requests_total", method="GET", route="unmatched", status="404") == 1
+    assert not any(candidate_id in text for candidate_id in ids)
+    # o pedido a /metrics ainda está em curso
+    assert "http_requests_in_flight 1" in text.splitlines()
+
+
+def command_events(listener, request_id: int, name: str, command: dict, millis: float, ok: bool = True):
+    """
+    Eventos do pymongo (o mongomock não os emite) para um comando.
+    """
+    event = SimpleNamespace(command_name=name, command=command, connection_id=("mongo", 27017),
+                            request_id=request_id, duration_micros=int(millis * 1000))
+    listener.started(event)
+    (listener.succeeded if ok else listener.failed)(event)
+
+
+async def test_slow_commands_logged_with_query_shape(client, monkeypatch):
+    monkeypatch.setattr(mongo_monitoring, "slow_operations", deque(maxlen=10))
+    listener = mongo_monitoring.CommandMetricsListener()
+    before = (await client.get("/metrics")).text
+
+    command_events(listener, 1, "find", {"find": "candidatos", "filter": {"email": "ana@x.ao"}}, 5)
+    command_events(listener, 2, "hello", {"hello": 1}, 500)
+    command_events(listener, 3, "find", {
+        "find": "candidatos", "filter": {"categoryId": ObjectId(), "age": {"$gt": 3}}, "sort": {"name": 1},
+    }, 250)
+    command_events(listener, 4, "aggregate", {"aggregate": "avaliacoes", "pipeline": [{"$match": {"score": 9}}]},
+                   400, ok=False)
+
+    body = (await client.get("/metrics/mongo-slow")).json()
+    assert body["threshold_ms"] == mongo_monitoring.MONGO_SLOW_MS
+    # mais recentes primeiro; valores trocados pelo tipo
+    assert [(op["command"], op["collection"], op["duration_ms"]) for op in body["operations"]] == [
+        ("aggregate", "avaliacoes", 400.0), ("find", "candidatos", 250.0),
+    ]
+    assert body["operations"][1]["shape"] == {
+        "filter": {"categoryId": "ObjectId", "age": {"$gt": "int"}}, "sort": {"name": "int"},
+    }
+    assert body["operations"][0]["shape"] == {"pipeline": [{"$match": {"score": "int"}}]}
+
+    text = (await client.get("/metrics")).text
+    for name, labels, delta in (
+        ("mongodb_command_duration_seconds_count", {"command": "find", "collection": "candidatos"}, 2),
+        ("mongodb_slow_commands_total", {"command": "find", "collection": "candidatos"}, 1),
+        ("mongodb_command_failures_total", {"command": "aggregate", "collection": "avaliacoes"}, 1),
+        ("mongodb_command_duration_seconds_count", {"command": "hello", "collection": ""}, 0),
+    ):
+        assert sample(text, name, **labels) - sample(before, name, **labels) == delta
+
+
+# ───────────────────────────────────────────────
+# Readiness e pool de ligações
+# ───────────────────────────────────────────────
+@pytest.fixture
+def pool(database, monkeypatch):
+    """
+    Opções de pool reais (no mongomock são Mock) e um listener novo.
+    """
+    pool_options = SimpleNamespace(max_pool_size=4, min_pool_size=0, wait_queue_timeout=None)
+    monkeypatch.setattr(database.client, "options", SimpleNamespace(pool_options=pool_options))
+    listener = mongo_monitoring.PoolMetricsListener()
+    monkeypatch.setattr(mongo_monitoring, "pool_listener", listener)
+    return listener
+
+
+async def test_readiness_reports_pool_usage(client, database, pool):
+    address = SimpleNamespace(address=("mongo", 27017))
+    for _ in range(2):
+        pool.connection_created(address)
+    pool.connection_checked_out(SimpleNamespace(address=("mongo", 27017), duration=0.004))
+    pool.connection_checked_out(SimpleNamespace(address=("mongo", 27017), duration=0.002))
+    pool.connection_checked_in(address)
+    await ensure_indexes(database)
+
+    resp = await client.get("/api/health/ready")
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["status"] == "ok" and body["mongo"]["status"] == "ok"
+    assert body["pool"]["max_pool_size"] == 4
+    assert body["pool"]["servers"]["mongo:27017"] == {
+        "open": 2, "in_use": 1, "utilization": 0.25, "checkouts": 2, "checkout_failures": 0,
+        "wait_mean_ms": 3.0, "wait_max_ms": 4.0,
+    }
+
+
+async def test_readiness_fails_without_required_indexes(client, pool):
+    resp = await client.get("/api/health/ready")
+    assert resp.status_code == 503
+    body = resp.json()
+    assert body["status"] == "unavailable"
+    assert body["mongo"]["missing_indexes"]
+    assert (await client.get("/api/health")).json() == {"status": "ok"}
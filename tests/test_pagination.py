@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from pagination import decode_cursor, encode_cursor
+
+pytestmark = pytest.mark.anyio
+
+START = datetime(2025, 1, 1)
+
+
+def test_cursor_round_trip():
+    doc = {"_id": ObjectId(), "created_at": datetime(2025, 5, 4, 3, 2, 1, 123000)}
+    assert decode_cursor(encode_cursor(doc)) == (doc["created_at"], doc["_id"])
+
+
+def test_cursor_without_created_at():
+    doc = {"_id": ObjectId()}
+    assert decode_cursor(encode_cursor(doc)) == (None, doc["_id"])
+
+
+@pytest.mark.parametrize("cursor", ["nao-e-base64!", "W10", "WyJ4IiwgInkiXQ"])
+def test_invalid_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 400
+
+
+async def test_pages_cover_every_juror_once(client, database):
+    # empates em created_at e jurados antigos sem created_at
+    docs = [
+        {"name": f"jurado {i}", "email": f"j{i}@x.ao", "specialty": "canto",
+         "created_at": START + timedelta(minutes=i // 3)}
+        for i in range(23)
+    ]
+    docs += [{"name": f"antigo {i}", "email": f"a{i}@x.ao", "specialty": "dança"} for i in range(4)]
+    await database.jurados.insert_many(docs)
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 5, **({"cursor": cursor} if cursor else {})}
+        body = (await client.get("/api/jurors", params=params)).json()
+        seen += [item["_id"] for item in body["items"]]
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert pages == 6
+    assert len(seen) == len(set(seen)) == len(docs)
+    # mais recentes primeiro, sem created_at no fim
+    dated = [str(doc["_id"]) for doc in sorted(docs[:23], key=lambda d: (d["created_at"], d["_id"]), reverse=True)]
+    assert seen[:23] == dated
+
+
+async def test_fields_limits_returned_keys(client, database):
+    await database.jurados.insert_one({"name": "Ana", "email": "ana@x.ao", "specialty": "canto", "created_at": START})
+    body = (await client.get("/api/jurors", params={"fields": "name"})).json()
+    assert set(body["items"][0]) == {"_id", "name"}
+    assert (await client.get("/api/jurors", params={"fields": "senha"})).status_code == 400
+
+
+async def test_applications_default_to_full_document(client, database):
+    await database.applications.insert_one({
+        "first_name": "Ana", "address": "Rua 1", "accepted_terms": True, "created_at": START,
+        "search_terms": ["ana"], "documents": [{"id": "d1", "name": "bi.pdf", "data": "YmlsaGV0ZQ=="}],
+    })
+    full = (await client.get("/api/applications")).json()[0]
+    assert full["address"] == "Rua 1" and full["accepted_terms"] is True
+    assert full["documents"] == [{"id": "d1", "name": "bi.pdf"}]
+    assert "search_terms" not in full
+
+    slim = (await client.get("/api/applications", params={"fields": "first_name"})).json()[0]
+    assert set(slim) == {"_id", "first_name"}
+
+
+async def test_application_search_facets_and_pages(client, database):
+    # years_experience chega como texto ou número conforme o formulário
+    await database.applications.insert_many([
+        {"first_name": f"Nome {i}", "category": "canto" if i < 5 else "dança",
+         "municipality": "Luanda" if i % 2 else "Viana", "city": "Luanda",
+         "years_experience": str(i % 3) if i % 2 else i % 3, "created_at": START + timedelta(minutes=i)}
+        for i in range(8)
+    ])
+
+    body = (await client.get("/api/applications/search", params={"category": "canto", "limit": 3})).json()
+    assert body["total"] == 5
+    assert [item["first_name"] for item in body["items"]] == ["Nome 4", "Nome 3", "Nome 2"]
+    assert set(body["items"][0]) <= {"_id", "first_name", "category", "municipality", "city", "created_at"}
+    # contagens sobre o resultado já filtrado
+    assert body["facets"]["category"] == [{"value": "canto", "count": 5}]
+    assert body["facets"]["municipality"] == [{"value": "Viana", "count": 3}, {"value": "Luanda", "count": 2}]
+    assert body["facets"]["years_experience"] == [
+        {"value": "0", "count": 2}, {"value": "1", "count": 2}, {"value": "2", "count": 1},
+    ]
+
+    rest = (await client.get("/api/applications/search", params={
+        "category": "canto", "limit": 3, "cursor": body["next_cursor"],
+    })).json()
+    assert [item["first_name"] for item in rest["items"]] == ["Nome 1", "Nome 0"]
+    assert rest["next_cursor"] is None
+
+    both = (await client.get("/api/applications/search", params={"years_experience": "1,2"})).json()
+    assert both["total"] == 5
+    assert both["facets"]["category"] == [{"value": "canto", "count": 3}, {"value": "dança", "count": 2}]
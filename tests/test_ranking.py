@@ -0,0 +1,142 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+import ranking
+
+pytestmark = pytest.mark.anyio
+
+CATEGORY = "6ad3eede9b0ae83f47b331ab"
+OTHER_CATEGORY = "6ad3eede9b0ae83f47b331ac"
+
+
+def candidate(name: str, category: str = CATEGORY) -> dict:
+    return {
+        "name": name, "email": f"{name}@x.ao", "phone": "923", "identityDocument": name,
+        "categoryId": category, "registrationStatus": "ok",
+    }
+
+
+async def create_candidate(client, name: str, category: str = CATEGORY) -> str:
+    return (await client.post("/api/candidates", json=candidate(name, category))).json()["_id"]
+
+
+async def evaluate(client, candidate_id: str, score: float) -> dict:
+    resp = await client.post("/api/evaluations", json={
+        "candidateId": candidate_id, "jurorId": str(ObjectId()), "score": score, "comment": "ok",
+    })
+    assert resp.status_code == 200
+    return resp.json()
+
+
+async def leaderboard(client, category: str = CATEGORY) -> list:
+    return (await client.get(f"/api/categories/{category}/leaderboard")).json()
+
+
+async def test_leaderboard_orders_by_mean_then_count(client):
+    ana, bruno, carla = [await create_candidate(client, name) for name in ("ana", "bruno", "carla")]
+    for candidate_id, scores in ((ana, [8, 6]), (bruno, [9]), (carla, [7, 7, 7])):
+        for score in scores:
+            await evaluate(client, candidate_id, score)
+
+    board = await leaderboard(client)
+    assert [(row["position"], row["candidateName"], row["mean"]) for row in board] == [
+        (1, "bruno", 9.0), (2, "carla", 7.0), (3, "ana", 7.0),
+    ]
+    assert (board[2]["count"], board[2]["sum"], board[2]["min"], board[2]["max"]) == (2, 14, 6, 8)
+
+
+async def test_evaluation_update_and_delete_refresh_aggregate(client, database):
+    ana = await create_candidate(client, "ana")
+    first = await evaluate(client, ana, 4)
+    await evaluate(client, ana, 8)
+
+    await client.patch(f"/api/evaluations/{first['_id']}", json={**first, "score": 10})
+    row = (await leaderboard(client))[0]
+    assert (row["mean"], row["min"], row["max"]) == (9.0, 8, 10)
+
+    async for evaluation in database.avaliacoes.find({}, {"_id": 1}):
+        await client.delete(f"/api/evaluations/{evaluation['_id']}")
+    assert await leaderboard(client) == []
+    assert await database.pontuacoes.count_documents({}) == 0
+
+
+async def test_category_change_moves_candidate(client):
+    ana = await create_candidate(client, "ana")
+    await evaluate(client, ana, 6)
+    await client.patch(f"/api/candidates/{ana}", json=candidate("ana", OTHER_CATEGORY))
+    assert await leaderboard(client) == []
+    assert [row["candidateId"] for row in await leaderboard(client, OTHER_CATEGORY)] == [ana]
+
+
+async def test_deleted_candidate_leaves_leaderboard(client, database):
+    ana, bruno = await create_candidate(client, "ana"), await create_candidate(client, "bruno")
+    await evaluate(client, ana, 6)
+    await evaluate(client, bruno, 5)
+    assert (await client.delete(f"/api/candidates/{ana}")).status_code == 200
+    assert [row["candidateName"] for row in await leaderboard(client)] == ["bruno"]
+
+    # as avaliações ficam, mas a reconstrução também não o repõe
+    await client.post("/api/leaderboard/rebuild")
+    assert await database.pontuacoes.find_one({"_id": ObjectId(ana)}) is None
+
+
+async def test_rebuild_replaces_stale_aggregates(client, database):
+    ana = await create_candidate(client, "ana")
+    await evaluate(client, ana, 6)
+    await database.pontuacoes.update_one({"_id": ObjectId(ana)}, {"$set": {"count": 40, "mean": 1.0}})
+    await database.pontuacoes.insert_one({
+        "_id": ObjectId(), "categoryId": ObjectId(CATEGORY), "count": 1, "sum": 3, "mean": 3.0,
+        "min": 3, "max": 3, "updated_at": datetime(2020, 1, 1),
+    })
+
+    assert (await client.post("/api/leaderboard/rebuild")).json() == {"status": "rebuilt", "candidates": 1}
+    board = await leaderboard(client)
+    assert [(row["candidateId"], row["count"], row["mean"]) for row in board] == [(ana, 1, 6.0)]
+
+
+# ───────────────────────────────────────────────
+# Escritas concorrentes no mesmo candidato
+# ───────────────────────────────────────────────
+class WriteInterleaved:
+    """
+    Corre ``before_write`` (outro pedido) depois da leitura das avaliações e
+    antes do primeiro bulk_write do agregado.
+    """
+
+    def __init__(self, target, before_write):
+        self.target, self.before_write = target, before_write
+
+    def __getattr__(self, name):
+        return getattr(self.target, name)
+
+    async def bulk_write(self, *args, **kwargs):
+        before_write, self.before_write = self.before_write, None
+        if before_write is not None:
+            await before_write()
+        return await self.target.bulk_write(*args, **kwargs)
+
+
+class RacingDatabase:
+    def __init__(self, real, before_write):
+        self.real = real
+        self.pontuacoes = WriteInterleaved(real.pontuacoes, before_write)
+
+    def __getattr__(self, name):
+        return getattr(self.real, name)
+
+
+async def test_concurrent_evaluation_is_not_lost(client, database):
+    ana = ObjectId(await create_candidate(client, "ana"))
+    await evaluate(client, str(ana), 4)
+
+    async def other_request():
+        await database.avaliacoes.insert_one({"candidateId": ana, "jurorId": ObjectId(), "score": 10})
+        await ranking.refresh_candidates(database, [ana])
+
+    await database.avaliacoes.insert_one({"candidateId": ana, "jurorId": ObjectId(), "score": 7})
+    await ranking.refresh_candidates(RacingDatabase(database, other_request), [ana])
+
+    row = await database.pontuacoes.find_one({"_id": ana})
+    assert (row["count"], row["sum"], row["max"]) == (3, 21, 10)
@@ -0,0 +1,50 @@
+import pytest
+from fastapi import HTTPException
+
+import search
+from search import normalize, prefix_query, search_terms, with_search_terms
+
+pytestmark = pytest.mark.anyio
+
+
+def test_normalize_strips_accents_case_and_spaces():
+    assert normalize("  João   MÁRIO ") == "joao mario"
+    assert normalize(None) == ""
+
+
+def test_search_terms_include_words_and_whole_values():
+    assert search_terms({"name": "Ângela Costa", "email": "AC@x.ao"}, ("name", "email")) == [
+        "ac@x.ao", "angela", "angela costa", "costa",
+    ]
+    doc = with_search_terms("applications", {"first_name": "Ana", "last_name": "Silva", "email": None})
+    assert "ana silva" in doc["search_terms"]
+
+
+def test_prefix_query_requires_two_characters():
+    with pytest.raises(HTTPException) as exc:
+        prefix_query(" j ")
+    assert exc.value.status_code == 400
+
+
+async def test_prefix_search_across_collections(client, database):
+    category = "6ad3eede9b0ae83f47b331ab"
+    created = await client.post("/api/candidates", json={
+        "name": "João Mário Silva", "email": "jm@x.ao", "phone": "923", "identityDocument": "00123LA",
+        "categoryId": category, "registrationStatus": "ok",
+    })
+    assert created.status_code == 200
+    await client.post("/api/jurors", json={"name": "Ângela Silva", "email": "as@x.ao", "specialty": "canto"})
+    # candidatura antiga, sem search_terms até ao backfill
+    await database.applications.insert_one({"first_name": "Ana", "last_name": "Silvestre", "email": "ana@x.ao"})
+    assert (await client.get("/api/search", params={"q": "ana"})).json()["results"]["applications"] == []
+    await search.backfill_search_terms(database)
+
+    body = (await client.get("/api/search", params={"q": "sil"})).json()["results"]
+    assert [doc["name"] for doc in body["candidates"]] == ["João Mário Silva"]
+    assert [doc["name"] for doc in body["jurors"]] == ["Ângela Silva"]
+    assert [doc["last_name"] for doc in body["applications"]] == ["Silvestre"]
+
+    by_id = (await client.get("/api/search", params={"q": "00123", "types": "candidates"})).json()
+    assert list(by_id["results"]) == ["candidates"] and len(by_id["results"]["candidates"]) == 1
+    assert (await client.get("/api/search", params={"q": "joao sil"})).json()["results"]["candidates"]
+    assert (await client.get("/api/search", params={"q": "ana", "types": "x"})).status_code == 400
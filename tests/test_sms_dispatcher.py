@@ -0,0 +1,103 @@
+import time
+
+import httpx
+import pytest
+
+import sms_router
+import telcosms_stub
+from sms_dispatcher import RateLimiter, SmsDispatcher
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.setattr(telcosms_stub, "STUB_LATENCY_MS", 0)
+    monkeypatch.setattr(telcosms_stub, "STUB_FAILURE_RATE", 0)
+    telcosms_stub.stats.update(received=0, accepted=0, failed=0)
+    telcosms_stub.messages.clear()
+    return telcosms_stub
+
+
+def stub_dispatcher(**options) -> SmsDispatcher:
+    options.setdefault("rate_per_second", 0)
+    return SmsDispatcher(
+        url="http://stub/send_message",
+        transport=httpx.ASGITransport(app=telcosms_stub.app),
+        **options,
+    )
+
+
+class FailFirst:
+    """Substitui random no stub: as primeiras ``failures`` chamadas falham."""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+
+    def random(self) -> float:
+        self.failures -= 1
+        return 0.0 if self.failures >= 0 else 1.0
+
+
+async def test_send_now_delivers_payload(stub):
+    dispatcher = stub_dispatcher()
+    try:
+        resp = await dispatcher.send_now("923000000", "Olá")
+    finally:
+        await dispatcher.stop()
+    assert resp.status_code == 200
+    assert stub.messages == [{"phone_number": "923000000", "message_body": "Olá"}]
+
+
+async def test_send_now_retries_on_retry_after(stub, monkeypatch):
+    monkeypatch.setattr(stub, "STUB_FAILURE_RATE", 0.5)
+    monkeypatch.setattr(stub, "random", FailFirst(2))
+    dispatcher = stub_dispatcher(max_retries=3)
+    try:
+        resp = await dispatcher.send_now("923000000", "Olá")
+    finally:
+        await dispatcher.stop()
+    assert resp.status_code == 200
+    assert stub.stats == {"received": 3, "accepted": 1, "failed": 2}
+
+
+async def test_send_now_gives_up_after_max_retries(stub, monkeypatch):
+    monkeypatch.setattr(stub, "STUB_FAILURE_RATE", 1.0)
+    dispatcher = stub_dispatcher(max_retries=2)
+    try:
+        resp = await dispatcher.send_now("923000000", "Olá")
+    finally:
+        await dispatcher.stop()
+    assert resp.status_code == 503
+    assert stub.stats["received"] == 3
+
+
+async def test_rate_limiter_spaces_requests_after_burst():
+    limiter = RateLimiter(rate=50)
+    started = time.monotonic()
+    for _ in range(60):
+        await limiter.acquire()
+    # 50 de rajada, as outras 10 a 50/s
+    assert time.monotonic() - started >= 0.18
+
+
+async def test_bulk_job_reports_progress_through_route(client, stub, monkeypatch):
+    dispatcher = stub_dispatcher(concurrency=3)
+    monkeypatch.setattr(sms_router, "dispatcher", dispatcher)
+    try:
+        resp = await client.post("/api/send-sms/bulk", json={
+            "message_body": "Resultados publicados",
+            "phone_numbers": ["923000001", "923000002", "923000001", "923000003"],
+        })
+        assert resp.status_code == 202
+        job = resp.json()
+        assert job["total"] == 3
+        await dispatcher.jobs[job["job_id"]].wait()
+
+        status = (await client.get(f"/api/send-sms/jobs/{job['job_id']}")).json()
+        assert status["status"] == "done"
+        assert (status["sent"], status["failed"], status["pending"]) == (3, 0, 0)
+        assert sorted(m["phone_number"] for m in stub.messages) == ["923000001", "923000002", "923000003"]
+        assert (await client.get("/api/send-sms/jobs/inexistente")).status_code == 404
+    finally:
+        await dispatcher.stop()